@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .assignment_weeks import WEEKLY_CONFLICT_DETAIL, is_weekly_conflict, week_start_of
+from .effective_plans import materialize_effective_plans
+from .models import Routine, Student, StudentRoutineAssignment, User
+from .ownership import apply_owner_visibility, ensure_record_access, resolve_owner_user_id
+from .schemas import AssignmentBulkCreate
+
+MAX_BULK_ASSIGNMENTS = 200
+
+
+def bulk_assign_routine(db: Session, payload: AssignmentBulkCreate, current_user: User) -> dict[str, object]:
+    if bool(payload.student_ids) == payload.all_active_students:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Indicar student_ids o all_active_students (uno de los dos)",
+        )
+    routine = db.get(Routine, payload.routine_id)
+    if not routine:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
+    ensure_record_access(routine.created_by_user_id, current_user, "Rutina no encontrada")
+
+    week_start = week_start_of(payload.week_start)
+    # Visibilidad y conflicto semanal de todos los deportistas en una sola
+    # consulta (la clave de semana usa idx_assignments_week_status).
+    has_active_week = (
+        select(StudentRoutineAssignment.id)
+        .where(
+            StudentRoutineAssignment.student_id == Student.id,
+            StudentRoutineAssignment.week_start == week_start,
+            StudentRoutineAssignment.status == "active",
+        )
+        .exists()
+    )
+    stmt = apply_owner_visibility(
+        select(Student.id, Student.created_by_user_id, has_active_week.label("has_active_week")),
+        Student,
+        current_user,
+    )
+    if payload.student_ids:
+        stmt = stmt.where(Student.id.in_(payload.student_ids))
+    else:
+        stmt = stmt.where(Student.is_active.is_(True)).order_by(Student.full_name, Student.id)
+    found = {row.id: row for row in db.execute(stmt).all()}
+    requested = list(dict.fromkeys(payload.student_ids)) if payload.student_ids else list(found)
+    if len(requested) > MAX_BULK_ASSIGNMENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Se pueden asignar hasta {MAX_BULK_ASSIGNMENTS} deportistas por pedido",
+        )
+
+    results: list[dict[str, object]] = []
+    assignments: list[tuple[dict[str, object], StudentRoutineAssignment]] = []
+    for student_id in requested:
+        result: dict[str, object] = {"student_id": student_id, "status": "error"}
+        results.append(result)
+        student = found.get(student_id)
+        if student is None:
+            result["detail"] = "Deportista no encontrado"
+            continue
+        if payload.status == "active" and student.has_active_week:
+            result["detail"] = WEEKLY_CONFLICT_DETAIL
+            continue
+        assignments.append(
+            (
+                result,
+                StudentRoutineAssignment(
+                    student_id=student_id,
+                    routine_id=routine.id,
+                    start_date=week_start,
+                    end_date=week_start + timedelta(days=6),
+                    week_start=week_start,
+                    status=payload.status,
+                    objective=payload.objective,
+                    professor_notes=payload.professor_notes,
+                    # Sin overrides: el plan no necesita consultarlos.
+                    overrides=[],
+                    created_by_user_id=resolve_owner_user_id(
+                        current_user,
+                        student.created_by_user_id,
+                        routine.created_by_user_id,
+                    ),
+                ),
+            )
+        )
+
+    # Un solo flush/commit: los INSERT van agrupados (con RETURNING donde el
+    # motor lo soporta) y los planes efectivos se guardan en el mismo lote.
+    db.add_all([assignment for _, assignment in assignments])
+    try:
+        db.flush()
+        # Ids tomados antes del commit, que expira los objetos.
+        created_ids = [assignment.id for _, assignment in assignments]
+        materialize_effective_plans(db, [assignment for _, assignment in assignments])
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        if is_weekly_conflict(exc):
+            detail = "Otra asignación de la misma semana se guardó en paralelo; no se guardó ninguna asignación"
+        else:
+            detail = "No se pudieron crear las asignaciones (verifica datos); no se guardó ninguna asignación"
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+    for (result, _), assignment_id in zip(assignments, created_ids):
+        result["status"] = "created"
+        result["assignment_id"] = assignment_id
+    created = len(assignments)
+    return {"created": created, "failed": len(results) - created, "rows": results}
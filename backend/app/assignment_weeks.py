@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+WEEKLY_CONFLICT_DETAIL = "El deportista ya tiene una rutina activa en esa semana"
+# Restricciones que implementan "una rutina activa por deportista y semana":
+# exclusión (PostgreSQL) o índice único sobre la clave de semana (MySQL/SQLite).
+WEEKLY_CONSTRAINT_NAMES = ("excl_assignments_active_week", "uq_assignments_active_week")
+
+
+def week_start_of(value: date) -> date:
+    return value - timedelta(days=value.weekday())
+
+
+def default_week_start(context) -> date:
+    # Default de columna: se deriva del start_date de la misma fila.
+    start = context.get_current_parameters().get("start_date")
+    return week_start_of(start or date.today())
+
+
+def is_weekly_conflict(exc: IntegrityError) -> bool:
+    message = str(exc.orig)
+    # SQLite no informa el nombre del índice, solo las columnas.
+    return any(name in message for name in WEEKLY_CONSTRAINT_NAMES) or "student_routine_assignments.week_start" in message
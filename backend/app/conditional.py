@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .models import User
+from .ownership import apply_owner_visibility
+
+
+def _make_etag(*parts: object) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    # Débil: la versión sale de metadatos (conteo + updated_at), no de los bytes.
+    return f'W/"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {candidate.strip() for candidate in header.split(",")}
+    if "*" in candidates:
+        return True
+    # Comparación débil (RFC 9110): se ignora el prefijo W/.
+    bare = etag.removeprefix("W/")
+    return any(candidate.removeprefix("W/") == bare for candidate in candidates)
+
+
+def collection_etag(db: Session, model: Any, user: User, request: Request, *, extra: object = "") -> str:
+    # Versión barata del conjunto visible: no carga ni serializa filas. Altas y
+    # ediciones mueven MAX(updated_at); las bajas cambian el conteo. extra
+    # suma la versión de otras tablas que la respuesta lee.
+    stmt = apply_owner_visibility(
+        select(func.count(model.id), func.max(model.updated_at), func.max(model.id)),
+        model,
+        user,
+    )
+    count, last_updated_at, last_id = db.execute(stmt).one()
+    return _make_etag(
+        model.__tablename__,
+        user.id,
+        count,
+        last_updated_at.isoformat() if last_updated_at else "",
+        last_id,
+        # Los filtros y el cursor forman parte del recurso.
+        str(request.query_params),
+        extra,
+    )
+
+
+def record_etag(model: Any, record_id: int, updated_at: Any) -> str:
+    return _make_etag(model.__tablename__, record_id, updated_at.isoformat() if updated_at else "")
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Response | None:
+    # Devuelve un 304 listo para retornar desde el handler, o deja el ETag en la
+    # respuesta normal y devuelve None para que el handler siga con la consulta.
+    # private/no-cache: el navegador guarda la respuesta pero revalida siempre.
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
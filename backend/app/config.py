@@ -27,6 +27,25 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_expires_min: int = 30
     jwt_refresh_expires_min: int = 43200
+    auth_user_cache_ttl_s: int = 30
+    auth_user_cache_size: int = 1024
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 8
+
+    student_purge_enabled: bool = True
+    student_purge_interval_min: int = 60
+    student_purge_after_days: int = 30
+
+    pdf_cache_enabled: bool = True
+    pdf_cache_dir: str | None = None
+    pdf_cache_max_mb: int = 200
+    pdf_render_workers: int = 2
+    pdf_prewarm: bool = False
+    pdf_stream_chunk_kb: int = 64
+    pdf_stream_buffer_kb: int = 1024
+    export_dir: str | None = None
+    export_job_threads: int = 2
+    export_job_ttl_hours: int = 24
 
     model_config = SettingsConfigDict(
         env_file=ENV_FILE,
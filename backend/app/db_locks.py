@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import zlib
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+
+def _postgres_lock_key(name: str) -> int:
+    # pg_advisory_lock recibe un bigint; derivamos una clave estable del nombre.
+    return zlib.crc32(name.encode("utf-8"))
+
+
+def acquire_advisory_lock(connection: Connection, name: str, *, wait: bool = True) -> bool:
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        if wait:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _postgres_lock_key(name)})
+            return True
+        acquired = connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"),
+            {"key": _postgres_lock_key(name)},
+        ).scalar_one()
+        return bool(acquired)
+    if dialect == "mysql":
+        acquired = connection.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"),
+            {"name": name, "timeout": -1 if wait else 0},
+        ).scalar_one()
+        return acquired == 1
+    # SQLite y otros motores de prueba: un solo proceso, no hace falta bloquear.
+    return True
+
+
+def release_advisory_lock(connection: Connection, name: str) -> None:
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _postgres_lock_key(name)})
+    elif dialect == "mysql":
+        connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
+
+
+@contextmanager
+def advisory_lock(connection: Connection, name: str, *, wait: bool = True) -> Iterator[bool]:
+    """Lock a nivel de sesión de base; se mantiene entre commits de la misma conexión."""
+    acquired = acquire_advisory_lock(connection, name, wait=wait)
+    connection.commit()
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            connection.rollback()
+            release_advisory_lock(connection, name)
+            connection.commit()
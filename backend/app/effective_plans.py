@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session, selectinload
+
+from .models import (
+    AssignmentEffectivePlan,
+    AssignmentExerciseOverride,
+    AssignmentPlanDependency,
+    Exercise,
+    Routine,
+    RoutineDay,
+    RoutineDayExercise,
+    StudentRoutineAssignment,
+)
+
+# Subir cuando cambie la forma de los días materializados: las filas con otra
+# versión se tratan como ausentes y se calculan al leer.
+PLAN_FORMAT_VERSION = 1
+
+EffectivePlan = tuple[list[dict[str, object]], str, str]
+
+DEFAULT_OBJECTIVE = "Determinante"
+# Claves del JSON de notes que ahora viven en columnas propias.
+STRUCTURED_NOTE_KEYS = {
+    "objective",
+    "professor_notes",
+    "temporary_exercises_by_day",
+    "temporary_exercise_overrides_by_day",
+}
+
+
+def _to_float(value: object) -> float | None:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value: object) -> int | None:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_assignment_notes(notes_value: str | None) -> tuple[str, str, dict[str, list[int]], dict[str, dict[str, dict[str, object]]]]:
+    objective = DEFAULT_OBJECTIVE
+    professor_notes = ""
+    temporary_exercises_by_day: dict[str, list[int]] = {}
+    temporary_overrides_by_day: dict[str, dict[str, dict[str, object]]] = {}
+
+    if not notes_value:
+        return objective, professor_notes, temporary_exercises_by_day, temporary_overrides_by_day
+
+    try:
+        parsed_notes = json.loads(notes_value)
+        if isinstance(parsed_notes, dict):
+            maybe_objective = parsed_notes.get("objective")
+            if isinstance(maybe_objective, str) and maybe_objective.strip():
+                objective = maybe_objective.strip()
+            maybe_professor_notes = parsed_notes.get("professor_notes")
+            if isinstance(maybe_professor_notes, str):
+                professor_notes = maybe_professor_notes
+            maybe_exercises = parsed_notes.get("temporary_exercises_by_day")
+            maybe_overrides = parsed_notes.get("temporary_exercise_overrides_by_day")
+            if isinstance(maybe_exercises, dict):
+                temporary_exercises_by_day = {
+                    str(k): [int(v) for v in values if isinstance(v, int)]
+                    for k, values in maybe_exercises.items()
+                    if isinstance(values, list)
+                }
+            if isinstance(maybe_overrides, dict):
+                temporary_overrides_by_day = {
+                    str(k): values
+                    for k, values in maybe_overrides.items()
+                    if isinstance(values, dict)
+                }
+    except json.JSONDecodeError:
+        professor_notes = notes_value
+
+    return objective, professor_notes, temporary_exercises_by_day, temporary_overrides_by_day
+
+
+def split_assignment_notes(
+    notes_value: str | None,
+) -> tuple[str | None, str | None, list[dict[str, object]], str | None]:
+    # Convierte el JSON histórico de notes en columnas y filas de
+    # assignment_exercise_overrides. Devuelve (objective, professor_notes,
+    # overrides, notes restantes); en notes queda solo lo que no se normalizó.
+    if not notes_value:
+        return None, None, [], notes_value
+    try:
+        parsed_notes = json.loads(notes_value)
+    except json.JSONDecodeError:
+        # Texto libre: siempre se mostró como notas del profesor.
+        return None, notes_value, [], None
+    if not isinstance(parsed_notes, dict):
+        return None, None, [], notes_value
+
+    objective, professor_notes, temporary_exercises_by_day, temporary_overrides_by_day = parse_assignment_notes(
+        notes_value
+    )
+    overrides: list[dict[str, object]] = []
+    for day_key, exercise_ids in temporary_exercises_by_day.items():
+        day_index = _to_int(day_key.removeprefix("day_"))
+        if day_index is None or day_index < 1:
+            continue
+        day_overrides = temporary_overrides_by_day.get(day_key, {})
+        seen: set[int] = set()
+        for exercise_id in exercise_ids:
+            if exercise_id in seen:
+                continue
+            seen.add(exercise_id)
+            values = day_overrides.get(str(exercise_id), {})
+            if not isinstance(values, dict):
+                values = {}
+            description = values.get("description_override")
+            overrides.append(
+                {
+                    "day_index": day_index,
+                    "exercise_id": exercise_id,
+                    "sort_order": len(seen),
+                    "arrows_override": _to_int(values.get("arrows_override")),
+                    "rounds_override": _to_int(values.get("rounds_override")),
+                    "arrows_per_round_override": _to_int(values.get("arrows_per_round_override")),
+                    "distance_override_m": _to_float(values.get("distance_override_m")),
+                    "description_override": description.strip()
+                    if isinstance(description, str) and description.strip()
+                    else None,
+                }
+            )
+
+    remaining = {key: value for key, value in parsed_notes.items() if key not in STRUCTURED_NOTE_KEYS}
+    has_objective = isinstance(parsed_notes.get("objective"), str) and parsed_notes["objective"].strip()
+    return (
+        objective if has_objective else None,
+        professor_notes or None,
+        overrides,
+        json.dumps(remaining, ensure_ascii=False) if remaining else None,
+    )
+
+
+def build_effective_days(
+    db: Session,
+    assignment: StudentRoutineAssignment,
+) -> EffectivePlan:
+    routine = assignment.routine
+    ordered_days = sorted(routine.days, key=lambda day: day.day_number)
+
+    objective = assignment.objective or DEFAULT_OBJECTIVE
+    professor_notes = assignment.professor_notes or ""
+    overrides_by_day: dict[int, list[AssignmentExerciseOverride]] = {}
+    for override in sorted(assignment.overrides, key=lambda item: (item.day_index, item.sort_order)):
+        overrides_by_day.setdefault(override.day_index, []).append(override)
+
+    all_temporary_ids = {int(override.exercise_id) for override in assignment.overrides}
+    exercise_lookup: dict[int, Exercise] = {}
+    if all_temporary_ids:
+        exercise_stmt = select(Exercise).where(Exercise.id.in_(all_temporary_ids))
+        exercise_lookup = {exercise.id: exercise for exercise in db.scalars(exercise_stmt).all()}
+
+    effective_days: list[dict[str, object]] = []
+    for day_index, day in enumerate(ordered_days, start=1):
+        day_label = f"Día {day_index}"
+
+        base_items_by_exercise_id = {
+            int(item.exercise_id): item for item in sorted(day.exercises, key=lambda item: item.sort_order)
+        }
+        day_overrides = overrides_by_day.get(day_index)
+        effective_items: list[dict[str, object]] = []
+
+        if day_overrides:
+            for override in day_overrides:
+                exercise_id = int(override.exercise_id)
+                base_item = base_items_by_exercise_id.get(exercise_id)
+                exercise = (base_item.exercise if base_item else None) or exercise_lookup.get(exercise_id)
+                if not exercise:
+                    continue
+                arrows = _to_int(override.arrows_override)
+                if arrows is None and base_item:
+                    arrows = _to_int(base_item.arrows_override)
+                if arrows is None:
+                    arrows = int(exercise.arrows_count)
+
+                base_rounds = _to_int(getattr(exercise, "rounds", None))
+                if base_rounds is None or base_rounds <= 0:
+                    base_rounds = 1
+                base_arrows_per_round = _to_int(getattr(exercise, "arrows_per_round", None))
+                if base_arrows_per_round is None:
+                    base_arrows_per_round = int(exercise.arrows_count or 0)
+
+                rounds = _to_int(override.rounds_override)
+                arrows_per_round = _to_int(override.arrows_per_round_override)
+
+                if rounds is None and arrows_per_round is None:
+                    if arrows is not None and base_rounds > 0 and arrows % base_rounds == 0:
+                        rounds = base_rounds
+                        arrows_per_round = arrows // base_rounds
+                    else:
+                        rounds = base_rounds
+                        arrows_per_round = base_arrows_per_round
+                elif rounds is None:
+                    rounds = base_rounds if base_rounds > 0 else 1
+                elif arrows_per_round is None:
+                    if rounds > 0 and arrows is not None and arrows % rounds == 0:
+                        arrows_per_round = arrows // rounds
+                    else:
+                        arrows_per_round = base_arrows_per_round
+
+                distance = _to_float(override.distance_override_m)
+                if distance is None and base_item:
+                    distance = _to_float(base_item.distance_override_m)
+                if distance is None:
+                    distance = float(exercise.distance_m)
+
+                description = override.description_override
+                if not isinstance(description, str) or not description.strip():
+                    description = base_item.notes if base_item and base_item.notes else exercise.description
+
+                effective_items.append(
+                    {
+                        "name": exercise.name,
+                        "arrows": arrows,
+                        "rounds": rounds,
+                        "arrows_per_round": arrows_per_round,
+                        "distance": distance,
+                        "description": (description or "").strip(),
+                    }
+                )
+        else:
+            for item in sorted(day.exercises, key=lambda i: i.sort_order):
+                exercise = item.exercise
+                arrows = _to_int(item.arrows_override)
+                if arrows is None:
+                    arrows = int(exercise.arrows_count)
+
+                rounds = _to_int(getattr(exercise, "rounds", None))
+                if rounds is None or rounds <= 0:
+                    rounds = 1
+                arrows_per_round = _to_int(getattr(exercise, "arrows_per_round", None))
+                if arrows_per_round is None:
+                    if rounds > 0 and arrows is not None and arrows % rounds == 0:
+                        arrows_per_round = arrows // rounds
+                    else:
+                        arrows_per_round = int(exercise.arrows_count or 0)
+
+                distance = _to_float(item.distance_override_m)
+                if distance is None:
+                    distance = float(exercise.distance_m)
+                description = (item.notes or exercise.description or "").strip()
+                effective_items.append(
+                    {
+                        "name": exercise.name,
+                        "arrows": arrows,
+                        "rounds": rounds,
+                        "arrows_per_round": arrows_per_round,
+                        "distance": distance,
+                        "description": description,
+                    }
+                )
+
+        effective_days.append({"label": day_label, "items": effective_items})
+
+    return effective_days, objective, professor_notes
+
+
+def _plan_exercise_ids(assignment: StudentRoutineAssignment) -> set[int]:
+    # Sale de las relaciones que build_effective_days ya cargó.
+    exercise_ids = {item.exercise_id for day in assignment.routine.days for item in day.exercises}
+    exercise_ids.update(override.exercise_id for override in assignment.overrides)
+    return {int(exercise_id) for exercise_id in exercise_ids}
+
+
+def materialize_effective_plans(db: Session, assignments: list[StudentRoutineAssignment]) -> dict[int, EffectivePlan]:
+    # Guarda el plan resuelto y los ejercicios de los que depende, dentro de
+    # la transacción del cambio que lo origina; el commit queda a cargo de
+    # quien llama. Las filas de assignments deben estar ya en la base (flush).
+    if not assignments:
+        return {}
+    assignment_ids = [assignment.id for assignment in assignments]
+    existing = {
+        row.assignment_id: row
+        for row in db.scalars(
+            select(AssignmentEffectivePlan).where(AssignmentEffectivePlan.assignment_id.in_(assignment_ids))
+        ).all()
+    }
+    db.execute(delete(AssignmentPlanDependency).where(AssignmentPlanDependency.assignment_id.in_(assignment_ids)))
+    computed_at = datetime.utcnow()
+    plans: dict[int, EffectivePlan] = {}
+    for assignment in assignments:
+        effective_days, objective, professor_notes = build_effective_days(db, assignment)
+        plan = existing.get(assignment.id)
+        if plan is None:
+            plan = AssignmentEffectivePlan(assignment_id=assignment.id)
+            db.add(plan)
+        plan.format_version = PLAN_FORMAT_VERSION
+        plan.objective = objective
+        plan.professor_notes = professor_notes or None
+        plan.weekly_total_arrows = sum(int(item["arrows"]) for day in effective_days for item in day["items"])
+        plan.days_json = json.dumps(effective_days, ensure_ascii=False)
+        plan.computed_at = computed_at
+        db.add_all(
+            AssignmentPlanDependency(assignment_id=assignment.id, exercise_id=exercise_id)
+            for exercise_id in sorted(_plan_exercise_ids(assignment))
+        )
+        plans[assignment.id] = (effective_days, objective, professor_notes)
+    db.flush()
+    return plans
+
+
+def materialize_effective_plan(db: Session, assignment: StudentRoutineAssignment) -> EffectivePlan:
+    return materialize_effective_plans(db, [assignment])[assignment.id]
+
+
+def load_effective_plans(
+    db: Session,
+    assignments: list[StudentRoutineAssignment],
+) -> dict[int, EffectivePlan]:
+    # Una sola consulta para todo el lote. Solo lectura: los planes se
+    # guardan en los caminos de escritura; si falta alguno (asignación
+    # finalizada cuyo plan se descartó, otra versión de formato) se calcula
+    # en memoria sin escribir ni commitear la sesión del request.
+    if not assignments:
+        return {}
+    rows = db.scalars(
+        select(AssignmentEffectivePlan).where(
+            AssignmentEffectivePlan.assignment_id.in_([assignment.id for assignment in assignments]),
+            AssignmentEffectivePlan.format_version == PLAN_FORMAT_VERSION,
+        )
+    ).all()
+    plans: dict[int, EffectivePlan] = {
+        row.assignment_id: (json.loads(row.days_json), row.objective, row.professor_notes or "") for row in rows
+    }
+    for assignment in assignments:
+        if assignment.id not in plans:
+            plans[assignment.id] = build_effective_days(db, assignment)
+    return plans
+
+
+def load_effective_plan(db: Session, assignment: StudentRoutineAssignment) -> EffectivePlan:
+    return load_effective_plans(db, [assignment])[assignment.id]
+
+
+def _refresh_plans(db: Session, affected_ids) -> None:
+    # Las asignaciones vigentes se recalculan en la misma transacción que la
+    # edición; FOR UPDATE serializa dos ediciones que tocan la misma
+    # asignación, así la segunda construye el plan con los datos de la
+    # primera. Las finalizadas solo descartan el plan: se leen poco y se
+    # calculan al vuelo.
+    db.flush()
+    live = db.scalars(
+        select(StudentRoutineAssignment)
+        .where(
+            StudentRoutineAssignment.id.in_(affected_ids),
+            StudentRoutineAssignment.status.in_(("active", "paused")),
+        )
+        .options(
+            selectinload(StudentRoutineAssignment.overrides),
+            selectinload(StudentRoutineAssignment.routine)
+            .selectinload(Routine.days)
+            .selectinload(RoutineDay.exercises)
+            .selectinload(RoutineDayExercise.exercise),
+        )
+        .order_by(StudentRoutineAssignment.id)
+        .with_for_update()
+    ).all()
+    db.execute(
+        delete(AssignmentEffectivePlan)
+        .where(
+            AssignmentEffectivePlan.assignment_id.in_(affected_ids),
+            AssignmentEffectivePlan.assignment_id.not_in([assignment.id for assignment in live]),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    materialize_effective_plans(db, list(live))
+
+
+def refresh_plans_for_exercises(db: Session, exercise_ids: set[int] | list[int]) -> None:
+    # Solo se tocan las asignaciones que usan esos ejercicios.
+    if not exercise_ids:
+        return
+    _refresh_plans(
+        db,
+        select(AssignmentPlanDependency.assignment_id).where(
+            AssignmentPlanDependency.exercise_id.in_(list(exercise_ids))
+        ),
+    )
+
+
+def refresh_plans_for_routine(db: Session, routine_id: int) -> None:
+    _refresh_plans(
+        db,
+        select(StudentRoutineAssignment.id).where(StudentRoutineAssignment.routine_id == routine_id),
+    )
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 
 ROUNDS_PATTERN = re.compile(r"(\d+)\s*rondas?\s*de\s*(\d+)\s*disparos?", re.IGNORECASE)
 EXCLUDED_EXERCISE_NAMES = {"Ejercicios test", "Ejercicio test 2"}
+BACKFILL_BATCH_SIZE = 500
 
 
 def ensure_exercise_rounds_schema(db: Session) -> None:
@@ -16,65 +17,80 @@ def ensure_exercise_rounds_schema(db: Session) -> None:
     else:
         _ensure_exercise_rounds_schema_mysql(db)
 
-    exercises = db.execute(
-        text(
-            """
-            SELECT id, name, description, arrows_count, rounds, arrows_per_round
-            FROM exercises
-            """
-        )
-    ).mappings()
+    _backfill_exercise_rounds(db)
+    db.commit()
 
-    for exercise in exercises:
-        exercise_id = int(exercise["id"])
-        name = (exercise.get("name") or "").strip()
-        description = exercise.get("description") or ""
-        current_arrows_count = int(exercise.get("arrows_count") or 0)
-        current_rounds = exercise.get("rounds")
-        current_arrows_per_round = exercise.get("arrows_per_round")
 
-        rounds: int
-        arrows_per_round: int
+def _derive_rounds(exercise: dict) -> tuple[int, int]:
+    name = (exercise.get("name") or "").strip()
+    description = exercise.get("description") or ""
+    current_arrows_count = int(exercise.get("arrows_count") or 0)
+    current_rounds = exercise.get("rounds")
+    current_arrows_per_round = exercise.get("arrows_per_round")
 
-        if name in EXCLUDED_EXERCISE_NAMES:
-            rounds = int(current_rounds) if current_rounds is not None else 1
-            arrows_per_round = (
-                int(current_arrows_per_round)
-                if current_arrows_per_round is not None
-                else current_arrows_count
-            )
-        else:
-            match = ROUNDS_PATTERN.search(description)
-            if match:
-                rounds = int(match.group(1))
-                arrows_per_round = int(match.group(2))
-            elif current_rounds is not None and current_arrows_per_round is not None:
-                rounds = int(current_rounds)
-                arrows_per_round = int(current_arrows_per_round)
-            else:
-                rounds = 1
-                arrows_per_round = current_arrows_count
+    if name in EXCLUDED_EXERCISE_NAMES:
+        rounds = int(current_rounds) if current_rounds is not None else 1
+        arrows_per_round = (
+            int(current_arrows_per_round)
+            if current_arrows_per_round is not None
+            else current_arrows_count
+        )
+        return rounds, arrows_per_round
 
+    match = ROUNDS_PATTERN.search(description)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    if current_rounds is not None and current_arrows_per_round is not None:
+        return int(current_rounds), int(current_arrows_per_round)
+    return 1, current_arrows_count
+
+
+def _backfill_exercise_rounds(db: Session) -> None:
+    # Solo traemos filas que podrían cambiar: valores faltantes (arrows_count
+    # NULL en bases viejas se trata como 0), totales inconsistentes o
+    # descripciones con el patrón "N rondas de M disparos".
+    candidates = db.execute(
+        text(
+            """
+            SELECT id, name, description, arrows_count, rounds, arrows_per_round
+            FROM exercises
+            WHERE rounds IS NULL
+               OR arrows_per_round IS NULL
+               OR arrows_count IS NULL
+               OR arrows_count <> rounds * arrows_per_round
+               OR LOWER(description) LIKE :rounds_hint
+            """
+        ),
+        {"rounds_hint": "%ronda%"},
+    ).mappings().all()
+
+    updates: list[dict[str, int]] = []
+    for exercise in candidates:
+        rounds, arrows_per_round = _derive_rounds(exercise)
         total_arrows = rounds * arrows_per_round
-        db.execute(
-            text(
-                """
-                UPDATE exercises
-                SET rounds = :rounds,
-                    arrows_per_round = :arrows_per_round,
-                    arrows_count = :arrows_count
-                WHERE id = :exercise_id
-                """
-            ),
+        current = (exercise.get("rounds"), exercise.get("arrows_per_round"), exercise.get("arrows_count"))
+        if current == (rounds, arrows_per_round, total_arrows):
+            continue
+        updates.append(
             {
                 "rounds": rounds,
                 "arrows_per_round": arrows_per_round,
                 "arrows_count": total_arrows,
-                "exercise_id": exercise_id,
-            },
-        )
-
-    db.commit()
+                "exercise_id": int(exercise["id"]),
+            }
+        )
+
+    update_stmt = text(
+        """
+        UPDATE exercises
+        SET rounds = :rounds,
+            arrows_per_round = :arrows_per_round,
+            arrows_count = :arrows_count
+        WHERE id = :exercise_id
+        """
+    )
+    for offset in range(0, len(updates), BACKFILL_BATCH_SIZE):
+        db.execute(update_stmt, updates[offset:offset + BACKFILL_BATCH_SIZE])
 
 
 def _ensure_exercise_rounds_schema_postgres(db: Session) -> None:
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, joinedload
+
+from .assignment_weeks import week_start_of
+from .deps import settings
+from .effective_plans import load_effective_plans
+from .models import ExportJob, Routine, Student, StudentRoutineAssignment, User
+from .ownership import apply_owner_visibility
+from .pdf_cache import cached_merged_pdf, cached_plan_pdf, iter_plan_pdfs
+from .pdf_export import assignment_pdf_plan, plan_pdf_filename
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MEDIA_TYPES = {"zip": "application/zip", "merged": "application/pdf"}
+# Un job "running" más viejo que esto quedó huérfano (el proceso murió).
+STALE_JOB_AFTER = timedelta(minutes=30)
+
+# Los hilos solo coordinan: el render corre en el pool de procesos de
+# pdf_export, así que no compiten por el GIL con los endpoints CRUD.
+_job_executor: ThreadPoolExecutor | None = None
+_job_executor_lock = threading.Lock()
+
+
+def load_batch_plans(
+    db: Session,
+    current_user: User,
+    *,
+    assignment_ids: list[int] | None,
+    active_this_week: bool,
+) -> list[dict[str, object]]:
+    if bool(assignment_ids) == active_this_week:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Indicar assignment_ids o active_this_week (uno de los dos)",
+        )
+    stmt = (
+        select(StudentRoutineAssignment)
+        .join(Student, Student.id == StudentRoutineAssignment.student_id)
+        .join(Routine, Routine.id == StudentRoutineAssignment.routine_id)
+        .options(
+            joinedload(StudentRoutineAssignment.student),
+            joinedload(StudentRoutineAssignment.routine),
+        )
+        .order_by(Student.full_name, StudentRoutineAssignment.start_date, StudentRoutineAssignment.id)
+    )
+    stmt = apply_owner_visibility(apply_owner_visibility(stmt, Student, current_user), Routine, current_user)
+    if assignment_ids:
+        stmt = stmt.where(StudentRoutineAssignment.id.in_(assignment_ids))
+    else:
+        # Igualdad sobre la clave de semana: usa idx_assignments_week_status.
+        stmt = stmt.where(
+            StudentRoutineAssignment.status == "active",
+            StudentRoutineAssignment.week_start == week_start_of(date.today()),
+        )
+    assignments = db.scalars(stmt).unique().all()
+    if assignment_ids:
+        missing = sorted(set(assignment_ids) - {assignment.id for assignment in assignments})
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Asignaciones no encontradas: {', '.join(str(item) for item in missing)}",
+            )
+    if not assignments:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No hay asignaciones para exportar")
+
+    effective_plans = load_effective_plans(db, list(assignments))
+    return [
+        assignment_pdf_plan(assignment, *effective_plans[assignment.id])
+        for assignment in assignments
+    ]
+
+
+def export_file_name(plans: list[dict[str, object]], export_format: str) -> str:
+    if len(plans) == 1 and export_format == "merged":
+        return plan_pdf_filename(plans[0])
+    extension = "pdf" if export_format == "merged" else "zip"
+    return f"PLANES SEMANALES {date.today().strftime('%d-%m')}.{extension}"
+
+
+def _zip_plan_pdfs(plans: list[dict[str, object]], target: BinaryIO) -> None:
+    used_names: set[str] = set()
+    # Los PDF ya vienen comprimidos: ZIP_STORED evita gastar CPU en deflate.
+    # Se escriben de a uno en el destino, sin juntar el lote en memoria.
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_STORED) as archive:
+        for plan, pdf_bytes in zip(plans, iter_plan_pdfs(plans)):
+            file_name = plan_pdf_filename(plan)
+            stem = file_name[:-4]
+            suffix = 2
+            while file_name in used_names:
+                file_name = f"{stem} ({suffix}).pdf"
+                suffix += 1
+            used_names.add(file_name)
+            archive.writestr(file_name, pdf_bytes)
+
+
+def write_export(plans: list[dict[str, object]], export_format: str, target: BinaryIO) -> None:
+    if export_format == "merged":
+        if len(plans) == 1:
+            # Mismo documento (y misma entrada de cache) que GET /assignments/{id}/pdf.
+            target.write(cached_plan_pdf(plans[0])[1])
+        else:
+            target.write(cached_merged_pdf(plans)[1])
+        return
+    _zip_plan_pdfs(plans, target)
+
+
+def _export_dir() -> Path:
+    if settings.export_dir:
+        return Path(settings.export_dir)
+    return Path(tempfile.gettempdir()) / "archery_exports"
+
+
+def export_result_path(job_id: int) -> Path:
+    return _export_dir() / f"{job_id}.out"
+
+
+def _get_job_executor() -> ThreadPoolExecutor:
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is None:
+            _job_executor = ThreadPoolExecutor(
+                max_workers=settings.export_job_threads,
+                thread_name_prefix="export-job",
+            )
+        return _job_executor
+
+
+def shutdown_export_jobs() -> None:
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is not None:
+            _job_executor.shutdown(wait=False, cancel_futures=True)
+            _job_executor = None
+
+
+def _dispatch(engine: Engine, job_id: int) -> None:
+    if settings.export_job_threads <= 0:
+        run_export_job(engine, job_id)
+        return
+    _get_job_executor().submit(run_export_job, engine, job_id)
+
+
+def run_export_job(engine: Engine, job_id: int) -> None:
+    with Session(bind=engine, autoflush=False) as db:
+        # Reclamo atómico: si otro worker ya lo tomó, no se procesa dos veces.
+        claimed = db.execute(
+            update(ExportJob)
+            .where(ExportJob.id == job_id, ExportJob.status == "queued")
+            .values(status="running", started_at=datetime.utcnow())
+        )
+        db.commit()
+        if not claimed.rowcount:
+            return
+        job = db.get(ExportJob, job_id)
+        tmp_name: str | None = None
+        try:
+            params = json.loads(job.params_json)
+            path = export_result_path(job_id)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Se escribe directo a disco: el archivo del lote nunca está entero en memoria.
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as handle:
+                write_export(params["plans"], job.format, handle)
+            os.replace(tmp_name, path)
+        except Exception as exc:
+            logger.exception("Falló la exportación %s", job_id)
+            if tmp_name is not None and os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            job.status = "failed"
+            job.error = getattr(exc, "detail", None) or str(exc) or exc.__class__.__name__
+        else:
+            job.status = "done"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+
+def prune_export_jobs(db: Session) -> int:
+    cutoff = datetime.utcnow() - timedelta(hours=settings.export_job_ttl_hours)
+    condition = (ExportJob.status.in_(("done", "failed")), ExportJob.created_at < cutoff)
+    expired_ids = db.scalars(select(ExportJob.id).where(*condition)).all()
+    if not expired_ids:
+        return 0
+    for job_id in expired_ids:
+        try:
+            export_result_path(job_id).unlink()
+        except FileNotFoundError:
+            pass
+    db.execute(delete(ExportJob).where(ExportJob.id.in_(expired_ids)))
+    db.commit()
+    return len(expired_ids)
+
+
+def enqueue_export_job(
+    db: Session,
+    current_user: User,
+    plans: list[dict[str, object]],
+    export_format: str,
+) -> ExportJob:
+    prune_export_jobs(db)
+    job = ExportJob(
+        created_by_user_id=current_user.id,
+        status="queued",
+        format=export_format,
+        file_name=export_file_name(plans, export_format),
+        # Los planes ya resueltos viajan en el job: el worker no vuelve a la base.
+        params_json=json.dumps({"plans": plans}, ensure_ascii=False, default=str),
+        created_at=datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    _dispatch(db.get_bind(), job.id)
+    db.refresh(job)
+    return job
+
+
+def is_stale_export_job(job: ExportJob) -> bool:
+    return (
+        job.status == "running"
+        and job.started_at is not None
+        and job.started_at < datetime.utcnow() - STALE_JOB_AFTER
+    )
+
+
+def fail_stale_export_jobs(db: Session, job_ids: list[int] | None = None) -> int:
+    # Los "running" viejos quedaron huérfanos: el proceso que los corría murió.
+    stmt = (
+        update(ExportJob)
+        .where(ExportJob.status == "running", ExportJob.started_at < datetime.utcnow() - STALE_JOB_AFTER)
+        .values(status="failed", error="Exportación interrumpida", finished_at=datetime.utcnow())
+    )
+    if job_ids is not None:
+        stmt = stmt.where(ExportJob.id.in_(job_ids))
+    failed = db.execute(stmt).rowcount
+    db.commit()
+    return failed
+
+
+def sweep_stale_export_jobs(engine: Engine) -> int:
+    # Lo llama el scheduler en cada vuelta: un worker caído no deja jobs en
+    # "running" hasta el próximo arranque.
+    with Session(bind=engine, autoflush=False) as db:
+        failed = fail_stale_export_jobs(db)
+    if failed:
+        logger.warning("Exportaciones interrumpidas marcadas como fallidas: %s", failed)
+    return failed
+
+
+def resume_export_jobs(engine: Engine) -> None:
+    # Al arrancar: los "running" viejos murieron con el proceso anterior y los
+    # "queued" que nadie tomó se vuelven a despachar.
+    with Session(bind=engine, autoflush=False) as db:
+        fail_stale_export_jobs(db)
+        queued_ids = db.scalars(select(ExportJob.id).where(ExportJob.status == "queued")).all()
+    for job_id in queued_ids:
+        _dispatch(engine, job_id)
@@ -5,14 +5,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from .auth_schema import ensure_auth_schema
 from .deps import SessionLocal, get_db, settings
-from .exercise_rounds import ensure_exercise_rounds_schema
-from .ownership import ensure_ownership_schema
-from .routine_retention import ensure_routine_schema
-from .routers import exercises, students, routines, assignments, auth, users
-from .student_accounts import ensure_student_accounts_schema
-from .student_retention import ensure_student_retention_schema, purge_inactive_students
+from .export_jobs import resume_export_jobs, shutdown_export_jobs
+from .migrations import ensure_schema_current
+from .pagination import NEXT_CURSOR_HEADER
+from .pdf_export import shutdown_pdf_render_pool, warm_up_pdf_renderer
+from .purge_scheduler import start_student_purge_scheduler, stop_student_purge_scheduler
+from .routers import exercises, students, routines, assignments, auth, users, sync, exports
+from .security import shutdown_password_pool
 
 app = FastAPI(
     title="Archery Training API",
@@ -26,7 +26,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", "ETag", NEXT_CURSOR_HEADER],
 )
 
 
@@ -34,15 +34,27 @@ app.add_middleware(
 def startup_maintenance():
     db = SessionLocal()
     try:
-        ensure_student_retention_schema(db)
-        ensure_routine_schema(db)
-        ensure_exercise_rounds_schema(db)
-        ensure_auth_schema(db)
-        ensure_ownership_schema(db)
-        ensure_student_accounts_schema(db)
-        purge_inactive_students(db)
+        ensure_schema_current(db)
+        engine = db.get_bind()
     finally:
         db.close()
+    if settings.student_purge_enabled:
+        start_student_purge_scheduler(
+            engine,
+            interval_minutes=settings.student_purge_interval_min,
+            days=settings.student_purge_after_days,
+        )
+    resume_export_jobs(engine)
+    if settings.pdf_prewarm:
+        warm_up_pdf_renderer()
+
+
+@app.on_event("shutdown")
+def shutdown_background_jobs():
+    stop_student_purge_scheduler()
+    shutdown_password_pool()
+    shutdown_export_jobs()
+    shutdown_pdf_render_pool()
 
 
 @app.get("/health")
@@ -67,3 +79,5 @@ app.include_router(exercises.router)
 app.include_router(students.router)
 app.include_router(routines.router)
 app.include_router(assignments.router)
+app.include_router(sync.router)
+app.include_router(exports.router)
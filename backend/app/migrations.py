@@ -0,0 +1,612 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from .auth_schema import ensure_auth_schema
+from .db_locks import advisory_lock
+from .effective_plans import split_assignment_notes
+from .exercise_rounds import ensure_exercise_rounds_schema
+from .ownership import ensure_ownership_schema
+from .routine_retention import ensure_routine_schema
+from .student_accounts import ensure_student_accounts_schema
+from .student_retention import ensure_student_retention_schema
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_LOCK_NAME = "archery_schema_migrations"
+NOTES_BACKFILL_BATCH_SIZE = 500
+
+
+def _index_exists(db: Session, table_name: str, index_name: str) -> bool:
+    dialect = db.bind.dialect.name if db.bind is not None else ""
+    if dialect == "postgresql":
+        query = """
+            SELECT COUNT(*) AS c
+            FROM pg_indexes
+            WHERE schemaname = current_schema()
+              AND tablename = :table_name
+              AND indexname = :index_name
+            """
+    else:
+        query = """
+            SELECT COUNT(*) AS c
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE()
+              AND table_name = :table_name
+              AND index_name = :index_name
+            """
+    count = db.execute(text(query), {"table_name": table_name, "index_name": index_name}).scalar_one()
+    return bool(count)
+
+
+def _create_index(db: Session, table_name: str, index_name: str, columns: str) -> None:
+    if not _index_exists(db, table_name, index_name):
+        db.execute(text(f"CREATE INDEX {index_name} ON {table_name} ({columns})"))
+
+
+def _add_assignments_keyset_index(db: Session) -> None:
+    _create_index(db, "student_routine_assignments", "idx_assignments_created_id", "created_at, id")
+    db.commit()
+
+
+def _add_students_search_indexes(db: Session) -> None:
+    dialect = db.bind.dialect.name if db.bind is not None else ""
+    _create_index(db, "students", "idx_students_owner_name", "created_by_user_id, full_name, id")
+    if dialect == "postgresql":
+        try:
+            with db.begin_nested():
+                db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        except DBAPIError:
+            # Sin permisos para crear la extensión: la búsqueda funciona igual,
+            # pero con seq scan. Un DBA puede crearla y re-crear los índices.
+            logger.warning("No se pudo habilitar pg_trgm; se omiten los índices trigram de students")
+        else:
+            db.execute(
+                text(
+                    """
+                    CREATE INDEX IF NOT EXISTS idx_students_full_name_trgm
+                    ON students USING gin (full_name gin_trgm_ops)
+                    """
+                )
+            )
+            db.execute(
+                text(
+                    """
+                    CREATE INDEX IF NOT EXISTS idx_students_document_trgm
+                    ON students USING gin (document_number gin_trgm_ops)
+                    """
+                )
+            )
+    db.commit()
+
+
+def _create_deleted_records_table(db: Session) -> None:
+    dialect = db.bind.dialect.name if db.bind is not None else ""
+    if dialect == "postgresql":
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS deleted_records (
+                  id BIGSERIAL PRIMARY KEY,
+                  entity VARCHAR(30) NOT NULL,
+                  record_id BIGINT NOT NULL,
+                  created_by_user_id BIGINT NULL,
+                  deleted_at TIMESTAMP NOT NULL
+                )
+                """
+            )
+        )
+    else:
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS deleted_records (
+                  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                  entity VARCHAR(30) NOT NULL,
+                  record_id BIGINT NOT NULL,
+                  created_by_user_id BIGINT NULL,
+                  deleted_at DATETIME NOT NULL
+                ) ENGINE=InnoDB
+                """
+            )
+        )
+    _create_index(db, "deleted_records", "idx_deleted_records_deleted_at", "deleted_at")
+    db.commit()
+
+
+def _create_export_jobs_table(db: Session) -> None:
+    dialect = db.bind.dialect.name if db.bind is not None else ""
+    if dialect == "postgresql":
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS export_jobs (
+                  id BIGSERIAL PRIMARY KEY,
+                  created_by_user_id BIGINT NULL REFERENCES users(id),
+                  status VARCHAR(20) NOT NULL,
+                  format VARCHAR(20) NOT NULL,
+                  file_name VARCHAR(255) NOT NULL,
+                  params_json TEXT NOT NULL,
+                  error TEXT NULL,
+                  created_at TIMESTAMP NOT NULL,
+                  started_at TIMESTAMP NULL,
+                  finished_at TIMESTAMP NULL
+                )
+                """
+            )
+        )
+    else:
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS export_jobs (
+                  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                  created_by_user_id BIGINT UNSIGNED NULL,
+                  status VARCHAR(20) NOT NULL,
+                  format VARCHAR(20) NOT NULL,
+                  file_name VARCHAR(255) NOT NULL,
+                  params_json LONGTEXT NOT NULL,
+                  error TEXT NULL,
+                  created_at DATETIME NOT NULL,
+                  started_at DATETIME NULL,
+                  finished_at DATETIME NULL,
+                  CONSTRAINT fk_export_jobs_user FOREIGN KEY (created_by_user_id) REFERENCES users(id)
+                ) ENGINE=InnoDB
+                """
+            )
+        )
+    _create_index(db, "export_jobs", "idx_export_jobs_status_created", "status, created_at")
+    db.commit()
+
+
+def _create_effective_plan_tables(db: Session) -> None:
+    dialect = db.bind.dialect.name if db.bind is not None else ""
+    if dialect == "postgresql":
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS assignment_effective_plans (
+                  assignment_id BIGINT PRIMARY KEY
+                    REFERENCES student_routine_assignments(id) ON DELETE CASCADE,
+                  format_version INTEGER NOT NULL,
+                  objective VARCHAR(255) NOT NULL,
+                  professor_notes TEXT NULL,
+                  weekly_total_arrows INTEGER NOT NULL DEFAULT 0,
+                  days_json TEXT NOT NULL,
+                  computed_at TIMESTAMP NOT NULL
+                )
+                """
+            )
+        )
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS assignment_plan_dependencies (
+                  assignment_id BIGINT NOT NULL
+                    REFERENCES student_routine_assignments(id) ON DELETE CASCADE,
+                  exercise_id BIGINT NOT NULL,
+                  PRIMARY KEY (assignment_id, exercise_id)
+                )
+                """
+            )
+        )
+    else:
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS assignment_effective_plans (
+                  assignment_id BIGINT UNSIGNED NOT NULL PRIMARY KEY,
+                  format_version INT NOT NULL,
+                  objective VARCHAR(255) NOT NULL,
+                  professor_notes TEXT NULL,
+                  weekly_total_arrows INT NOT NULL DEFAULT 0,
+                  days_json MEDIUMTEXT NOT NULL,
+                  computed_at DATETIME NOT NULL,
+                  CONSTRAINT fk_effective_plans_assignment FOREIGN KEY (assignment_id)
+                    REFERENCES student_routine_assignments(id) ON DELETE CASCADE
+                ) ENGINE=InnoDB
+                """
+            )
+        )
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS assignment_plan_dependencies (
+                  assignment_id BIGINT UNSIGNED NOT NULL,
+                  exercise_id BIGINT UNSIGNED NOT NULL,
+                  PRIMARY KEY (assignment_id, exercise_id),
+                  CONSTRAINT fk_plan_dependencies_assignment FOREIGN KEY (assignment_id)
+                    REFERENCES student_routine_assignments(id) ON DELETE CASCADE
+                ) ENGINE=InnoDB
+                """
+            )
+        )
+    _create_index(db, "assignment_plan_dependencies", "idx_plan_dependencies_exercise", "exercise_id")
+    db.commit()
+
+
+def _column_exists(db: Session, table_name: str, column_name: str) -> bool:
+    dialect = db.bind.dialect.name if db.bind is not None else ""
+    schema_filter = "current_schema()" if dialect == "postgresql" else "DATABASE()"
+    count = db.execute(
+        text(
+            f"""
+            SELECT COUNT(*) AS c
+            FROM information_schema.columns
+            WHERE table_schema = {schema_filter}
+              AND table_name = :table_name
+              AND column_name = :column_name
+            """
+        ),
+        {"table_name": table_name, "column_name": column_name},
+    ).scalar_one()
+    return bool(count)
+
+
+def _create_assignment_overrides(db: Session) -> None:
+    dialect = db.bind.dialect.name if db.bind is not None else ""
+    if not _column_exists(db, "student_routine_assignments", "objective"):
+        db.execute(text("ALTER TABLE student_routine_assignments ADD COLUMN objective VARCHAR(255) NULL"))
+    if not _column_exists(db, "student_routine_assignments", "professor_notes"):
+        db.execute(text("ALTER TABLE student_routine_assignments ADD COLUMN professor_notes TEXT NULL"))
+    if dialect == "postgresql":
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS assignment_exercise_overrides (
+                  id BIGSERIAL PRIMARY KEY,
+                  assignment_id BIGINT NOT NULL
+                    REFERENCES student_routine_assignments(id) ON DELETE CASCADE,
+                  day_index INTEGER NOT NULL,
+                  exercise_id BIGINT NOT NULL REFERENCES exercises(id) ON DELETE CASCADE,
+                  sort_order INTEGER NOT NULL DEFAULT 1,
+                  arrows_override INTEGER NULL,
+                  rounds_override INTEGER NULL,
+                  arrows_per_round_override INTEGER NULL,
+                  distance_override_m NUMERIC(6,2) NULL,
+                  description_override TEXT NULL,
+                  CONSTRAINT uq_assignment_override_day_exercise UNIQUE (assignment_id, day_index, exercise_id)
+                )
+                """
+            )
+        )
+    else:
+        db.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS assignment_exercise_overrides (
+                  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                  assignment_id BIGINT UNSIGNED NOT NULL,
+                  day_index INT NOT NULL,
+                  exercise_id BIGINT UNSIGNED NOT NULL,
+                  sort_order INT NOT NULL DEFAULT 1,
+                  arrows_override INT NULL,
+                  rounds_override INT NULL,
+                  arrows_per_round_override INT NULL,
+                  distance_override_m DECIMAL(6,2) NULL,
+                  description_override TEXT NULL,
+                  CONSTRAINT uq_assignment_override_day_exercise UNIQUE (assignment_id, day_index, exercise_id),
+                  CONSTRAINT fk_assignment_overrides_assignment FOREIGN KEY (assignment_id)
+                    REFERENCES student_routine_assignments(id) ON DELETE CASCADE,
+                  CONSTRAINT fk_assignment_overrides_exercise FOREIGN KEY (exercise_id)
+                    REFERENCES exercises(id) ON DELETE CASCADE
+                ) ENGINE=InnoDB
+                """
+            )
+        )
+    _create_index(db, "assignment_exercise_overrides", "idx_assignment_overrides_exercise", "exercise_id")
+    _backfill_assignment_overrides(db)
+    db.commit()
+
+
+def _backfill_assignment_overrides(db: Session) -> None:
+    # Pasa el JSON de notes a columnas/filas una sola vez. Los ejercicios que
+    # ya no existen se descartan, igual que hacía el armado del plan.
+    rows = db.execute(
+        text(
+            """
+            SELECT id, notes
+            FROM student_routine_assignments
+            WHERE notes IS NOT NULL
+              AND objective IS NULL
+              AND professor_notes IS NULL
+            """
+        )
+    ).mappings().all()
+    existing_exercise_ids = set(db.execute(text("SELECT id FROM exercises")).scalars().all())
+
+    assignment_updates: list[dict[str, object]] = []
+    override_rows: list[dict[str, object]] = []
+    for row in rows:
+        objective, professor_notes, overrides, remaining_notes = split_assignment_notes(row["notes"])
+        if remaining_notes == row["notes"]:
+            continue
+        assignment_updates.append(
+            {
+                "assignment_id": int(row["id"]),
+                "objective": objective,
+                "professor_notes": professor_notes,
+                "notes": remaining_notes,
+            }
+        )
+        override_rows.extend(
+            {**override, "assignment_id": int(row["id"])}
+            for override in overrides
+            if override["exercise_id"] in existing_exercise_ids
+        )
+
+    update_stmt = text(
+        """
+        UPDATE student_routine_assignments
+        SET objective = :objective,
+            professor_notes = :professor_notes,
+            notes = :notes
+        WHERE id = :assignment_id
+        """
+    )
+    insert_stmt = text(
+        """
+        INSERT INTO assignment_exercise_overrides (
+          assignment_id, day_index, exercise_id, sort_order, arrows_override, rounds_override,
+          arrows_per_round_override, distance_override_m, description_override
+        ) VALUES (
+          :assignment_id, :day_index, :exercise_id, :sort_order, :arrows_override, :rounds_override,
+          :arrows_per_round_override, :distance_override_m, :description_override
+        )
+        """
+    )
+    for offset in range(0, len(assignment_updates), NOTES_BACKFILL_BATCH_SIZE):
+        db.execute(update_stmt, assignment_updates[offset:offset + NOTES_BACKFILL_BATCH_SIZE])
+    for offset in range(0, len(override_rows), NOTES_BACKFILL_BATCH_SIZE):
+        db.execute(insert_stmt, override_rows[offset:offset + NOTES_BACKFILL_BATCH_SIZE])
+
+
+def _pause_duplicate_active_weeks(db: Session) -> None:
+    # Antes de la restricción: si una carrera dejó dos activas en la misma
+    # semana, queda activa la más reciente y las demás pasan a pausadas.
+    duplicate_ids = db.execute(
+        text(
+            """
+            SELECT DISTINCT a.id
+            FROM student_routine_assignments a
+            JOIN student_routine_assignments b
+              ON b.student_id = a.student_id
+             AND b.week_start = a.week_start
+             AND b.status = 'active'
+             AND b.id > a.id
+            WHERE a.status = 'active'
+            """
+        )
+    ).scalars().all()
+    if not duplicate_ids:
+        return
+    logger.warning(
+        "Asignaciones activas duplicadas en la misma semana pasadas a 'paused': %s",
+        ", ".join(str(item) for item in duplicate_ids),
+    )
+    db.execute(
+        text("UPDATE student_routine_assignments SET status = 'paused' WHERE id IN :ids").bindparams(
+            bindparam("ids", expanding=True)
+        ),
+        {"ids": list(duplicate_ids)},
+    )
+
+
+def _add_assignment_week_key(db: Session) -> None:
+    dialect = db.bind.dialect.name if db.bind is not None else ""
+    if not _column_exists(db, "student_routine_assignments", "week_start"):
+        db.execute(text("ALTER TABLE student_routine_assignments ADD COLUMN week_start DATE NULL"))
+    if dialect == "postgresql":
+        db.execute(
+            text(
+                """
+                UPDATE student_routine_assignments
+                SET week_start = date_trunc('week', COALESCE(start_date, assigned_at))::date
+                WHERE week_start IS NULL
+                """
+            )
+        )
+    else:
+        db.execute(
+            text(
+                """
+                UPDATE student_routine_assignments
+                SET week_start = DATE_SUB(
+                  COALESCE(start_date, DATE(assigned_at)),
+                  INTERVAL WEEKDAY(COALESCE(start_date, DATE(assigned_at))) DAY
+                )
+                WHERE week_start IS NULL
+                """
+            )
+        )
+    _create_index(db, "student_routine_assignments", "idx_assignments_week_status", "week_start, status")
+    _pause_duplicate_active_weeks(db)
+
+    if dialect == "postgresql":
+        try:
+            with db.begin_nested():
+                db.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+        except DBAPIError:
+            # Sin btree_gist no hay exclusión con "student_id WITH =": el índice
+            # único parcial da la misma garantía porque week_start siempre es lunes.
+            logger.warning("No se pudo habilitar btree_gist; se usa un índice único parcial por semana")
+            db.execute(
+                text(
+                    """
+                    CREATE UNIQUE INDEX IF NOT EXISTS uq_assignments_active_week
+                    ON student_routine_assignments (student_id, week_start)
+                    WHERE status = 'active'
+                    """
+                )
+            )
+        else:
+            db.execute(
+                text(
+                    """
+                    DO $$
+                    BEGIN
+                      IF NOT EXISTS (
+                        SELECT 1 FROM pg_constraint
+                        WHERE conname = 'excl_assignments_active_week'
+                      ) THEN
+                        ALTER TABLE student_routine_assignments
+                        ADD CONSTRAINT excl_assignments_active_week
+                        EXCLUDE USING gist (
+                          student_id WITH =,
+                          daterange(week_start, week_start + 7) WITH &&
+                        ) WHERE (status = 'active' AND week_start IS NOT NULL);
+                      END IF;
+                    END $$;
+                    """
+                )
+            )
+    else:
+        if not _column_exists(db, "student_routine_assignments", "active_week_key"):
+            # MySQL no tiene índices parciales: la clave ISO (YEARWEEK modo 3) es
+            # NULL para las no activas, y los NULL no chocan en el índice único.
+            db.execute(
+                text(
+                    """
+                    ALTER TABLE student_routine_assignments
+                    ADD COLUMN active_week_key INT
+                      AS (IF(status = 'active', YEARWEEK(week_start, 3), NULL)) STORED
+                    """
+                )
+            )
+        if not _index_exists(db, "student_routine_assignments", "uq_assignments_active_week"):
+            db.execute(
+                text(
+                    """
+                    CREATE UNIQUE INDEX uq_assignments_active_week
+                    ON student_routine_assignments (student_id, active_week_key)
+                    """
+                )
+            )
+    db.commit()
+
+
+def _create_scheduled_job_runs_table(db: Session) -> None:
+    # Última ejecución de cada job periódico, compartida entre workers.
+    column_type = "TIMESTAMP" if db.bind is not None and db.bind.dialect.name == "postgresql" else "DATETIME"
+    db.execute(
+        text(
+            f"""
+            CREATE TABLE IF NOT EXISTS scheduled_job_runs (
+              job_name VARCHAR(60) NOT NULL PRIMARY KEY,
+              last_run_at {column_type} NOT NULL
+            )
+            """
+        )
+    )
+    db.commit()
+
+
+# Migraciones versionadas: cada una corre una sola vez y queda registrada en
+# schema_migrations. Las primeras reutilizan los ensure_* idempotentes para que
+# las bases existentes (que ya los aplicaron al arrancar) migren sin errores.
+# Nunca reordenar ni renumerar; solo agregar al final.
+MIGRATIONS: tuple[tuple[int, str, Callable[[Session], None]], ...] = (
+    (1, "student_retention", ensure_student_retention_schema),
+    (2, "routine_templates_and_history", ensure_routine_schema),
+    (3, "exercise_rounds", ensure_exercise_rounds_schema),
+    (4, "auth_refresh_sessions", ensure_auth_schema),
+    (5, "ownership", ensure_ownership_schema),
+    (6, "student_accounts", ensure_student_accounts_schema),
+    (7, "assignments_keyset_index", _add_assignments_keyset_index),
+    (8, "students_search_indexes", _add_students_search_indexes),
+    (9, "sync_tombstones", _create_deleted_records_table),
+    (10, "export_jobs", _create_export_jobs_table),
+    (11, "assignment_effective_plans", _create_effective_plan_tables),
+    (12, "assignment_overrides", _create_assignment_overrides),
+    (13, "assignments_active_week", _add_assignment_week_key),
+    (14, "scheduled_job_runs", _create_scheduled_job_runs_table),
+)
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(db: Session) -> int:
+    try:
+        version = db.execute(text("SELECT MAX(version) FROM schema_migrations")).scalar_one()
+    except DBAPIError:
+        # La tabla todavía no existe: base sin migraciones registradas.
+        db.rollback()
+        return 0
+    db.rollback()
+    return int(version or 0)
+
+
+def _ensure_migrations_table(db: Session) -> None:
+    db.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+              version INTEGER NOT NULL PRIMARY KEY,
+              name VARCHAR(120) NOT NULL,
+              applied_at TIMESTAMP NOT NULL
+            )
+            """
+        )
+    )
+    db.commit()
+
+
+def _applied_versions(db: Session) -> set[int]:
+    return {int(row) for row in db.execute(text("SELECT version FROM schema_migrations")).scalars()}
+
+
+def run_migrations(engine: Engine) -> list[int]:
+    applied_now: list[int] = []
+    with engine.connect() as connection:
+        with advisory_lock(connection, MIGRATIONS_LOCK_NAME):
+            db = Session(bind=connection, autoflush=False)
+            try:
+                _ensure_migrations_table(db)
+                # Otro worker pudo haber migrado mientras esperábamos el lock.
+                applied = _applied_versions(db)
+                db.commit()
+                for version, name, migrate in MIGRATIONS:
+                    if version in applied:
+                        continue
+                    logger.info("Aplicando migración %s (%s)", version, name)
+                    migrate(db)
+                    db.execute(
+                        text(
+                            """
+                            INSERT INTO schema_migrations (version, name, applied_at)
+                            VALUES (:version, :name, :applied_at)
+                            """
+                        ),
+                        {"version": version, "name": name, "applied_at": datetime.utcnow()},
+                    )
+                    db.commit()
+                    applied_now.append(version)
+            finally:
+                db.close()
+    return applied_now
+
+
+def ensure_schema_current(db: Session) -> None:
+    # Camino rápido del arranque: una sola consulta si la base ya está al día.
+    if get_schema_version(db) >= LATEST_SCHEMA_VERSION:
+        return
+    run_migrations(db.get_bind())
+
+
+if __name__ == "__main__":
+    from .deps import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        applied_versions = run_migrations(session.get_bind())
+    finally:
+        session.close()
+    print(f"Migraciones aplicadas: {applied_versions or 'ninguna'}")
@@ -8,6 +8,7 @@ from sqlalchemy import (
     CheckConstraint,
     Column,
     Date,
+    DDL,
     DateTime,
     Enum,
     ForeignKey,
@@ -18,9 +19,12 @@ from sqlalchemy import (
     Text,
     UniqueConstraint,
     Boolean,
+    event,
+    text,
 )
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
+from .assignment_weeks import default_week_start
 from .db import Base
 
 
@@ -84,6 +88,7 @@ class Student(Base):
     __tablename__ = "students"
     __table_args__ = (
         Index("idx_students_active_name", "is_active", "full_name"),
+        Index("idx_students_owner_name", "created_by_user_id", "full_name", "id"),
         UniqueConstraint("created_by_user_id", "document_number", name="uq_students_owner_document"),
         CheckConstraint("char_length(trim(document_number)) > 0", name="chk_students_document_not_empty"),
         CheckConstraint("bow_pounds IS NULL OR bow_pounds > 0", name="chk_students_bow_positive"),
@@ -211,6 +216,19 @@ class StudentRoutineAssignment(Base):
     __tablename__ = "student_routine_assignments"
     __table_args__ = (
         Index("idx_assignments_student_status", "student_id", "status"),
+        Index("idx_assignments_created_id", "created_at", "id"),
+        Index("idx_assignments_week_status", "week_start", "status"),
+        # MySQL no tiene índices parciales: ver _add_mysql_active_week_key más
+        # abajo. En PostgreSQL la migración 13 lo cambia por una restricción de
+        # exclusión sobre el rango de la semana.
+        Index(
+            "uq_assignments_active_week",
+            "student_id",
+            "week_start",
+            unique=True,
+            sqlite_where=text("status = 'active'"),
+            postgresql_where=text("status = 'active'"),
+        ).ddl_if(dialect=("sqlite", "postgresql")),
         CheckConstraint(
             "end_date IS NULL OR start_date IS NULL OR end_date >= start_date",
             name="chk_assignments_date_range",
@@ -234,7 +252,12 @@ class StudentRoutineAssignment(Base):
     )
     start_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
     end_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+    # Lunes de la semana de start_date: clave de igualdad para las búsquedas
+    # por semana y para la unicidad de asignaciones activas.
+    week_start: Mapped[Optional[date]] = mapped_column(Date, nullable=True, default=default_week_start)
     status: Mapped[str] = mapped_column(Enum("active", "paused", "finished", name="status_enum"), default="active", nullable=False)
+    objective: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    professor_notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, nullable=False
@@ -245,6 +268,56 @@ class StudentRoutineAssignment(Base):
 
     student: Mapped[Student] = relationship(back_populates="assignments")
     routine: Mapped[Routine] = relationship(back_populates="assignments")
+    overrides: Mapped[List["AssignmentExerciseOverride"]] = relationship(
+        back_populates="assignment",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="(AssignmentExerciseOverride.day_index, AssignmentExerciseOverride.sort_order)",
+    )
+
+
+# Misma columna generada e índice que crea la migración 13 en MySQL, para que
+# create_all y las bases migradas tengan la misma unicidad semanal.
+_add_mysql_active_week_key = DDL(
+    """
+    ALTER TABLE student_routine_assignments
+      ADD COLUMN active_week_key INT
+        AS (IF(status = 'active', YEARWEEK(week_start, 3), NULL)) STORED,
+      ADD UNIQUE INDEX uq_assignments_active_week (student_id, active_week_key)
+    """
+).execute_if(dialect="mysql")
+event.listen(StudentRoutineAssignment.__table__, "after_create", _add_mysql_active_week_key)
+
+
+class AssignmentExerciseOverride(Base):
+    # Ejercicios temporales de una asignación ("day_index" es la posición del
+    # día dentro de la rutina, como las claves day_N del antiguo JSON de notes).
+    __tablename__ = "assignment_exercise_overrides"
+    __table_args__ = (
+        UniqueConstraint("assignment_id", "day_index", "exercise_id", name="uq_assignment_override_day_exercise"),
+        Index("idx_assignment_overrides_exercise", "exercise_id"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    assignment_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("student_routine_assignments.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    day_index: Mapped[int] = mapped_column(Integer, nullable=False)
+    exercise_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("exercises.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    sort_order: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    arrows_override: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    rounds_override: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    arrows_per_round_override: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    distance_override_m: Mapped[Optional[float]] = mapped_column(Numeric(6, 2), nullable=True)
+    description_override: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    assignment: Mapped[StudentRoutineAssignment] = relationship(back_populates="overrides")
 
 
 class StudentRoutineHistory(Base):
@@ -278,3 +351,78 @@ class StudentRoutineHistory(Base):
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
     )
+
+
+class DeletedRecord(Base):
+    __tablename__ = "deleted_records"
+    __table_args__ = (
+        Index("idx_deleted_records_deleted_at", "deleted_at"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    entity: Mapped[str] = mapped_column(String(30), nullable=False)
+    record_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    created_by_user_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    deleted_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+
+
+class ExportJob(Base):
+    __tablename__ = "export_jobs"
+    __table_args__ = (
+        Index("idx_export_jobs_status_created", "status", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    created_by_user_id: Mapped[Optional[int]] = mapped_column(BigInteger, ForeignKey("users.id"), nullable=True)
+    status: Mapped[str] = mapped_column(String(20), default="queued", nullable=False)
+    format: Mapped[str] = mapped_column(String(20), nullable=False)
+    file_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    params_json: Mapped[str] = mapped_column(Text, nullable=False)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class ScheduledJobRun(Base):
+    __tablename__ = "scheduled_job_runs"
+
+    job_name: Mapped[str] = mapped_column(String(60), primary_key=True)
+    last_run_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class AssignmentEffectivePlan(Base):
+    __tablename__ = "assignment_effective_plans"
+
+    assignment_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("student_routine_assignments.id", ondelete="CASCADE"),
+        primary_key=True,
+        autoincrement=False,
+    )
+    format_version: Mapped[int] = mapped_column(Integer, nullable=False)
+    objective: Mapped[str] = mapped_column(String(255), nullable=False)
+    professor_notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    weekly_total_arrows: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    days_json: Mapped[str] = mapped_column(Text, nullable=False)
+    computed_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+
+
+class AssignmentPlanDependency(Base):
+    __tablename__ = "assignment_plan_dependencies"
+    __table_args__ = (
+        Index("idx_plan_dependencies_exercise", "exercise_id"),
+    )
+
+    assignment_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("student_routine_assignments.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    exercise_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import base64
+import json
+from datetime import date, datetime
+
+from fastapi import HTTPException, status
+
+# La página siguiente se informa en este header para no cambiar la forma de las
+# respuestas de listado (siguen siendo listas).
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value: object) -> object:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(*values: object) -> str:
+    raw = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("cursor con forma inesperada")
+        decoded: list[object] = []
+        for value, expected_type in zip(values, types):
+            if expected_type is datetime:
+                decoded.append(datetime.fromisoformat(value))
+            elif expected_type is date:
+                decoded.append(date.fromisoformat(value))
+            else:
+                decoded.append(expected_type(value))
+        return tuple(decoded)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido",
+        )
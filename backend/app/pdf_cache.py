@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from .deps import settings
+from .pdf_export import PDF_LAYOUT_VERSION, render_merged_pdf, render_plan_pdf, render_plans_parallel
+
+logger = logging.getLogger(__name__)
+
+# Índice LRU en memoria (clave -> bytes en disco). Se reconstruye desde el
+# directorio la primera vez; cada worker tiene el suyo y un archivo borrado por
+# otro worker simplemente cuenta como miss.
+_pdf_index: OrderedDict[str, int] = OrderedDict()
+_pdf_index_bytes = 0
+_pdf_index_loaded = False
+_pdf_cache_lock = threading.Lock()
+
+
+def _cache_dir() -> Path:
+    if settings.pdf_cache_dir:
+        return Path(settings.pdf_cache_dir)
+    return Path(tempfile.gettempdir()) / "archery_pdf_cache"
+
+
+def _cache_path(key: str) -> Path:
+    return _cache_dir() / f"{key}.pdf"
+
+
+def pdf_cache_key(plan: dict[str, object]) -> str:
+    # Direccionado por contenido: si cambia cualquier dato que se dibuja (o el
+    # diseño), cambia la clave; no hace falta invalidar nada al editar.
+    raw = json.dumps(
+        {"layout": PDF_LAYOUT_VERSION, "plan": plan},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _load_index() -> None:
+    global _pdf_index_bytes, _pdf_index_loaded
+    if _pdf_index_loaded:
+        return
+    _pdf_index_loaded = True
+    directory = _cache_dir()
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith(".pdf")]
+    except FileNotFoundError:
+        return
+    for entry in sorted(entries, key=lambda item: item.stat().st_mtime):
+        size = entry.stat().st_size
+        _pdf_index[entry.name[:-4]] = size
+        _pdf_index_bytes += size
+
+
+def _evict_locked(max_bytes: int) -> None:
+    global _pdf_index_bytes
+    while _pdf_index and _pdf_index_bytes > max_bytes:
+        key, size = _pdf_index.popitem(last=False)
+        _pdf_index_bytes -= size
+        try:
+            _cache_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def open_cached_pdf(key: str) -> BinaryIO | None:
+    # Devuelve el archivo abierto: aunque otro request lo desaloje mientras se
+    # envía, el descriptor sigue siendo válido hasta cerrarlo.
+    global _pdf_index_bytes
+    if not settings.pdf_cache_enabled:
+        return None
+    path = _cache_path(key)
+    try:
+        handle = path.open("rb")
+    except FileNotFoundError:
+        with _pdf_cache_lock:
+            size = _pdf_index.pop(key, None)
+            if size is not None:
+                _pdf_index_bytes -= size
+        return None
+    with _pdf_cache_lock:
+        _load_index()
+        if key in _pdf_index:
+            _pdf_index.move_to_end(key)
+    try:
+        # El mtime es el "último uso" con el que se reconstruye el orden LRU.
+        os.utime(path)
+    except OSError:
+        pass
+    return handle
+
+
+def get_cached_pdf(key: str) -> bytes | None:
+    handle = open_cached_pdf(key)
+    if handle is None:
+        return None
+    with handle:
+        return handle.read()
+
+
+def store_cached_pdf(key: str, data: bytes) -> None:
+    global _pdf_index_bytes
+    if not settings.pdf_cache_enabled:
+        return
+    max_bytes = settings.pdf_cache_max_mb * 1024 * 1024
+    if len(data) > max_bytes:
+        return
+    path = _cache_path(key)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica: otro request nunca ve un PDF a medio escribir.
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp_name, path)
+    except OSError:
+        logger.warning("No se pudo guardar el PDF %s en el cache", key, exc_info=True)
+        return
+    with _pdf_cache_lock:
+        _load_index()
+        previous = _pdf_index.pop(key, None)
+        if previous is not None:
+            _pdf_index_bytes -= previous
+        _pdf_index[key] = len(data)
+        _pdf_index_bytes += len(data)
+        _evict_locked(max_bytes)
+
+
+def cached_plan_pdf(plan: dict[str, object]) -> tuple[str, bytes]:
+    key = pdf_cache_key(plan)
+    pdf_bytes = get_cached_pdf(key)
+    if pdf_bytes is None:
+        pdf_bytes = render_plan_pdf(plan)
+        store_cached_pdf(key, pdf_bytes)
+    return key, pdf_bytes
+
+
+def cached_plan_pdfs(plans: list[dict[str, object]]) -> list[tuple[str, bytes]]:
+    # Lotes: solo los que no están en cache se generan, en paralelo.
+    keys = [pdf_cache_key(plan) for plan in plans]
+    found: dict[str, bytes] = {}
+    missing: dict[str, dict[str, object]] = {}
+    for key, plan in zip(keys, plans):
+        if key in found or key in missing:
+            continue
+        pdf_bytes = get_cached_pdf(key)
+        if pdf_bytes is None:
+            missing[key] = plan
+        else:
+            found[key] = pdf_bytes
+    if missing:
+        for key, pdf_bytes in zip(missing, render_plans_parallel(list(missing.values()))):
+            store_cached_pdf(key, pdf_bytes)
+            found[key] = pdf_bytes
+    return [(key, found[key]) for key in keys]
+
+
+def iter_plan_pdfs(plans: list[dict[str, object]]) -> Iterator[bytes]:
+    # Para lotes grandes: de a tandas del tamaño del pool, así en memoria hay
+    # pocos PDF a la vez en lugar del lote completo.
+    chunk_size = max(settings.pdf_render_workers, 1) * 2
+    for start in range(0, len(plans), chunk_size):
+        for _, pdf_bytes in cached_plan_pdfs(plans[start:start + chunk_size]):
+            yield pdf_bytes
+
+
+def cached_merged_pdf(plans: list[dict[str, object]]) -> tuple[str, bytes]:
+    key = pdf_cache_key({"merged": plans})
+    pdf_bytes = get_cached_pdf(key)
+    if pdf_bytes is None:
+        pdf_bytes = render_merged_pdf(plans)
+        store_cached_pdf(key, pdf_bytes)
+    return key, pdf_bytes
+
+
+def clear_pdf_cache() -> None:
+    global _pdf_index_bytes, _pdf_index_loaded
+    with _pdf_cache_lock:
+        _load_index()
+        for key in list(_pdf_index):
+            try:
+                _cache_path(key).unlink()
+            except FileNotFoundError:
+                pass
+        _pdf_index.clear()
+        _pdf_index_bytes = 0
+        _pdf_index_loaded = False
@@ -0,0 +1,481 @@
+from __future__ import annotations
+
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache
+from io import BytesIO
+
+from fastapi import HTTPException, status
+
+from .deps import settings
+from .models import StudentRoutineAssignment
+
+# Se incluye en la clave del cache de PDFs: subirlo cuando cambie el diseño
+# para que no se sirvan documentos generados con la versión anterior.
+PDF_LAYOUT_VERSION = 2
+
+# ReportLab es CPU puro y retiene el GIL: los lotes se reparten en procesos.
+_render_pool: ProcessPoolExecutor | None = None
+_render_pool_lock = threading.Lock()
+
+
+def _parse_plan_date(value: str | None) -> date | None:
+    return date.fromisoformat(value) if value else None
+
+
+def assignment_pdf_plan(
+    assignment: StudentRoutineAssignment,
+    effective_days: list[dict[str, object]],
+    objective: str,
+    professor_notes: str,
+) -> dict[str, object]:
+    # Todo lo que se dibuja sale de acá; es también la entrada del hash del cache.
+    return {
+        "student_name": assignment.student.full_name,
+        "start_date": assignment.start_date.isoformat() if assignment.start_date else None,
+        "end_date": assignment.end_date.isoformat() if assignment.end_date else None,
+        "status": assignment.status,
+        "objective": objective,
+        "professor_notes": professor_notes,
+        "days": effective_days,
+    }
+
+
+def history_pdf_plan(snapshot: dict[str, object]) -> dict[str, object]:
+    # El snapshot guardado al finalizar ya tiene los días efectivos: mismo plan
+    # (y misma clave de cache) que el PDF en vivo de la asignación finalizada.
+    return {
+        "student_name": snapshot.get("student_name") or "",
+        "start_date": snapshot.get("start_date"),
+        "end_date": snapshot.get("end_date"),
+        "status": "finished",
+        "objective": snapshot.get("objective") or "Determinante",
+        "professor_notes": snapshot.get("professor_notes") or "",
+        "days": snapshot.get("days") or [],
+    }
+
+
+def sanitize_filename(value: str) -> str:
+    # Permite espacios y caracteres Unicode, reemplazando solo caracteres inválidos
+    # para nombres de archivo en Windows/macOS/Linux.
+    safe = re.sub(r'[\\/:*?"<>|]+', "_", value.strip())
+    safe = re.sub(r"\s+", " ", safe).strip(" .")
+    return safe or "rutina"
+
+
+def plan_pdf_filename(plan: dict[str, object]) -> str:
+    start_date = _parse_plan_date(plan["start_date"])
+    end_date = _parse_plan_date(plan["end_date"])
+    if start_date and end_date:
+        start_day = start_date.strftime("%d")
+        start_month = start_date.strftime("%m")
+        end_day = end_date.strftime("%d")
+        end_month = end_date.strftime("%m")
+        base_name = (
+            f"PLAN SEMANAL {plan['student_name']} "
+            f"{start_day}-{start_month} a {end_day}-{end_month}"
+        )
+    else:
+        base_name = f"PLAN SEMANAL {plan['student_name']}"
+    return sanitize_filename(f"{base_name}.pdf")
+
+
+def render_plan_pdf(plan: dict[str, object]) -> bytes:
+    return render_plans_pdf([plan])
+
+
+def render_plans_pdf(plans: list[dict[str, object]]) -> bytes:
+    # Varios planes en un mismo documento: cada uno arranca en página nueva.
+    try:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+    except Exception as exc:  # pragma: no cover
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"No se pudo generar PDF (falta dependencia): {exc}",
+        )
+
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setTitle("Plan semanal")
+    for index, plan in enumerate(plans):
+        if index:
+            pdf.showPage()
+        _draw_plan(pdf, plan)
+    pdf.save()
+    pdf_bytes = buffer.getvalue()
+    buffer.close()
+    return pdf_bytes
+
+
+# Plan mínimo para el pre-calentamiento: ejercita fuentes, colores y el
+# camino completo de dibujo sin tocar la base ni el cache.
+_WARMUP_PLAN: dict[str, object] = {
+    "student_name": "Deportista",
+    "start_date": "2026-01-05",
+    "end_date": "2026-01-11",
+    "status": "active",
+    "objective": "Determinante",
+    "professor_notes": "Notas",
+    "days": [
+        {
+            "label": "Día 1",
+            "items": [
+                {
+                    "name": "Ejercicio",
+                    "arrows": 36,
+                    "rounds": 6,
+                    "arrows_per_round": 6,
+                    "distance": 18.0,
+                    "description": "Descripción",
+                }
+            ],
+        }
+    ],
+}
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=settings.pdf_render_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _render_pool
+
+
+def shutdown_pdf_render_pool() -> None:
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+            _render_pool = None
+
+
+def _warm_up_renderer() -> None:
+    render_plan_pdf(_WARMUP_PLAN)
+
+
+def warm_up_pdf_renderer() -> None:
+    # Con PDF_PREWARM el primer PDF después de un deploy no paga la importación
+    # de ReportLab ni la carga de fuentes. Sin él, nada de ReportLab se importa
+    # hasta que llega el primer export.
+    _warm_up_renderer()
+    if settings.pdf_render_workers > 0:
+        # Una tarea por proceso: el pool los crea a medida que no encuentra
+        # workers libres. No se espera el resultado para no demorar el arranque.
+        pool = _get_render_pool()
+        for _ in range(settings.pdf_render_workers):
+            pool.submit(_warm_up_renderer)
+
+
+def render_plans_parallel(plans: list[dict[str, object]]) -> list[bytes]:
+    # Un PDF por plan, en el mismo orden.
+    if settings.pdf_render_workers <= 0 or len(plans) <= 1:
+        return [render_plan_pdf(plan) for plan in plans]
+    return list(_get_render_pool().map(render_plan_pdf, plans))
+
+
+def render_merged_pdf(plans: list[dict[str, object]]) -> bytes:
+    # Un solo documento no se puede repartir entre procesos, pero se genera en
+    # el pool igual para no retener el GIL del worker web.
+    if settings.pdf_render_workers <= 0:
+        return render_plans_pdf(plans)
+    return _get_render_pool().submit(render_plans_pdf, plans).result()
+
+
+# Medición de texto memoizada por proceso: en un lote los nombres y
+# descripciones de los ejercicios se repiten entre deportistas, y dentro de un
+# plan las mismas líneas se usan para calcular alturas y para dibujar.
+@lru_cache(maxsize=8192)
+def _split_lines(text: str, font_name: str, size: int, max_width: float) -> tuple[str, ...]:
+    from reportlab.lib.utils import simpleSplit
+
+    return tuple(simpleSplit(text, font_name, size, max_width))
+
+
+@lru_cache(maxsize=1024)
+def text_width(text: str, font_name: str, size: int) -> float:
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    return stringWidth(text, font_name, size)
+
+
+def _format_distance(distance: float) -> str:
+    if float(distance).is_integer():
+        return str(int(distance))
+    return f"{distance:.1f}".rstrip("0").rstrip(".")
+
+
+def _layout_day(day: dict[str, object], text_w: float, mm: float) -> dict[str, object]:
+    # Modelo de layout de una tarjeta de día: líneas ya cortadas y alturas. La
+    # estimación de espacio (saltos de página) y el dibujo usan este mismo
+    # resultado, así cada texto se mide una sola vez.
+    items: list[dict[str, object]] = []
+    height = 17 * mm
+    for item in day["items"]:
+        arrows = int(item["arrows"])
+        rounds = max(int(item.get("rounds") or 1), 1)
+        arrows_per_round = max(int(item.get("arrows_per_round") or 0), 0)
+        distance = float(item["distance"])
+        description = str(item["description"]).strip()
+        meta = (
+            f"{rounds} rondas x {arrows_per_round} disparos  ·  "
+            f"{_format_distance(distance)} m  ·  Total {arrows}"
+        )
+        name_lines = _split_lines(str(item["name"]).strip(), "Helvetica-Bold", 11, text_w)
+        meta_lines = _split_lines(meta, "Helvetica", 9, text_w)
+        desc_lines = _split_lines(description, "Helvetica", 9, text_w) if description else ()
+        height += max(
+            15 * mm,
+            (len(name_lines) * 4.3 * mm) + (len(meta_lines) * 3.7 * mm) + (len(desc_lines) * 3.8 * mm) + (4 * mm),
+        )
+        items.append({"name_lines": name_lines, "meta_lines": meta_lines, "desc_lines": desc_lines})
+    if not items:
+        return {"items": items, "height": height + 10 * mm}
+    return {"items": items, "height": height + 8 * mm}
+
+
+def _draw_plan(pdf, plan: dict[str, object]) -> None:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+
+    student_name = str(plan["student_name"])
+    start_date = _parse_plan_date(plan["start_date"])
+    end_date = _parse_plan_date(plan["end_date"])
+    objective = str(plan["objective"])
+    professor_notes = str(plan["professor_notes"] or "")
+    effective_days = plan["days"]
+
+    page_w, page_h = A4
+    x_left = 15 * mm
+    x_right = page_w - (15 * mm)
+    content_w = x_right - x_left
+    page_margin_bottom = 16 * mm
+    y = page_h
+    page_number = 0
+
+    brand = colors.HexColor("#fb5a13")
+    brand_dark = colors.HexColor("#c2410c")
+    text_primary = colors.HexColor("#12213a")
+    text_secondary = colors.HexColor("#536179")
+    text_muted = colors.HexColor("#748092")
+    card_fill = colors.white
+    card_border = colors.HexColor("#e6eaf2")
+    soft_fill = colors.HexColor("#f7f8fb")
+    soft_orange = colors.HexColor("#fff1e8")
+
+    def draw_round_rect(x: float, y_top: float, width: float, height: float, *, fill_color, stroke_color=card_border, radius: float = 5 * mm, stroke_width: float = 1):
+        pdf.setFillColor(fill_color)
+        pdf.setStrokeColor(stroke_color)
+        pdf.setLineWidth(stroke_width)
+        pdf.roundRect(x, y_top - height, width, height, radius, stroke=1, fill=1)
+
+    def draw_text(
+        text: str,
+        x: float,
+        y_baseline: float,
+        *,
+        font_name: str = "Helvetica",
+        size: int = 10,
+        color=text_primary,
+    ):
+        pdf.setFont(font_name, size)
+        pdf.setFillColor(color)
+        pdf.drawString(x, y_baseline, text)
+
+    def split_text(text: str, *, font_name: str, size: int, max_width: float) -> list[str]:
+        if not text:
+            return []
+        return list(_split_lines(text, font_name, size, max_width))
+
+    def draw_multiline_text(
+        text: str,
+        x: float,
+        y_top: float,
+        *,
+        font_name: str = "Helvetica",
+        size: int = 10,
+        color=text_secondary,
+        leading: float = 4.1 * mm,
+        max_width: float,
+    ) -> float:
+        lines = split_text(text, font_name=font_name, size=size, max_width=max_width)
+        cursor_y = y_top
+        for line in lines:
+            draw_text(line, x, cursor_y, font_name=font_name, size=size, color=color)
+            cursor_y -= leading
+        return cursor_y
+
+    def draw_footer():
+        footer_y = 10 * mm
+        pdf.setStrokeColor(card_border)
+        pdf.setLineWidth(0.7)
+        pdf.line(x_left, footer_y + 4 * mm, x_right, footer_y + 4 * mm)
+        draw_text(
+            f"Página {page_number}",
+            x_right - 18 * mm,
+            footer_y,
+            font_name="Helvetica",
+            size=8,
+            color=text_muted,
+        )
+
+    def start_page(*, include_summary: bool):
+        nonlocal y, page_number
+        if page_number:
+            pdf.showPage()
+        page_number += 1
+        pdf.setFillColor(colors.white)
+        pdf.setStrokeColor(colors.white)
+        pdf.rect(0, 0, page_w, page_h, stroke=0, fill=1)
+
+        header_h = 24 * mm
+        draw_round_rect(x_left, page_h - 12 * mm, content_w, header_h, fill_color=soft_fill, stroke_color=soft_fill, radius=6 * mm, stroke_width=0)
+
+        title_center_x = x_left + (content_w / 2)
+        club_title = "ARQUEROS ANDINOS"
+        doc_title = "Plan semanal de entrenamiento"
+        club_width = text_width(club_title, "Helvetica-Bold", 11)
+        doc_width = text_width(doc_title, "Helvetica-Bold", 18)
+        draw_text(club_title, title_center_x - (club_width / 2), page_h - 16.8 * mm, font_name="Helvetica-Bold", size=11, color=brand_dark)
+        draw_text(doc_title, title_center_x - (doc_width / 2), page_h - 24.2 * mm, font_name="Helvetica-Bold", size=18, color=text_primary)
+
+        y = page_h - 42 * mm
+
+        if include_summary:
+            draw_text(f"Deportista: {student_name}", x_left, y, font_name="Helvetica-Bold", size=13, color=text_primary)
+            y -= 5.5 * mm
+            date_range = (
+                f"Semana: {start_date.strftime('%d/%m/%Y') if start_date else '--/--/----'}"
+                f" al {end_date.strftime('%d/%m/%Y') if end_date else '--/--/----'}"
+            )
+            draw_text(date_range, x_left, y, font_name="Helvetica", size=9, color=text_secondary)
+            y -= 5 * mm
+
+            objective_lines = split_text(
+                f"Objetivo: {objective}",
+                font_name="Helvetica",
+                size=10,
+                max_width=content_w,
+            )
+            for line in objective_lines:
+                draw_text(line, x_left, y, font_name="Helvetica", size=10, color=text_secondary)
+                y -= 4.2 * mm
+            y -= 1.5 * mm
+
+    def ensure_space(required_height: float):
+        nonlocal y
+        if y - required_height < page_margin_bottom:
+            draw_footer()
+            start_page(include_summary=False)
+
+    weekly_total = 0
+    day_totals: list[int] = []
+    for day in effective_days:
+        total = sum(int(item["arrows"]) for item in day["items"])
+        day_totals.append(total)
+        weekly_total += total
+
+    start_page(include_summary=True)
+
+    summary_gap = 3 * mm
+    summary_width = (content_w - (2 * summary_gap)) / 3
+    summary_height = 19 * mm
+    summary_y = y
+    status_finished = plan["status"] == "finished"
+    status_label = "Finalizada" if status_finished else "En curso"
+    status_color = colors.HexColor("#dc2626") if status_finished else colors.HexColor("#15803d")
+    summary_items = [
+        ("Volumen semanal", f"{weekly_total} disparos"),
+        ("Días programados", str(len(effective_days))),
+        ("Estado", status_label),
+    ]
+    for idx, (label, value) in enumerate(summary_items):
+        card_x = x_left + (idx * (summary_width + summary_gap))
+        draw_round_rect(card_x, summary_y, summary_width, summary_height, fill_color=card_fill, stroke_color=card_border, radius=4 * mm)
+        draw_text(label.upper(), card_x + 4 * mm, summary_y - 6 * mm, font_name="Helvetica-Bold", size=7, color=text_muted)
+        draw_text(value, card_x + 4 * mm, summary_y - 13 * mm, font_name="Helvetica-Bold", size=12, color=brand if idx < 2 else status_color)
+    y -= summary_height + 5 * mm
+
+    clean_professor_notes = (professor_notes or "").strip()
+    if clean_professor_notes:
+        notes_lines = []
+        for raw_line in clean_professor_notes.splitlines():
+            if not raw_line.strip():
+                notes_lines.append("")
+                continue
+            notes_lines.extend(split_text(raw_line, font_name="Helvetica", size=9, max_width=content_w - 10 * mm))
+        notes_height = 11 * mm + max(len(notes_lines), 1) * (3.9 * mm)
+        ensure_space(notes_height + 2 * mm)
+        draw_round_rect(x_left, y, content_w, notes_height, fill_color=soft_orange, stroke_color=colors.HexColor("#fbd0b5"), radius=4 * mm)
+        draw_text("Notas del profesor", x_left + 5 * mm, y - 6 * mm, font_name="Helvetica-Bold", size=10, color=brand_dark)
+        notes_y = y - 11 * mm
+        if notes_lines:
+            for note_line in notes_lines:
+                if note_line:
+                    draw_text(note_line, x_left + 5 * mm, notes_y, font_name="Helvetica", size=9, color=text_secondary)
+                notes_y -= 3.9 * mm
+        y -= notes_height + 5 * mm
+
+    day_card_width = min(content_w, 170 * mm)
+    day_card_x = x_left + ((content_w - day_card_width) / 2)
+
+    badge_size = 7.5 * mm
+    text_x = day_card_x + 9 * mm + badge_size + 4 * mm
+    text_w = (day_card_x + day_card_width) - (text_x + 5 * mm)
+    day_layouts = [_layout_day(day, text_w, mm) for day in effective_days]
+
+    for idx, (day, day_layout) in enumerate(zip(effective_days, day_layouts), start=1):
+        day_total = day_totals[idx - 1]
+        card_height = day_layout["height"]
+        ensure_space(card_height + 2 * mm)
+        draw_round_rect(day_card_x, y, day_card_width, card_height, fill_color=card_fill, stroke_color=card_border, radius=5 * mm)
+        pdf.setFillColor(brand)
+        pdf.roundRect(day_card_x, y - card_height, 5 * mm, card_height, 5 * mm, stroke=0, fill=1)
+
+        day_top_y = y - 6 * mm
+        draw_text(str(day.get("label") or f"Día {idx}"), day_card_x + 9 * mm, day_top_y, font_name="Helvetica-Bold", size=13, color=text_primary)
+        draw_round_rect(day_card_x + day_card_width - 35 * mm, y - 4 * mm, 29 * mm, 8.5 * mm, fill_color=soft_orange, stroke_color=soft_orange, radius=3 * mm, stroke_width=0)
+        draw_text(f"{day_total} disparos", day_card_x + day_card_width - 31 * mm, y - 9.2 * mm, font_name="Helvetica-Bold", size=8, color=brand_dark)
+
+        cursor_y = y - 16 * mm
+        items = day_layout["items"]
+        if not items:
+            draw_text("Sin ejercicios programados.", day_card_x + 9 * mm, cursor_y, font_name="Helvetica", size=10, color=text_secondary)
+            y -= card_height + 4 * mm
+            continue
+
+        for item_index, item in enumerate(items, start=1):
+            badge_x = day_card_x + 9 * mm
+            badge_y = cursor_y + 1.5 * mm
+            draw_round_rect(badge_x, badge_y, badge_size, badge_size, fill_color=soft_fill, stroke_color=soft_fill, radius=2.2 * mm, stroke_width=0)
+            draw_text(str(item_index), badge_x + 2.35 * mm, badge_y - 5 * mm, font_name="Helvetica-Bold", size=8, color=brand_dark)
+
+            line_y = cursor_y
+            for line in item["name_lines"]:
+                draw_text(line, text_x, line_y, font_name="Helvetica-Bold", size=11, color=text_primary)
+                line_y -= 4.2 * mm
+            for line in item["meta_lines"]:
+                draw_text(line, text_x, line_y, font_name="Helvetica", size=9, color=text_muted)
+                line_y -= 4.2 * mm
+            for line in item["desc_lines"]:
+                draw_text(line, text_x, line_y, font_name="Helvetica", size=9, color=text_secondary)
+                line_y -= 3.9 * mm
+
+            cursor_y = min(line_y, cursor_y - 15 * mm)
+            if item_index < len(items):
+                pdf.setStrokeColor(card_border)
+                pdf.setLineWidth(0.8)
+                pdf.line(day_card_x + 9 * mm, cursor_y + 2 * mm, day_card_x + day_card_width - 5 * mm, cursor_y + 2 * mm)
+                cursor_y -= 4 * mm
+
+        y -= card_height + 4 * mm
+
+    draw_footer()
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .db_locks import advisory_lock
+from .export_jobs import sweep_stale_export_jobs
+from .models import ScheduledJobRun
+from .student_retention import INACTIVE_PURGE_DAYS, purge_inactive_students
+from .sync import prune_deleted_records
+
+logger = logging.getLogger(__name__)
+
+PURGE_LOCK_NAME = "archery_student_purge"
+PURGE_JOB_NAME = "student_purge"
+# Cada worker revisa con esta frecuencia si ya venció el intervalo; la última
+# ejecución queda en scheduled_job_runs, así que corre uno solo por intervalo.
+SCHEDULER_POLL_SECONDS = 60
+
+_stop_event = threading.Event()
+_scheduler_thread: threading.Thread | None = None
+
+
+def _purge_is_due(db: Session, now: datetime, min_interval_seconds: float | None) -> bool:
+    if min_interval_seconds is None:
+        return True
+    last_run = db.get(ScheduledJobRun, PURGE_JOB_NAME)
+    return last_run is None or now - last_run.last_run_at >= timedelta(seconds=min_interval_seconds)
+
+
+def _record_purge_run(db: Session, now: datetime) -> None:
+    last_run = db.get(ScheduledJobRun, PURGE_JOB_NAME)
+    if last_run is None:
+        db.add(ScheduledJobRun(job_name=PURGE_JOB_NAME, last_run_at=now))
+    else:
+        last_run.last_run_at = now
+    db.commit()
+
+
+def run_student_purge(
+    engine: Engine,
+    *,
+    days: int = INACTIVE_PURGE_DAYS,
+    min_interval_seconds: float | None = None,
+) -> dict[str, object]:
+    started_at = datetime.utcnow()
+    started = time.perf_counter()
+    deleted = 0
+    ran = False
+    with engine.connect() as connection:
+        # Con varios workers, solo el que obtiene el lock ejecuta la purga, y
+        # solo si ningún otro la corrió dentro del intervalo.
+        with advisory_lock(connection, PURGE_LOCK_NAME, wait=False) as acquired:
+            if acquired:
+                db = Session(bind=connection, autoflush=False)
+                try:
+                    ran = _purge_is_due(db, started_at, min_interval_seconds)
+                    db.rollback()
+                    if ran:
+                        deleted = purge_inactive_students(db, days)
+                        prune_deleted_records(db)
+                        _record_purge_run(db, started_at)
+                finally:
+                    db.close()
+    result: dict[str, object] = {
+        "status": "completed" if ran else "skipped",
+        "deleted": deleted,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "started_at": started_at,
+    }
+    if ran:
+        logger.info(
+            "Purga de deportistas inactivos: %s eliminados en %s ms",
+            result["deleted"],
+            result["duration_ms"],
+        )
+    return result
+
+
+def _scheduler_loop(engine: Engine, interval_seconds: float, days: int) -> None:
+    while not _stop_event.is_set():
+        try:
+            run_student_purge(engine, days=days, min_interval_seconds=interval_seconds)
+        except Exception:
+            logger.exception("Falló la purga programada de deportistas inactivos")
+        try:
+            sweep_stale_export_jobs(engine)
+        except Exception:
+            logger.exception("Falló la revisión de exportaciones interrumpidas")
+        _stop_event.wait(min(interval_seconds, SCHEDULER_POLL_SECONDS))
+
+
+def start_student_purge_scheduler(
+    engine: Engine,
+    *,
+    interval_minutes: int,
+    days: int = INACTIVE_PURGE_DAYS,
+) -> None:
+    global _scheduler_thread
+    if _scheduler_thread is not None and _scheduler_thread.is_alive():
+        return
+    _stop_event.clear()
+    _scheduler_thread = threading.Thread(
+        target=_scheduler_loop,
+        args=(engine, max(interval_minutes, 1) * 60, days),
+        name="student-purge-scheduler",
+        daemon=True,
+    )
+    _scheduler_thread.start()
+
+
+def stop_student_purge_scheduler(timeout: float = 5) -> None:
+    global _scheduler_thread
+    _stop_event.set()
+    if _scheduler_thread is not None:
+        _scheduler_thread.join(timeout)
+        _scheduler_thread = None
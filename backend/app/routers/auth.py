@@ -24,6 +24,7 @@ from ..security import (
     get_current_user_optional,
     hash_password,
     hash_refresh_token,
+    invalidate_cached_user,
     verify_password,
 )
 
@@ -55,6 +56,7 @@ def revoke_refresh_session(user: User, db: Session) -> None:
     user.refresh_token_expires_at = None
     db.add(user)
     db.commit()
+    invalidate_cached_user(user.id)
 
 
 def get_user_from_refresh_token(
@@ -219,5 +221,6 @@ def change_password(
     current_user.refresh_token_expires_at = None
     db.add(current_user)
     db.commit()
+    invalidate_cached_user(current_user.id)
 
     return {"detail": "Contraseña actualizada correctamente. Inicia sesión nuevamente."}
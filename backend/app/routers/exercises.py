@@ -1,14 +1,19 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, text
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select, text, update
 from sqlalchemy.orm import Session
 
+from ..conditional import collection_etag, not_modified
 from ..deps import get_db
+from ..effective_plans import refresh_plans_for_exercises
 from ..ownership import apply_owner_visibility, ensure_record_access
 from ..schemas import ExerciseCreate, ExerciseOut, ExerciseUpdate
-from ..models import Exercise, User
-from ..security import get_current_user, require_roles
+from ..models import Exercise, Routine, User
+from ..security import require_roles
+from ..sync import record_deletion
 
 router = APIRouter(prefix="/exercises", tags=["exercises"])
 
@@ -45,10 +50,14 @@ def _apply_rounds_logic(data: dict, *, existing: Exercise | None = None) -> dict
 
 @router.get("", response_model=list[ExerciseOut])
 def list_exercises(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
+    cached = not_modified(request, response, collection_etag(db, Exercise, current_user, request))
+    if cached is not None:
+        return cached
     stmt = apply_owner_visibility(select(Exercise), Exercise, current_user).order_by(Exercise.name)
     return db.scalars(stmt).all()
 
@@ -57,8 +66,7 @@ def list_exercises(
 def create_exercise(
     payload: ExerciseCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
     payload_data = _apply_rounds_logic(payload.dict())
     payload_data["created_by_user_id"] = current_user.id
@@ -73,8 +81,7 @@ def create_exercise(
 def get_exercise(
     exercise_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
     exercise = db.get(Exercise, exercise_id)
     if not exercise:
@@ -88,8 +95,7 @@ def update_exercise(
     exercise_id: int,
     payload: ExerciseUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
     exercise = db.get(Exercise, exercise_id)
     if not exercise:
@@ -98,6 +104,7 @@ def update_exercise(
     payload_data = _apply_rounds_logic(payload.dict(), existing=exercise)
     for field, value in payload_data.items():
         setattr(exercise, field, value)
+    refresh_plans_for_exercises(db, {exercise.id})
     db.commit()
     db.refresh(exercise)
     return exercise
@@ -107,8 +114,7 @@ def update_exercise(
 def delete_exercise(
     exercise_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
     exercise = db.get(Exercise, exercise_id)
     if not exercise:
@@ -155,7 +161,17 @@ def delete_exercise(
                 text("DELETE FROM routine_day_exercises WHERE id = :id"),
                 {"id": int(row["routine_day_exercise_id"])},
             )
+        touched_routine_ids = {int(row["routine_id"]) for row in reference_rows}
+        if touched_routine_ids:
+            db.execute(
+                update(Routine)
+                .where(Routine.id.in_(touched_routine_ids))
+                .values(updated_at=datetime.utcnow())
+            )
+        record_deletion(db, "exercises", exercise.id, exercise.created_by_user_id)
         db.delete(exercise)
+        # Después del borrado: los overrides que lo usaban caen por CASCADE.
+        refresh_plans_for_exercises(db, {exercise.id})
         db.commit()
     except Exception:
         db.rollback()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.orm import Session
+
+from ..deps import get_db
+from ..export_jobs import (
+    EXPORT_MEDIA_TYPES,
+    enqueue_export_job,
+    export_result_path,
+    fail_stale_export_jobs,
+    is_stale_export_job,
+    load_batch_plans,
+)
+from ..models import ExportJob, User
+from ..ownership import ensure_record_access
+from ..schemas import AssignmentPdfBatchRequest, ExportJobOut
+from ..security import require_roles
+from ..streaming import file_streaming_response
+
+router = APIRouter(prefix="/exports", tags=["exports"])
+
+
+@router.post("", response_model=ExportJobOut, status_code=status.HTTP_202_ACCEPTED)
+def create_export(
+    payload: AssignmentPdfBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
+):
+    # Mismo pedido que POST /assignments/pdf-batch (un solo id con format
+    # "merged" equivale al PDF individual), pero responde de inmediato con el
+    # job; el archivo se consulta en GET /exports/{job_id}.
+    plans = load_batch_plans(
+        db,
+        current_user,
+        assignment_ids=payload.assignment_ids,
+        active_this_week=payload.active_this_week,
+    )
+    return enqueue_export_job(db, current_user, plans, payload.format)
+
+
+@router.get("/{job_id}", response_model=ExportJobOut)
+def get_export(
+    job_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
+):
+    job = db.get(ExportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Exportación no encontrada")
+    ensure_record_access(job.created_by_user_id, current_user, "Exportación no encontrada")
+    if is_stale_export_job(job):
+        # Sin esperar al scheduler: el cliente que consulta no queda con 202 para siempre.
+        fail_stale_export_jobs(db, job_ids=[job.id])
+        db.refresh(job)
+    if job.status == "done":
+        try:
+            handle = export_result_path(job.id).open("rb")
+        except FileNotFoundError:
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="La exportación expiró")
+        return file_streaming_response(
+            handle,
+            media_type=EXPORT_MEDIA_TYPES[job.format],
+            headers={"Content-Disposition": f'attachment; filename="{job.file_name}"'},
+        )
+    if job.status in {"queued", "running"}:
+        response.status_code = status.HTTP_202_ACCEPTED
+        response.headers["Retry-After"] = "1"
+    return job
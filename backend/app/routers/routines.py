@@ -1,25 +1,95 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from datetime import datetime
+from typing import List, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import func, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, selectinload
 
+from ..conditional import collection_etag, not_modified, record_etag
 from ..deps import get_db
+from ..effective_plans import refresh_plans_for_routine
 from ..models import Routine, RoutineDay, RoutineDayExercise, Exercise, User
 from ..ownership import apply_owner_visibility, ensure_record_access
-from ..schemas import RoutineCreate, RoutineOut
-from ..security import get_current_user, require_roles
+from ..schemas import (
+    RoutineCreate,
+    RoutineDayCreate,
+    RoutineDayExerciseCreate,
+    RoutineDayExerciseOut,
+    RoutineDayOut,
+    RoutineDayPatch,
+    RoutineOut,
+    RoutinePatch,
+    RoutineSummaryOut,
+)
+from ..security import require_roles
+from ..sync import record_deletion
 
 router = APIRouter(prefix="/routines", tags=["routines"])
 
 
-@router.get("", response_model=list[RoutineOut])
+def _routine_summaries(db: Session, current_user: User) -> list[RoutineSummaryOut]:
+    # Una sola consulta agregada: el volumen semanal usa la misma regla que el
+    # plan (override de flechas del día o, si no hay, las del ejercicio).
+    stmt = apply_owner_visibility(
+        select(
+            Routine.id,
+            Routine.name,
+            Routine.is_active,
+            Routine.is_template,
+            func.count(func.distinct(RoutineDay.id)).label("day_count"),
+            func.count(RoutineDayExercise.id).label("exercise_count"),
+            func.coalesce(
+                func.sum(func.coalesce(RoutineDayExercise.arrows_override, Exercise.arrows_count)),
+                0,
+            ).label("weekly_arrows"),
+        )
+        .outerjoin(RoutineDay, RoutineDay.routine_id == Routine.id)
+        .outerjoin(RoutineDayExercise, RoutineDayExercise.routine_day_id == RoutineDay.id)
+        .outerjoin(Exercise, Exercise.id == RoutineDayExercise.exercise_id)
+        .group_by(Routine.id, Routine.name, Routine.is_active, Routine.is_template)
+        .order_by(Routine.name),
+        Routine,
+        current_user,
+    )
+    return [RoutineSummaryOut(**row) for row in db.execute(stmt).mappings().all()]
+
+
+def _summary_exercises_version(db: Session, current_user: User) -> str:
+    # weekly_arrows lee Exercise.arrows_count, y editar un ejercicio no toca
+    # routines.updated_at: el ETag del resumen suma la última edición de los
+    # ejercicios usados por las rutinas visibles.
+    referenced_ids = apply_owner_visibility(
+        select(RoutineDayExercise.exercise_id)
+        .join(RoutineDay, RoutineDay.id == RoutineDayExercise.routine_day_id)
+        .join(Routine, Routine.id == RoutineDay.routine_id),
+        Routine,
+        current_user,
+    )
+    last_updated_at = db.execute(
+        select(func.max(Exercise.updated_at)).where(Exercise.id.in_(referenced_ids))
+    ).scalar_one()
+    return last_updated_at.isoformat() if last_updated_at else ""
+
+
+@router.get("", response_model=Union[List[RoutineOut], List[RoutineSummaryOut]])
 def list_routines(
+    request: Request,
+    response: Response,
+    view: str = Query(default="full", pattern="^(full|summary)$"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
+    # Los cambios en días/ejercicios actualizan Routine.updated_at.
+    extra = _summary_exercises_version(db, current_user) if view == "summary" else ""
+    cached = not_modified(request, response, collection_etag(db, Routine, current_user, request, extra=extra))
+    if cached is not None:
+        return cached
+    if view == "summary":
+        # Para selectores: sin cargar el árbol de días/ejercicios.
+        return _routine_summaries(db, current_user)
     stmt = apply_owner_visibility(
         select(Routine)
         .options(
@@ -35,10 +105,23 @@ def list_routines(
 @router.get("/{routine_id}", response_model=RoutineOut)
 def get_routine(
     routine_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
+    # Primero solo dueño y updated_at: si el cliente ya tiene esta versión no
+    # se cargan días ni ejercicios.
+    version = db.execute(
+        select(Routine.created_by_user_id, Routine.updated_at).where(Routine.id == routine_id)
+    ).first()
+    if not version:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
+    ensure_record_access(version.created_by_user_id, current_user, "Rutina no encontrada")
+    cached = not_modified(request, response, record_etag(Routine, routine_id, version.updated_at))
+    if cached is not None:
+        return cached
+
     stmt = (
         select(Routine)
         .where(Routine.id == routine_id)
@@ -57,10 +140,40 @@ def get_routine(
 def create_routine(
     payload: RoutineCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
-    day_numbers = [d.day_number for d in payload.days]
+    _validate_day_payloads(db, payload.days, current_user)
+
+    routine = Routine(
+        created_by_user_id=current_user.id,
+        name=payload.name,
+        description=payload.description,
+        is_active=payload.is_active,
+        is_template=payload.is_template,
+    )
+
+    for day in sorted(payload.days, key=lambda d: d.day_number):
+        day_model = RoutineDay(
+            day_number=day.day_number,
+            name=day.name,
+            notes=day.notes,
+        )
+        for idx, ex in enumerate(day.exercises, start=1):
+            day_model.exercises.append(
+                RoutineDayExercise(exercise_id=ex.exercise_id, **_exercise_values(ex.sort_order or idx, ex))
+            )
+        routine.days.append(day_model)
+
+    db.add(routine)
+    return _save_routine(db, routine)
+
+
+def _validate_day_payloads(
+    db: Session,
+    days: list[RoutineDayCreate] | list[RoutineDayPatch],
+    current_user: User,
+) -> None:
+    day_numbers = [d.day_number for d in days]
     if len(day_numbers) != len(set(day_numbers)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -71,8 +184,8 @@ def create_routine(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="day_number debe estar entre 1 y 7",
         )
-    # Validar ejercicios existentes
-    exercise_ids = {ex.exercise_id for d in payload.days for ex in d.exercises}
+
+    exercise_ids = {ex.exercise_id for d in days for ex in (d.exercises or [])}
     if exercise_ids:
         exercise_stmt = apply_owner_visibility(
             select(Exercise.id).where(Exercise.id.in_(exercise_ids)),
@@ -85,60 +198,211 @@ def create_routine(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Algún ejercicio no existe",
             )
+    for day in days:
+        resolved_orders = [ex.sort_order or idx for idx, ex in enumerate(day.exercises or [], start=1)]
+        if len(resolved_orders) != len(set(resolved_orders)):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"sort_order duplicado en el día {day.day_number}",
+            )
 
-    routine = Routine(
-        created_by_user_id=current_user.id,
-        name=payload.name,
-        description=payload.description,
-        is_active=payload.is_active,
-        is_template=payload.is_template,
-    )
 
-    for day in sorted(payload.days, key=lambda d: d.day_number):
-        day_model = RoutineDay(
-            day_number=day.day_number,
-            name=day.name,
-            notes=day.notes,
-        )
-        resolved_orders: list[int] = []
+def _set_if_changed(model: RoutineDay | RoutineDayExercise, values: dict[str, object]) -> bool:
+    changed = False
+    for field, value in values.items():
+        current = getattr(model, field)
+        if field == "distance_override_m" and current is not None and value is not None:
+            # Numeric(6, 2) vuelve como Decimal; se compara con la misma escala.
+            same = round(float(current), 2) == round(float(value), 2)
+        else:
+            same = current == value
+        if not same:
+            setattr(model, field, value)
+            changed = True
+    return changed
+
+
+def _exercise_values(sort_order: int, exercise: RoutineDayExerciseCreate) -> dict[str, object]:
+    return {
+        "sort_order": sort_order,
+        "arrows_override": exercise.arrows_override,
+        "distance_override_m": exercise.distance_override_m,
+        "notes": exercise.notes,
+    }
+
+
+def _apply_day_changes(
+    db: Session,
+    routine: Routine,
+    days: list[RoutineDayCreate] | list[RoutineDayPatch],
+    *,
+    remove_missing: bool,
+) -> bool:
+    # Compara contra las filas actuales y solo borra, actualiza o inserta lo
+    # que cambió: editar un override no reescribe el resto de la rutina.
+    existing_days = {day.day_number: day for day in routine.days}
+    requested = {day.day_number: day for day in days}
+    changed = False
+
+    removed_days = [
+        day_model
+        for day_number, day_model in existing_days.items()
+        if (remove_missing and day_number not in requested)
+        or getattr(requested.get(day_number), "remove", False)
+    ]
+    # (fila existente, sort_order final, payload) por día que se conserva.
+    matched_rows: list[tuple[RoutineDayExercise, int, RoutineDayExerciseCreate]] = []
+    new_rows: list[tuple[RoutineDay, int, RoutineDayExerciseCreate]] = []
+    removed_rows: list[tuple[RoutineDay, RoutineDayExercise]] = []
+    for day_number, day in requested.items():
+        day_model = existing_days.get(day_number)
+        if day_model is None or getattr(day, "remove", False) or day.exercises is None:
+            continue
+        # Se reutiliza la fila del mismo ejercicio (en orden) aunque cambie de
+        # posición; reordenar es un UPDATE de sort_order, no borrar e insertar.
+        pending: dict[int, list[RoutineDayExercise]] = {}
+        for item in sorted(day_model.exercises, key=lambda item: item.sort_order):
+            pending.setdefault(item.exercise_id, []).append(item)
         for idx, ex in enumerate(day.exercises, start=1):
             sort_order = ex.sort_order or idx
-            resolved_orders.append(sort_order)
+            candidates = pending.get(ex.exercise_id)
+            if candidates:
+                matched_rows.append((candidates.pop(0), sort_order, ex))
+            else:
+                new_rows.append((day_model, sort_order, ex))
+        removed_rows.extend((day_model, item) for items in pending.values() for item in items)
+
+    # 1) Borrados primero, para liberar (routine_id, day_number) y
+    # (routine_day_id, sort_order) antes de reutilizarlos.
+    for day_model in removed_days:
+        routine.days.remove(day_model)
+    for day_model, item in removed_rows:
+        day_model.exercises.remove(item)
+    if removed_days or removed_rows:
+        db.flush()
+        changed = True
+
+    # 2) Si al reordenar dos filas intercambian sort_order, la unique chocaría
+    # en el UPDATE: las que se mueven pasan antes por un valor provisorio por
+    # encima de todos los actuales y finales (positivo: en MySQL la columna es
+    # INT UNSIGNED).
+    moving = [(item, sort_order) for item, sort_order, _ in matched_rows if item.sort_order != sort_order]
+    occupied = {(item.routine_day_id, item.sort_order) for item, _, _ in matched_rows}
+    if any((item.routine_day_id, sort_order) in occupied for item, sort_order in moving):
+        temporary_base = max(
+            max(item.sort_order, sort_order) for item, sort_order, _ in matched_rows
+        ) + 1
+        for offset, (item, _) in enumerate(moving):
+            item.sort_order = temporary_base + offset
+        db.flush()
+
+    # 3) Actualizaciones e inserciones finales (el flush las agrupa por tabla).
+    for item, sort_order, ex in matched_rows:
+        changed = _set_if_changed(item, _exercise_values(sort_order, ex)) or changed
+    for day_model, sort_order, ex in new_rows:
+        day_model.exercises.append(RoutineDayExercise(exercise_id=ex.exercise_id, **_exercise_values(sort_order, ex)))
+        changed = True
+    for day_number, day in sorted(requested.items()):
+        if getattr(day, "remove", False):
+            continue
+        day_fields = day.dict(include={"name", "notes"}, exclude_unset=isinstance(day, RoutineDayPatch))
+        day_model = existing_days.get(day_number)
+        if day_model is not None:
+            changed = _set_if_changed(day_model, day_fields) or changed
+            continue
+        day_model = RoutineDay(day_number=day_number, **day_fields)
+        for idx, ex in enumerate(day.exercises or [], start=1):
             day_model.exercises.append(
-                RoutineDayExercise(
-                    exercise_id=ex.exercise_id,
-                    sort_order=sort_order,
-                    arrows_override=ex.arrows_override,
-                    distance_override_m=ex.distance_override_m,
-                    notes=ex.notes,
-                )
-            )
-        if len(resolved_orders) != len(set(resolved_orders)):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"sort_order duplicado en el día {day.day_number}",
+                RoutineDayExercise(exercise_id=ex.exercise_id, **_exercise_values(ex.sort_order or idx, ex))
             )
         routine.days.append(day_model)
+        changed = True
+    return changed
 
-    db.add(routine)
+
+def _routine_out(routine: Routine) -> RoutineOut:
+    # Mismo orden que las relaciones (day_number / sort_order), pero tomado de
+    # los objetos en sesión: en un update pueden haber cambiado de posición.
+    return RoutineOut(
+        id=routine.id,
+        name=routine.name,
+        description=routine.description,
+        is_active=routine.is_active,
+        is_template=routine.is_template,
+        created_at=routine.created_at,
+        updated_at=routine.updated_at,
+        days=[
+            RoutineDayOut(
+                id=day.id,
+                day_number=day.day_number,
+                name=day.name,
+                notes=day.notes,
+                exercises=[
+                    RoutineDayExerciseOut.model_validate(item)
+                    for item in sorted(day.exercises, key=lambda item: item.sort_order)
+                ],
+            )
+            for day in sorted(routine.days, key=lambda day: day.day_number)
+        ],
+    )
+
+
+def _save_routine(db: Session, routine: Routine, *, refresh_plans: bool = False) -> RoutineOut:
+    # El flush ya deja los ids generados (RETURNING donde el motor lo soporta)
+    # y los defaults de Python en los objetos: la respuesta se arma antes del
+    # commit, que expira todo, y no hace falta volver a leer días y ejercicios.
     try:
+        db.flush()
+        result = _routine_out(routine)
+        if refresh_plans:
+            # Los planes de las asignaciones se recalculan en la misma transacción.
+            refresh_plans_for_routine(db, routine.id)
         db.commit()
-    except IntegrityError:
+    except IntegrityError as exc:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Ya existe una rutina con ese nombre",
+            detail=_integrity_error_detail(exc),
         )
-    db.refresh(routine)
+    return result
+
+
+# Nombre de la restricción (MySQL/PostgreSQL) o columnas (SQLite, que no
+# informa el nombre). Los duplicados de días/orden ya se validan antes; acá
+# solo llegan cuando dos guardados de la misma rutina se pisan.
+_INTEGRITY_ERROR_DETAILS = (
+    (("uq_routines_owner_name", "uq_routines_name", "routines.name"), "Ya existe una rutina con ese nombre"),
+    (("uq_routine_day", "routine_days.day_number"), "day_number duplicado en la rutina"),
+    (("uq_day_sort", "routine_day_exercises.sort_order"), "sort_order duplicado en un día de la rutina"),
+)
 
-    # Recargar relaciones para la respuesta
-    db.refresh(
-        routine,
-        attribute_names=["days"],
-    )
-    for day in routine.days:
-        db.refresh(day, attribute_names=["exercises"])
 
+def _integrity_error_detail(exc: IntegrityError) -> str:
+    message = str(exc.orig)
+    for markers, detail in _INTEGRITY_ERROR_DETAILS:
+        if any(marker in message for marker in markers):
+            return detail
+    return "No se pudo guardar la rutina: los datos chocan con otro cambio"
+
+
+def _commit_routine_update(db: Session, routine: Routine, days_changed: bool) -> RoutineOut:
+    if days_changed:
+        # Los cambios en días/ejercicios no tocan columnas de routines; se marca
+        # a mano para que /sync y los validadores de caché vean la rutina modificada.
+        routine.updated_at = datetime.utcnow()
+    return _save_routine(db, routine, refresh_plans=days_changed)
+
+
+def _get_routine_for_update(db: Session, routine_id: int, current_user: User) -> Routine:
+    stmt = (
+        select(Routine)
+        .where(Routine.id == routine_id)
+        .options(selectinload(Routine.days).selectinload(RoutineDay.exercises))
+    )
+    routine = db.scalars(stmt).first()
+    if not routine:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
+    ensure_record_access(routine.created_by_user_id, current_user, "Rutina no encontrada")
     return routine
 
 
@@ -147,92 +411,50 @@ def update_routine(
     routine_id: int,
     payload: RoutineCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
-    routine = db.get(Routine, routine_id)
-    if not routine:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
-    ensure_record_access(routine.created_by_user_id, current_user, "Rutina no encontrada")
-
-    day_numbers = [d.day_number for d in payload.days]
-    if len(day_numbers) != len(set(day_numbers)):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="day_number duplicado en la rutina",
-        )
-    if any(d < 1 or d > 7 for d in day_numbers):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="day_number debe estar entre 1 y 7",
-        )
-
-    exercise_ids = {ex.exercise_id for d in payload.days for ex in d.exercises}
-    if exercise_ids:
-        exercise_stmt = apply_owner_visibility(
-            select(Exercise.id).where(Exercise.id.in_(exercise_ids)),
-            Exercise,
-            current_user,
-        )
-        found = db.scalars(exercise_stmt).all()
-        if len(found) != len(exercise_ids):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Algún ejercicio no existe",
-            )
+    routine = _get_routine_for_update(db, routine_id, current_user)
+    _validate_day_payloads(db, payload.days, current_user)
 
     routine.name = payload.name
     routine.description = payload.description
     routine.is_active = payload.is_active
     routine.is_template = payload.is_template
-    routine.days.clear()
-    # Forzar delete de días previos antes de insertar los nuevos para evitar
-    # colisiones con la unique (routine_id, day_number) durante el mismo flush.
-    db.flush()
+    days_changed = _apply_day_changes(db, routine, payload.days, remove_missing=True)
+    return _commit_routine_update(db, routine, days_changed)
 
-    for day in sorted(payload.days, key=lambda d: d.day_number):
-        day_model = RoutineDay(
-            day_number=day.day_number,
-            name=day.name,
-            notes=day.notes,
-        )
-        resolved_orders: list[int] = []
-        for idx, ex in enumerate(day.exercises, start=1):
-            sort_order = ex.sort_order or idx
-            resolved_orders.append(sort_order)
-            day_model.exercises.append(
-                RoutineDayExercise(
-                    exercise_id=ex.exercise_id,
-                    sort_order=sort_order,
-                    arrows_override=ex.arrows_override,
-                    distance_override_m=ex.distance_override_m,
-                    notes=ex.notes,
-                )
-            )
-        if len(resolved_orders) != len(set(resolved_orders)):
+
+@router.patch("/{routine_id}", response_model=RoutineOut)
+def patch_routine(
+    routine_id: int,
+    payload: RoutinePatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
+):
+    routine = _get_routine_for_update(db, routine_id, current_user)
+    _validate_day_payloads(db, payload.days, current_user)
+
+    for field, value in payload.dict(exclude_unset=True, exclude={"days"}).items():
+        if field in {"name", "is_active", "is_template"} and value in (None, ""):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"sort_order duplicado en el día {day.day_number}",
+                detail=f"{field} no puede quedar vacío",
             )
-        routine.days.append(day_model)
-
-    db.commit()
-    db.refresh(routine, attribute_names=["days"])
-    for day in routine.days:
-        db.refresh(day, attribute_names=["exercises"])
-    return routine
+        setattr(routine, field, value)
+    days_changed = _apply_day_changes(db, routine, payload.days, remove_missing=False)
+    return _commit_routine_update(db, routine, days_changed)
 
 
 @router.delete("/{routine_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_routine(
     routine_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
     routine = db.get(Routine, routine_id)
     if not routine:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rutina no encontrada")
     ensure_record_access(routine.created_by_user_id, current_user, "Rutina no encontrada")
+    record_deletion(db, "routines", routine.id, routine.created_by_user_id)
     db.delete(routine)
     db.commit()
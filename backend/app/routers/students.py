@@ -2,38 +2,123 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from ..deps import get_db
+from ..conditional import collection_etag, not_modified
+from ..deps import get_db, settings
 from ..models import Student, User
 from ..ownership import apply_owner_visibility, ensure_record_access
-from ..schemas import StudentCreate, StudentOut, StudentStatusUpdate, StudentUpdate
-from ..security import get_current_user, hash_password, require_roles
-from ..student_retention import purge_inactive_students
+from ..pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from ..purge_scheduler import run_student_purge
+from ..schemas import (
+    StudentBulkResult,
+    StudentCreate,
+    StudentOut,
+    StudentPurgeOut,
+    StudentStatusUpdate,
+    StudentUpdate,
+)
+from ..security import hash_password, invalidate_cached_user, require_roles
+from ..student_import import import_students, parse_student_rows
 
 router = APIRouter(prefix="/students", tags=["students"])
 
 
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _student_search_filter(db: Session, search: str):
+    dialect = db.bind.dialect.name if db.bind is not None else ""
+    escaped = _escape_like(search)
+    if dialect == "mysql":
+        # Sin trigramas en MySQL: búsqueda por prefijo, resuelta con índices B-tree
+        # (idx_students_owner_name y uq_students_owner_document). La collation es
+        # case-insensitive, así que LIKE ya ignora mayúsculas.
+        pattern = f"{escaped}%"
+        return or_(
+            Student.full_name.like(pattern, escape="\\"),
+            Student.document_number.like(pattern, escape="\\"),
+        )
+    # PostgreSQL: substring con ILIKE, acelerado por índices GIN pg_trgm.
+    pattern = f"%{escaped}%"
+    return or_(
+        Student.full_name.ilike(pattern, escape="\\"),
+        Student.document_number.ilike(pattern, escape="\\"),
+    )
+
+
 @router.get("", response_model=list[StudentOut])
 def list_students(
+    request: Request,
+    response: Response,
+    limit: int | None = Query(default=None, ge=1, le=500),
+    cursor: str | None = Query(default=None),
+    is_active: bool | None = Query(default=None),
+    q: str | None = Query(default=None, max_length=100),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
-    purge_inactive_students(db)
-    stmt = apply_owner_visibility(select(Student), Student, current_user).order_by(Student.full_name)
-    return db.scalars(stmt).all()
+    cached = not_modified(request, response, collection_etag(db, Student, current_user, request))
+    if cached is not None:
+        return cached
+
+    stmt = apply_owner_visibility(select(Student), Student, current_user).order_by(Student.full_name, Student.id)
+    if is_active is not None:
+        stmt = stmt.where(Student.is_active == is_active)
+    search = (q or "").strip()
+    if search:
+        stmt = stmt.where(_student_search_filter(db, search))
+    if cursor:
+        cursor_name, cursor_id = decode_cursor(cursor, str, int)
+        stmt = stmt.where(
+            or_(
+                Student.full_name > cursor_name,
+                and_(Student.full_name == cursor_name, Student.id > cursor_id),
+            )
+        )
+    if limit is None:
+        return db.scalars(stmt).all()
+
+    students = db.scalars(stmt.limit(limit + 1)).all()
+    if len(students) > limit:
+        students = students[:limit]
+        last = students[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.full_name, last.id)
+    return students
+
+
+@router.post(
+    "/purge-inactive",
+    response_model=StudentPurgeOut,
+    dependencies=[Depends(require_roles(["admin"]))],
+)
+def purge_inactive(db: Session = Depends(get_db)):
+    # Ejecución manual del mismo job que corre el scheduler en segundo plano.
+    return run_student_purge(db.get_bind(), days=settings.student_purge_after_days)
+
+
+@router.post("/bulk", response_model=StudentBulkResult)
+async def bulk_create_students(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
+):
+    # Acepta JSON ({"students": [...]} o una lista) o CSV con Content-Type text/csv
+    # y columnas con los mismos nombres que POST /students.
+    rows = parse_student_rows(await request.body(), request.headers.get("content-type", ""))
+    return await run_in_threadpool(import_students, db, rows, current_user)
 
 
 @router.post("", response_model=StudentOut, status_code=status.HTTP_201_CREATED)
 def create_student(
     payload: StudentCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
     data = payload.dict()
     account_username = (data.pop("account_username", None) or "").strip()
@@ -90,8 +175,7 @@ def create_student(
 def get_student(
     student_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
     student = db.get(Student, student_id)
     if not student:
@@ -105,8 +189,7 @@ def update_student(
     student_id: int,
     payload: StudentUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
     student = db.get(Student, student_id)
     if not student:
@@ -134,6 +217,8 @@ def update_student(
             status_code=status.HTTP_409_CONFLICT,
             detail="No se pudo actualizar el deportista por conflicto de datos",
         )
+    if student.user_id:
+        invalidate_cached_user(student.user_id)
     db.refresh(student)
     return student
 
@@ -143,8 +228,7 @@ def update_student_status(
     student_id: int,
     payload: StudentStatusUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _: None = Depends(require_roles({"admin", "professor"})),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
 ):
     student = db.get(Student, student_id)
     if not student:
@@ -164,5 +248,7 @@ def update_student_status(
             linked_user.is_active = student.is_active
             db.add(linked_user)
     db.commit()
+    if student.user_id:
+        invalidate_cached_user(student.user_id)
     db.refresh(student)
     return student
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from ..deps import get_db
+from ..models import DeletedRecord, Exercise, Routine, RoutineDay, Student, StudentRoutineAssignment, User
+from ..ownership import apply_owner_visibility
+from ..pagination import decode_cursor, encode_cursor
+from ..schemas import SyncOut
+from ..security import require_roles
+from ..sync import SYNC_ENTITIES, SYNC_OVERLAP, TOMBSTONE_RETENTION_DAYS
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+@router.get("", response_model=SyncOut)
+def sync_changes(
+    since: str | None = Query(default=None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles({"admin", "professor"})),
+):
+    # El token se toma antes de leer: lo que cambie durante la consulta vuelve
+    # a aparecer en el próximo sync (el cliente reemplaza por id).
+    now = datetime.utcnow()
+    changed_since: datetime | None = None
+    if since:
+        (token_time,) = decode_cursor(since, datetime)
+        if token_time >= now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+            changed_since = token_time - SYNC_OVERLAP
+
+    exercises_stmt = apply_owner_visibility(select(Exercise), Exercise, current_user).order_by(Exercise.name)
+    students_stmt = apply_owner_visibility(select(Student), Student, current_user).order_by(Student.full_name)
+    routines_stmt = apply_owner_visibility(
+        select(Routine)
+        .options(selectinload(Routine.days).selectinload(RoutineDay.exercises))
+        .order_by(Routine.name),
+        Routine,
+        current_user,
+    )
+    # Misma visibilidad que GET /assignments: deportista y rutina accesibles.
+    assignments_stmt = apply_owner_visibility(
+        apply_owner_visibility(
+            select(StudentRoutineAssignment)
+            .join(Student, Student.id == StudentRoutineAssignment.student_id)
+            .join(Routine, Routine.id == StudentRoutineAssignment.routine_id)
+            .order_by(StudentRoutineAssignment.created_at.desc(), StudentRoutineAssignment.id.desc()),
+            Student,
+            current_user,
+        ),
+        Routine,
+        current_user,
+    )
+
+    deleted: dict[str, list[int]] = {entity: [] for entity in SYNC_ENTITIES}
+    if changed_since is not None:
+        exercises_stmt = exercises_stmt.where(Exercise.updated_at > changed_since)
+        students_stmt = students_stmt.where(Student.updated_at > changed_since)
+        routines_stmt = routines_stmt.where(Routine.updated_at > changed_since)
+        assignments_stmt = assignments_stmt.where(StudentRoutineAssignment.updated_at > changed_since)
+        tombstones_stmt = apply_owner_visibility(
+            select(DeletedRecord.entity, DeletedRecord.record_id).where(DeletedRecord.deleted_at > changed_since),
+            DeletedRecord,
+            current_user,
+        )
+        for entity, record_id in db.execute(tombstones_stmt).all():
+            if entity in deleted:
+                deleted[entity].append(int(record_id))
+
+    return {
+        "token": encode_cursor(now),
+        "full": changed_since is None,
+        "exercises": db.scalars(exercises_stmt).all(),
+        "students": db.scalars(students_stmt).all(),
+        "routines": db.scalars(routines_stmt).all(),
+        "assignments": db.scalars(assignments_stmt).all(),
+        "deleted": deleted,
+    }
@@ -7,7 +7,7 @@ from sqlalchemy.orm import Session
 from ..deps import get_db
 from ..models import User
 from ..schemas import UserAdminUpdate, UserCreate, UserOut
-from ..security import get_current_user, hash_password, require_roles
+from ..security import get_current_user, hash_password, invalidate_cached_user, require_roles
 
 router = APIRouter(
     prefix="/users",
@@ -67,12 +67,12 @@ def create_user(
     return user
 
 
-@router.put("/{user_id}", response_model=UserOut, dependencies=[Depends(require_roles(["admin"]))])
+@router.put("/{user_id}", response_model=UserOut)
 def update_user(
     user_id: int,
     payload: UserAdminUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(require_roles(["admin"])),
 ):
     user = db.get(User, user_id)
     if not user:
@@ -95,5 +95,6 @@ def update_user(
     user.is_active = payload.is_active
     db.add(user)
     db.commit()
+    invalidate_cached_user(user.id)
     db.refresh(user)
     return user
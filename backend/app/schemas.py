@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime, date
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field, conint, confloat
 
@@ -128,6 +128,27 @@ class StudentOut(StudentBase):
         from_attributes = True
 
 
+class StudentBulkRowResult(BaseModel):
+    row: int
+    status: str
+    student_id: Optional[int] = None
+    document_number: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class StudentBulkResult(BaseModel):
+    created: int
+    failed: int
+    rows: List[StudentBulkRowResult]
+
+
+class StudentPurgeOut(BaseModel):
+    status: str
+    deleted: int
+    duration_ms: float
+    started_at: datetime
+
+
 # Routines
 class RoutineDayExerciseCreate(BaseModel):
     exercise_id: int
@@ -152,6 +173,24 @@ class RoutineCreate(BaseModel):
     days: List[RoutineDayCreate] = Field(default_factory=list)
 
 
+class RoutineDayPatch(BaseModel):
+    # Días no enviados quedan como están; "exercises" (si viene) reemplaza la
+    # lista de ese día y "remove" elimina el día.
+    day_number: conint(ge=1)
+    name: Optional[str] = None
+    notes: Optional[str] = None
+    exercises: Optional[List[RoutineDayExerciseCreate]] = None
+    remove: bool = False
+
+
+class RoutinePatch(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    is_active: Optional[bool] = None
+    is_template: Optional[bool] = None
+    days: List[RoutineDayPatch] = Field(default_factory=list)
+
+
 class RoutineDayExerciseOut(BaseModel):
     id: int
     exercise_id: int
@@ -189,21 +228,122 @@ class RoutineOut(BaseModel):
         from_attributes = True
 
 
+class RoutineSummaryOut(BaseModel):
+    # GET /routines?view=summary: sin días ni ejercicios, solo totales.
+    id: int
+    name: str
+    is_active: bool
+    is_template: bool
+    day_count: int
+    exercise_count: int
+    weekly_arrows: int
+
+
 # Assignments
+class AssignmentOverrideIn(BaseModel):
+    # day_index: posición del día dentro de la rutina (1 = primer día).
+    day_index: conint(ge=1, le=7)
+    exercise_id: int
+    sort_order: Optional[int] = Field(default=None, ge=1)
+    arrows_override: Optional[conint(ge=0)] = None
+    rounds_override: Optional[conint(ge=1)] = None
+    arrows_per_round_override: Optional[conint(ge=0)] = None
+    distance_override_m: Optional[confloat(ge=0)] = None
+    description_override: Optional[str] = None
+
+
+class AssignmentOverrideOut(BaseModel):
+    id: int
+    day_index: int
+    exercise_id: int
+    sort_order: int
+    arrows_override: Optional[int]
+    rounds_override: Optional[int]
+    arrows_per_round_override: Optional[int]
+    distance_override_m: Optional[float]
+    description_override: Optional[str]
+
+    class Config:
+        from_attributes = True
+
+
+class AssignmentOverridesUpdate(BaseModel):
+    objective: Optional[str] = Field(default=None, max_length=255)
+    professor_notes: Optional[str] = None
+    overrides: List[AssignmentOverrideIn] = Field(default_factory=list)
+
+
+class AssignmentOverridesOut(BaseModel):
+    assignment_id: int
+    objective: Optional[str]
+    professor_notes: Optional[str]
+    overrides: List[AssignmentOverrideOut]
+
+
 class AssignmentCreate(BaseModel):
     student_id: int
     routine_id: int
     start_date: Optional[date] = None
     end_date: Optional[date] = None
     status: str = Field(default="active", pattern="^(active|paused|finished)$")
+    objective: Optional[str] = Field(default=None, max_length=255)
+    professor_notes: Optional[str] = None
+    # Si no se envían, se toman del JSON de notes (formato anterior del frontend).
+    overrides: Optional[List[AssignmentOverrideIn]] = None
     notes: Optional[str] = None
 
 
+class AssignmentBulkCreate(BaseModel):
+    routine_id: int
+    # Cualquier día de la semana: se normaliza al lunes (start_date) y domingo (end_date).
+    week_start: date
+    # Ids explícitos o todos los deportistas activos visibles para el usuario.
+    student_ids: Optional[List[int]] = Field(default=None, min_length=1, max_length=200)
+    all_active_students: bool = False
+    status: str = Field(default="active", pattern="^(active|paused)$")
+    objective: Optional[str] = Field(default=None, max_length=255)
+    professor_notes: Optional[str] = None
+
+
+class AssignmentBulkRowResult(BaseModel):
+    student_id: int
+    status: str
+    assignment_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class AssignmentBulkResult(BaseModel):
+    created: int
+    failed: int
+    rows: List[AssignmentBulkRowResult]
+
+
 class AssignmentStatusUpdate(BaseModel):
     status: str = Field(pattern="^(active|paused|finished)$")
     student_observations: Optional[str] = None
 
 
+class AssignmentPdfBatchRequest(BaseModel):
+    # Ids explícitos o todas las asignaciones activas de la semana en curso.
+    assignment_ids: Optional[List[int]] = Field(default=None, min_length=1, max_length=200)
+    active_this_week: bool = False
+    format: str = Field(default="zip", pattern="^(zip|merged)$")
+
+
+class ExportJobOut(BaseModel):
+    id: int
+    status: str
+    format: str
+    file_name: str
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 class AssignmentOut(BaseModel):
     id: int
     student_id: int
@@ -212,6 +352,8 @@ class AssignmentOut(BaseModel):
     start_date: Optional[date]
     end_date: Optional[date]
     status: str
+    objective: Optional[str] = None
+    professor_notes: Optional[str] = None
     notes: Optional[str]
 
     class Config:
@@ -236,3 +378,14 @@ class AssignmentHistoryOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# Sync
+class SyncOut(BaseModel):
+    token: str
+    full: bool
+    exercises: List[ExerciseOut]
+    students: List[StudentOut]
+    routines: List[RoutineOut]
+    assignments: List[AssignmentOut]
+    deleted: Dict[str, List[int]]
@@ -1,15 +1,21 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import hashlib
+import multiprocessing
 import secrets
-from typing import Iterable, Set
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, Set
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from .deps import get_db, settings
 from .models import User
@@ -18,15 +24,86 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
+# Columnas del principal que se cachean entre requests. password_hash y los datos
+# de la sesión de refresh quedan fuera: si un endpoint los necesita se cargan
+# desde la base al accederlos, así nunca se usan valores desactualizados.
+_CACHED_USER_FIELDS = ("id", "username", "role", "is_active", "preferred_lang", "created_at", "updated_at")
+_user_cache: OrderedDict[tuple[int, int], tuple[float, dict]] = OrderedDict()
+_user_cache_lock = threading.Lock()
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+# bcrypt corre en un pool de procesos acotado. El semáforo limita cuántos
+# requests pueden esperar un hash a la vez: el resto se rechaza de inmediato
+# con 503 en lugar de ocupar hilos que necesitan los demás endpoints.
+_password_pool: ProcessPoolExecutor | None = None
+_password_pool_lock = threading.Lock()
+_password_slots = threading.BoundedSemaphore(max(settings.password_hash_max_pending, 1))
+
+
+def _verify_password_sync(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def hash_password(password: str) -> str:
+def _hash_password_sync(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def _get_password_pool() -> ProcessPoolExecutor:
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is None:
+            _password_pool = ProcessPoolExecutor(
+                max_workers=settings.password_hash_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _password_pool
+
+
+def shutdown_password_pool() -> None:
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is not None:
+            _password_pool.shutdown(wait=False, cancel_futures=True)
+            _password_pool = None
+
+
+@contextmanager
+def _password_slot() -> Iterator[None]:
+    if not _password_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, intenta nuevamente en unos segundos",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        yield
+    finally:
+        _password_slots.release()
+
+
+def _run_password_task(task: Callable[..., Any], *args: Any) -> Any:
+    if settings.password_hash_workers <= 0:
+        return task(*args)
+    with _password_slot():
+        return _get_password_pool().submit(task, *args).result()
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _run_password_task(_verify_password_sync, plain_password, hashed_password)
+
+
+def hash_password(password: str) -> str:
+    return _run_password_task(_hash_password_sync, password)
+
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    # Para importaciones masivas: reparte los hashes entre todos los procesos
+    # del pool ocupando un solo lugar de la cola.
+    if settings.password_hash_workers <= 0 or len(passwords) <= 1:
+        return [hash_password(password) for password in passwords]
+    with _password_slot():
+        return list(_get_password_pool().map(_hash_password_sync, passwords))
+
+
 def create_access_token(data: dict, expires_minutes: int | None = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(
@@ -79,6 +156,43 @@ def decode_token(token: str, *, verify_exp: bool = True) -> dict:
     return payload
 
 
+def _get_cached_user(db: Session, cache_key: tuple[int, int] | None) -> User | None:
+    if cache_key is None or settings.auth_user_cache_ttl_s <= 0:
+        return None
+    with _user_cache_lock:
+        entry = _user_cache.get(cache_key)
+        if entry is None:
+            return None
+        expires_at, values = entry
+        if expires_at <= time.monotonic():
+            del _user_cache[cache_key]
+            return None
+        _user_cache.move_to_end(cache_key)
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def _store_cached_user(cache_key: tuple[int, int] | None, user: User) -> None:
+    if cache_key is None or settings.auth_user_cache_ttl_s <= 0:
+        return
+    values = {field: getattr(user, field) for field in _CACHED_USER_FIELDS}
+    with _user_cache_lock:
+        _user_cache[cache_key] = (time.monotonic() + settings.auth_user_cache_ttl_s, values)
+        _user_cache.move_to_end(cache_key)
+        while len(_user_cache) > settings.auth_user_cache_size:
+            _user_cache.popitem(last=False)
+
+
+def invalidate_cached_user(user_id: int | None = None) -> None:
+    with _user_cache_lock:
+        if user_id is None:
+            _user_cache.clear()
+            return
+        for cache_key in [key for key in _user_cache if key[0] == user_id]:
+            del _user_cache[cache_key]
+
+
 def get_user_from_access_token(db: Session, token: str) -> User:
     payload = decode_token(token)
     token_type = payload.get("type")
@@ -95,6 +209,13 @@ def get_user_from_access_token(db: Session, token: str) -> User:
             detail="Token inválido (sin usuario)",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    user_id = payload.get("user_id")
+    issued_at = payload.get("iat")
+    cache_key = (int(user_id), int(issued_at)) if user_id and issued_at else None
+    cached_user = _get_cached_user(db, cache_key)
+    if cached_user is not None and cached_user.username == username:
+        return cached_user
+
     user = db.query(User).filter(User.username == username).first()
     if not user or not user.is_active:
         raise HTTPException(
@@ -102,6 +223,8 @@ def get_user_from_access_token(db: Session, token: str) -> User:
             detail="Usuario no autorizado",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if cache_key is not None and cache_key[0] == user.id:
+        _store_cached_user(cache_key, user)
     return user
 
 
@@ -122,11 +245,14 @@ def get_current_user_optional(
 def require_roles(allowed_roles: Iterable[str]):
     allowed: Set[str] = set(allowed_roles)
 
-    def dependency(user: User = Depends(get_current_user)) -> None:
+    # Devuelve el mismo principal que resolvió get_current_user (cacheado por
+    # FastAPI dentro del request), así los endpoints lo usan sin otra consulta.
+    def dependency(user: User = Depends(get_current_user)) -> User:
         if user.role not in allowed:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Permisos insuficientes",
             )
+        return user
 
     return dependency
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import os
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Iterator
+
+from fastapi.responses import StreamingResponse
+
+from .deps import settings
+
+
+def spooled_buffer() -> SpooledTemporaryFile:
+    # Hasta PDF_STREAM_BUFFER_KB queda en memoria; lo que exceda va a un
+    # archivo temporal, así un lote grande no infla la memoria del worker.
+    return SpooledTemporaryFile(max_size=settings.pdf_stream_buffer_kb * 1024)
+
+
+def _iter_file(handle: BinaryIO) -> Iterator[bytes]:
+    chunk_size = settings.pdf_stream_chunk_kb * 1024
+    try:
+        while True:
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        handle.close()
+
+
+def file_streaming_response(handle: BinaryIO, *, media_type: str, headers: dict[str, str]) -> StreamingResponse:
+    # Envía desde la posición 0 en bloques y cierra el archivo al terminar.
+    size = handle.seek(0, os.SEEK_END)
+    handle.seek(0)
+    return StreamingResponse(
+        _iter_file(handle),
+        media_type=media_type,
+        headers={**headers, "Content-Length": str(size)},
+    )
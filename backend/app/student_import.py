@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import Student, User
+from .schemas import StudentCreate
+from .security import hash_passwords
+
+MAX_IMPORT_ROWS = 1000
+
+
+def parse_student_rows(body: bytes, content_type: str) -> list[dict[str, object]]:
+    try:
+        raw_text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El archivo debe estar codificado en UTF-8",
+        )
+
+    if "csv" in content_type:
+        reader = csv.DictReader(io.StringIO(raw_text))
+        # Celdas vacías = campo no informado, para que apliquen los defaults del schema.
+        rows: list[dict[str, object]] = [
+            {key.strip(): value.strip() for key, value in record.items() if key and value and value.strip()}
+            for record in reader
+        ]
+    else:
+        try:
+            parsed = json.loads(raw_text or "null")
+        except json.JSONDecodeError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="JSON inválido",
+            )
+        if isinstance(parsed, dict):
+            parsed = parsed.get("students")
+        if not isinstance(parsed, list) or not all(isinstance(item, dict) for item in parsed):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Se espera una lista de deportistas o un objeto con la clave 'students'",
+            )
+        rows = parsed
+
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No hay deportistas para importar",
+        )
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Se pueden importar como máximo {MAX_IMPORT_ROWS} deportistas por vez",
+        )
+    return rows
+
+
+def _validation_detail(exc: ValidationError) -> str:
+    first_error = exc.errors()[0]
+    field = ".".join(str(part) for part in first_error.get("loc", ()))
+    return f"{field}: {first_error.get('msg')}" if field else str(first_error.get("msg"))
+
+
+def import_students(db: Session, rows: list[dict[str, object]], current_user: User) -> dict[str, object]:
+    results: list[dict[str, object]] = []
+    pending: list[tuple[dict[str, object], dict[str, object], str, str]] = []
+    seen_documents: set[str] = set()
+    seen_usernames: set[str] = set()
+
+    for row_number, raw_row in enumerate(rows, start=1):
+        result: dict[str, object] = {"row": row_number, "status": "error"}
+        results.append(result)
+        try:
+            payload = StudentCreate(**raw_row)
+        except ValidationError as exc:
+            result["detail"] = _validation_detail(exc)
+            continue
+
+        data = payload.dict()
+        account_username = (data.pop("account_username", None) or "").strip()
+        account_password = data.pop("account_password", None) or ""
+        data["full_name"] = data["full_name"].strip()
+        data["document_number"] = data["document_number"].strip()
+        result["document_number"] = data["document_number"]
+
+        if not data["document_number"]:
+            result["detail"] = "El número de documento es obligatorio"
+            continue
+        if data["document_number"] in seen_documents:
+            result["detail"] = "Número de documento repetido en la importación"
+            continue
+        if account_username or account_password:
+            if len(account_username) < 3:
+                result["detail"] = "El usuario debe tener al menos 3 caracteres"
+                continue
+            if len(account_password) < 8:
+                result["detail"] = "La contraseña debe tener al menos 8 caracteres"
+                continue
+            if account_username in seen_usernames:
+                result["detail"] = "Usuario repetido en la importación"
+                continue
+            seen_usernames.add(account_username)
+        seen_documents.add(data["document_number"])
+        pending.append((result, data, account_username, account_password))
+
+    # Una sola consulta por restricción: uq_students_owner_document y usuarios existentes.
+    if pending:
+        existing_documents = set(
+            db.scalars(
+                select(Student.document_number).where(
+                    Student.created_by_user_id == current_user.id,
+                    Student.document_number.in_([data["document_number"] for _, data, _, _ in pending]),
+                )
+            ).all()
+        )
+        requested_usernames = [username for _, _, username, _ in pending if username]
+        existing_usernames = (
+            set(db.scalars(select(User.username).where(User.username.in_(requested_usernames))).all())
+            if requested_usernames
+            else set()
+        )
+        still_pending = []
+        for entry in pending:
+            result, data, account_username, _ = entry
+            if data["document_number"] in existing_documents:
+                result["detail"] = "Ya existe un deportista con ese número de documento"
+            elif account_username and account_username in existing_usernames:
+                result["detail"] = "Ya existe un usuario con ese nombre"
+            else:
+                still_pending.append(entry)
+        pending = still_pending
+
+    with_account = [entry for entry in pending if entry[2]]
+    password_hashes = hash_passwords([password for _, _, _, password in with_account])
+
+    # Un INSERT por tabla con todas las filas (insertmanyvalues en PostgreSQL,
+    # executemany multi-fila en MySQL) y una consulta para leer los ids por la
+    # clave única, en vez de un INSERT y un refresh por deportista.
+    now = datetime.utcnow()
+    try:
+        user_ids: dict[str, int] = {}
+        if with_account:
+            db.execute(
+                insert(User.__table__),
+                [
+                    {
+                        "username": account_username,
+                        "password_hash": password_hash,
+                        "role": "student",
+                        "is_active": bool(data.get("is_active", True)),
+                    }
+                    for (_, data, account_username, _), password_hash in zip(with_account, password_hashes)
+                ],
+            )
+            user_ids = dict(
+                db.execute(
+                    select(User.username, User.id).where(
+                        User.username.in_([account_username for _, _, account_username, _ in with_account])
+                    )
+                ).all()
+            )
+        student_ids: dict[str, int] = {}
+        if pending:
+            db.execute(
+                insert(Student.__table__),
+                [
+                    {
+                        **data,
+                        "created_by_user_id": current_user.id,
+                        "user_id": user_ids.get(account_username),
+                        "inactive_since": None if data.get("is_active", True) else now,
+                    }
+                    for _, data, account_username, _ in pending
+                ],
+            )
+            student_ids = dict(
+                db.execute(
+                    select(Student.document_number, Student.id).where(
+                        Student.created_by_user_id == current_user.id,
+                        Student.document_number.in_([data["document_number"] for _, data, _, _ in pending]),
+                    )
+                ).all()
+            )
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="La importación entró en conflicto con datos cargados en paralelo; no se guardó ningún deportista",
+        )
+
+    for result, data, _, _ in pending:
+        result["status"] = "created"
+        result["student_id"] = student_ids[data["document_number"]]
+    created = len(pending)
+    return {"created": created, "failed": len(results) - created, "rows": results}
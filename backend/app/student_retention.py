@@ -56,33 +56,51 @@ def ensure_student_retention_schema(db: Session) -> None:
 
 def purge_inactive_students(db: Session, days: int = INACTIVE_PURGE_DAYS) -> int:
     dialect = db.bind.dialect.name if db.bind is not None else ""
-    if dialect == "postgresql":
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        result = db.execute(
-            text(
-                """
-                DELETE FROM students
-                WHERE is_active = FALSE
-                  AND inactive_since IS NOT NULL
-                  AND inactive_since <= :cutoff
-                """
-            ),
-            {"cutoff": cutoff},
+    inactive_flag = "FALSE" if dialect == "postgresql" else "0"
+
+    def purge_condition(prefix: str = "") -> str:
+        return (
+            f"{prefix}is_active = {inactive_flag}"
+            f" AND {prefix}inactive_since IS NOT NULL"
+            f" AND {prefix}inactive_since <= :cutoff"
         )
-        db.commit()
-        return int(result.rowcount or 0)
 
-    cutoff = datetime.utcnow() - timedelta(days=days)
-    result = db.execute(
+    now = datetime.utcnow()
+    params = {"cutoff": now - timedelta(days=days), "deleted_at": now}
+
+    # Tombstones para /sync: los deportistas purgados y sus asignaciones (que
+    # caen por ON DELETE CASCADE) deben desaparecer también en los clientes.
+    db.execute(
+        text(
+            f"""
+            INSERT INTO deleted_records (entity, record_id, created_by_user_id, deleted_at)
+            SELECT 'assignments', a.id, a.created_by_user_id, :deleted_at
+            FROM student_routine_assignments a
+            JOIN students s ON s.id = a.student_id
+            WHERE {purge_condition("s.")}
+            """
+        ),
+        params,
+    )
+    db.execute(
         text(
+            f"""
+            INSERT INTO deleted_records (entity, record_id, created_by_user_id, deleted_at)
+            SELECT 'students', s.id, s.created_by_user_id, :deleted_at
+            FROM students s
+            WHERE {purge_condition("s.")}
             """
+        ),
+        params,
+    )
+    result = db.execute(
+        text(
+            f"""
             DELETE FROM students
-            WHERE is_active = 0
-              AND inactive_since IS NOT NULL
-              AND inactive_since <= :cutoff
+            WHERE {purge_condition()}
             """
         ),
-        {"cutoff": cutoff},
+        params,
     )
     db.commit()
     return int(result.rowcount or 0)
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from .models import DeletedRecord
+
+SYNC_ENTITIES = ("exercises", "students", "routines", "assignments")
+# Los tombstones se conservan este tiempo; un token más viejo recibe sync completo.
+TOMBSTONE_RETENTION_DAYS = 90
+# Margen hacia atrás al comparar updated_at: cubre transacciones que fijaron
+# updated_at antes del token pero hicieron commit después.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def record_deletion(db: Session, entity: str, record_id: int, owner_user_id: int | None) -> None:
+    db.add(
+        DeletedRecord(
+            entity=entity,
+            record_id=record_id,
+            created_by_user_id=owner_user_id,
+            deleted_at=datetime.utcnow(),
+        )
+    )
+
+
+def prune_deleted_records(db: Session, days: int = TOMBSTONE_RETENTION_DAYS) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    result = db.execute(delete(DeletedRecord).where(DeletedRecord.deleted_at < cutoff))
+    db.commit()
+    return int(result.rowcount or 0)
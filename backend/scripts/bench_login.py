@@ -0,0 +1,135 @@
+"""Benchmark de logins/segundo con bcrypt inline vs. pool de procesos.
+
+Levanta la API de auth en memoria (SQLite) y dispara logins concurrentes
+mientras mide la latencia de un endpoint liviano que comparte el threadpool.
+
+Uso, desde backend/:
+    poetry run python scripts/bench_login.py --concurrency 60 --duration 10
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app import security  # noqa: E402
+from app.deps import get_db, settings  # noqa: E402
+from app.models import User  # noqa: E402
+from app.routers import auth  # noqa: E402
+
+
+def build_app() -> FastAPI:
+    engine = create_engine(
+        "sqlite+pysqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    User.__table__.create(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    with session_factory() as db:
+        db.add(
+            User(
+                id=1,
+                username="profesor",
+                password_hash=security._hash_password_sync("profesor123"),
+                role="professor",
+                is_active=True,
+            )
+        )
+        db.commit()
+
+    app = FastAPI()
+    app.include_router(auth.router)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/ping")
+    def ping(db: Session = Depends(get_db)):
+        db.execute(text("SELECT 1"))
+        return {"ok": True}
+
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+async def run_scenario(workers: int, concurrency: int, duration: float) -> dict[str, float]:
+    settings.password_hash_workers = workers
+    security.shutdown_password_pool()
+    app = build_app()
+    transport = httpx.ASGITransport(app=app)
+    ok = rejected = 0
+    ping_latencies: list[float] = []
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Calentamiento: crea el pool de procesos antes de medir.
+        await client.post("/auth/login", json={"username": "profesor", "password": "profesor123"})
+
+        async def login_loop() -> None:
+            nonlocal ok, rejected
+            while time.perf_counter() < deadline:
+                response = await client.post(
+                    "/auth/login",
+                    json={"username": "profesor", "password": "profesor123"},
+                )
+                if response.status_code == 200:
+                    ok += 1
+                elif response.status_code == 503:
+                    rejected += 1
+                    await asyncio.sleep(0.05)
+
+        async def ping_loop() -> None:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                await client.get("/ping")
+                ping_latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(0.02)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(login_loop() for _ in range(concurrency)), ping_loop())
+        elapsed = time.perf_counter() - started
+
+    security.shutdown_password_pool()
+    ping_latencies.sort()
+    return {
+        "logins_per_s": ok / elapsed,
+        "rejected": rejected,
+        "ping_p50_ms": statistics.median(ping_latencies) if ping_latencies else 0.0,
+        "ping_p95_ms": ping_latencies[int(len(ping_latencies) * 0.95) - 1] if ping_latencies else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=60)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=settings.password_hash_workers)
+    args = parser.parse_args()
+
+    for label, workers in (("inline (antes)", 0), (f"pool {args.workers} procesos", args.workers)):
+        result = asyncio.run(run_scenario(workers, args.concurrency, args.duration))
+        print(
+            f"{label:>22}: {result['logins_per_s']:7.1f} logins/s  "
+            f"rechazados={int(result['rejected'])}  "
+            f"/ping p50={result['ping_p50_ms']:.1f} ms p95={result['ping_p95_ms']:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import BigInteger, create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import pdf_cache
+from app.db import Base
+from app.deps import get_db
+from app.models import (
+    AssignmentEffectivePlan,
+    AssignmentExerciseOverride,
+    AssignmentPlanDependency,
+    Exercise,
+    Routine,
+    RoutineDay,
+    RoutineDayExercise,
+    Student,
+    StudentRoutineAssignment,
+    StudentRoutineHistory,
+    User,
+)
+from app.routers import assignments, auth
+from app.security import hash_password, invalidate_cached_user
+
+ClientFactory = Callable[..., tuple[TestClient, dict[str, str]]]
+
+
+@compiles(BigInteger, "sqlite")
+def compile_big_integer_sqlite(type_, compiler, **kw) -> str:
+    # SQLite solo autoincrementa claves "INTEGER PRIMARY KEY".
+    return "INTEGER"
+
+
+def build_engine() -> Engine:
+    engine = create_engine(
+        "sqlite+pysqlite:///:memory:",
+        future=True,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    @event.listens_for(engine, "connect")
+    def register_sqlite_functions(dbapi_connection, connection_record) -> None:
+        # CheckConstraint de students usa char_length(), que SQLite no trae.
+        dbapi_connection.create_function("char_length", 1, lambda value: len(value or ""))
+
+    User.__table__.create(engine)
+    return engine
+
+
+def build_test_app(session_factory: sessionmaker[Session], *routers) -> FastAPI:
+    app = FastAPI()
+    for router in routers:
+        app.include_router(router)
+
+    def override_get_db() -> Iterator[Session]:
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+def create_user(session_factory: sessionmaker[Session], username: str = "profesor") -> None:
+    with session_factory() as db:
+        db.add(
+            User(
+                id=1,
+                username=username,
+                password_hash=hash_password("profesor123"),
+                role="professor",
+                is_active=True,
+            )
+        )
+        db.commit()
+
+
+def login(client: TestClient, username: str = "profesor") -> dict[str, str]:
+    response = client.post(
+        "/auth/login",
+        json={"username": username, "password": "profesor123"},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.fixture()
+def engine() -> Engine:
+    invalidate_cached_user()
+    return build_engine()
+
+
+@pytest.fixture()
+def session_factory(engine: Engine) -> sessionmaker[Session]:
+    # Base en memoria con el profesor id=1; cada test crea las tablas que usa.
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    create_user(factory)
+    return factory
+
+
+@pytest.fixture()
+def make_client(session_factory: sessionmaker[Session]) -> ClientFactory:
+    # App con /auth y los routers pedidos, más los headers del profesor logueado.
+    def make(*routers) -> tuple[TestClient, dict[str, str]]:
+        client = TestClient(build_test_app(session_factory, auth.router, *routers))
+        return client, {"Authorization": f"Bearer {login(client)['access_token']}"}
+
+    return make
+
+
+@pytest.fixture()
+def plan_db(engine: Engine, session_factory: sessionmaker[Session]) -> sessionmaker[Session]:
+    # Una deportista con una rutina de un día asignada la semana del 2026-03-02.
+    Base.metadata.create_all(
+        engine,
+        tables=[
+            Exercise.__table__,
+            Student.__table__,
+            Routine.__table__,
+            RoutineDay.__table__,
+            RoutineDayExercise.__table__,
+            StudentRoutineAssignment.__table__,
+            AssignmentEffectivePlan.__table__,
+            AssignmentPlanDependency.__table__,
+            AssignmentExerciseOverride.__table__,
+            StudentRoutineHistory.__table__,
+        ],
+    )
+    with session_factory() as db:
+        db.add_all(
+            [
+                Student(id=1, created_by_user_id=1, full_name="Ana Perez", document_number="1"),
+                Exercise(id=1, created_by_user_id=1, name="Tiro a 18 m", arrows_count=36, rounds=6, arrows_per_round=6, distance_m=18),
+                Routine(id=1, created_by_user_id=1, name="Base"),
+                RoutineDay(id=1, routine_id=1, day_number=1, name="Lunes"),
+                RoutineDayExercise(id=1, routine_day_id=1, exercise_id=1, sort_order=1),
+                StudentRoutineAssignment(
+                    id=1,
+                    created_by_user_id=1,
+                    student_id=1,
+                    routine_id=1,
+                    start_date=date(2026, 3, 2),
+                    end_date=date(2026, 3, 8),
+                    status="active",
+                ),
+            ]
+        )
+        db.commit()
+    return session_factory
+
+
+@pytest.fixture()
+def assignments_client(
+    plan_db: sessionmaker[Session],
+    make_client: ClientFactory,
+    tmp_path,
+    monkeypatch,
+) -> Iterator[tuple[TestClient, dict[str, str], sessionmaker[Session]]]:
+    # Los endpoints de asignaciones generan PDFs: cache aislado por test.
+    monkeypatch.setattr(pdf_cache.settings, "pdf_cache_dir", str(tmp_path))
+    pdf_cache.clear_pdf_cache()
+    client, headers = make_client(assignments.router)
+    yield client, headers, plan_db
+    pdf_cache.clear_pdf_cache()
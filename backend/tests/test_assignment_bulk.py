@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import event, select
+
+from app.assignment_weeks import WEEKLY_CONFLICT_DETAIL
+from app.models import AssignmentEffectivePlan, Student, StudentRoutineAssignment
+
+
+def test_bulk_assignment_reports_each_student_in_one_transaction(assignments_client) -> None:
+    client, headers, session_factory = assignments_client
+    with session_factory() as db:
+        db.add_all(
+            [
+                Student(id=2, created_by_user_id=1, full_name="Beto Diaz", document_number="2"),
+                Student(id=3, created_by_user_id=1, full_name="Carla Ruiz", document_number="3", is_active=False),
+                Student(id=4, created_by_user_id=2, full_name="De otro profesor", document_number="4"),
+            ]
+        )
+        db.commit()
+
+    statements: list[str] = []
+    engine = session_factory.kw["bind"]
+
+    def record(conn, cursor, statement, parameters, context, executemany) -> None:
+        if "users" not in statement.split("WHERE")[0]:
+            statements.append(" ".join(statement.split()[:3]).upper())
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post(
+            "/assignments/bulk",
+            json={"routine_id": 1, "week_start": "2026-03-04", "student_ids": [1, 2, 3, 4]},
+            headers=headers,
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 2)
+    rows = {row["student_id"]: row for row in body["rows"]}
+    assert rows[1]["detail"] == WEEKLY_CONFLICT_DETAIL
+    assert rows[2]["status"] == "created" and rows[3]["status"] == "created"
+    assert rows[4]["detail"] == "Deportista no encontrado"
+    # Rutina, deportistas + conflictos en una consulta, los INSERT (uno por
+    # fila en SQLite) y los planes de todo el lote con la rutina leída una vez.
+    assert [statement.split()[0] for statement in statements[:2]] == ["SELECT", "SELECT"]
+    assert statements.count("INSERT INTO STUDENT_ROUTINE_ASSIGNMENTS") == 2
+    assert statements.count("INSERT INTO ASSIGNMENT_EFFECTIVE_PLANS") == 1
+    assert sum(statement.startswith("SELECT ROUTINE_DAYS") for statement in statements) == 1
+
+    with session_factory() as db:
+        plan = db.get(AssignmentEffectivePlan, rows[3]["assignment_id"])
+        assert plan is not None and plan.weekly_total_arrows == 36
+        created = db.get(StudentRoutineAssignment, rows[2]["assignment_id"])
+        assert (created.start_date, created.end_date, created.week_start) == (
+            date(2026, 3, 2),
+            date(2026, 3, 8),
+            date(2026, 3, 2),
+        )
+
+    # Solo los activos: Ana ya tiene la semana siguiente libre, Carla está inactiva.
+    squad = client.post(
+        "/assignments/bulk",
+        json={"routine_id": 1, "week_start": "2026-03-09", "all_active_students": True},
+        headers=headers,
+    )
+    assert squad.status_code == 200
+    assert [(row["student_id"], row["status"]) for row in squad.json()["rows"]] == [(1, "created"), (2, "created")]
+    with session_factory() as db:
+        week_rows = db.scalars(
+            select(StudentRoutineAssignment.student_id).where(StudentRoutineAssignment.week_start == date(2026, 3, 9))
+        ).all()
+        assert sorted(week_rows) == [1, 2]
+
+    both = client.post(
+        "/assignments/bulk",
+        json={"routine_id": 1, "week_start": "2026-03-09", "student_ids": [1], "all_active_students": True},
+        headers=headers,
+    )
+    assert both.status_code == 400
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import io
+import subprocess
+import sys
+import zipfile
+from datetime import date
+from pathlib import Path
+
+from app import pdf_cache, pdf_export
+from app.models import Exercise, Student, StudentRoutineAssignment
+
+
+def test_assignment_pdf_is_cached_by_content(assignments_client, monkeypatch) -> None:
+    client, headers, session_factory = assignments_client
+    renders: list[dict] = []
+    original_render = pdf_cache.render_plan_pdf
+
+    def counting_render(plan):
+        renders.append(plan)
+        return original_render(plan)
+
+    monkeypatch.setattr(pdf_cache, "render_plan_pdf", counting_render)
+
+    first = client.get("/assignments/1/pdf", headers=headers)
+    assert first.status_code == 200
+    assert first.content.startswith(b"%PDF")
+    assert 'filename="PLAN SEMANAL Ana Perez 02-03 a 08-03.pdf"' in first.headers["content-disposition"]
+    etag = first.headers["ETag"]
+
+    second = client.get("/assignments/1/pdf", headers=headers)
+    assert second.content == first.content
+    assert second.headers["content-length"] == str(len(first.content))
+    assert len(renders) == 1
+
+    not_modified = client.get("/assignments/1/pdf", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+
+    with session_factory() as db:
+        db.get(StudentRoutineAssignment, 1).status = "finished"
+        db.commit()
+    changed = client.get("/assignments/1/pdf", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(renders) == 2
+
+
+def test_history_pdf_is_prerendered_from_snapshot(assignments_client, monkeypatch) -> None:
+    client, headers, session_factory = assignments_client
+    response = client.patch("/assignments/1/status", json={"status": "finished"}, headers=headers)
+    assert response.status_code == 200
+    history_id = client.get("/assignments/history", headers=headers).json()[0]["id"]
+
+    def fail_render(plan):
+        raise AssertionError("el PDF del historial debía estar pre-generado")
+
+    monkeypatch.setattr(pdf_cache, "render_plan_pdf", fail_render)
+    archived = client.get(f"/assignments/history/{history_id}/pdf", headers=headers)
+    assert archived.status_code == 200
+    assert archived.content.startswith(b"%PDF")
+
+    # Editar la rutina no altera el documento archivado.
+    with session_factory() as db:
+        db.get(Exercise, 1).name = "Otro ejercicio"
+        db.commit()
+    again = client.get(f"/assignments/history/{history_id}/pdf", headers=headers)
+    assert again.headers["ETag"] == archived.headers["ETag"]
+    assert client.get("/assignments/history/999/pdf", headers=headers).status_code == 404
+
+
+def test_pdf_batch_exports_zip_and_merged_document(assignments_client) -> None:
+    client, headers, session_factory = assignments_client
+    with session_factory() as db:
+        db.add_all(
+            [
+                Student(id=2, created_by_user_id=1, full_name="Beto Diaz", document_number="2"),
+                StudentRoutineAssignment(
+                    id=2,
+                    created_by_user_id=1,
+                    student_id=2,
+                    routine_id=1,
+                    start_date=date(2026, 3, 2),
+                    end_date=date(2026, 3, 8),
+                    status="active",
+                ),
+            ]
+        )
+        db.commit()
+
+    try:
+        response = client.post("/assignments/pdf-batch", json={"assignment_ids": [2, 1]}, headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/zip"
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            assert archive.namelist() == [
+                "PLAN SEMANAL Ana Perez 02-03 a 08-03.pdf",
+                "PLAN SEMANAL Beto Diaz 02-03 a 08-03.pdf",
+            ]
+            assert all(archive.read(name).startswith(b"%PDF") for name in archive.namelist())
+
+        merged = client.post(
+            "/assignments/pdf-batch",
+            json={"assignment_ids": [1, 2], "format": "merged"},
+            headers=headers,
+        )
+        assert merged.status_code == 200
+        assert merged.content.startswith(b"%PDF")
+    finally:
+        pdf_export.shutdown_pdf_render_pool()
+
+    missing = client.post("/assignments/pdf-batch", json={"assignment_ids": [1, 99]}, headers=headers)
+    assert missing.status_code == 404
+    both = client.post(
+        "/assignments/pdf-batch",
+        json={"assignment_ids": [1], "active_this_week": True},
+        headers=headers,
+    )
+    assert both.status_code == 400
+
+
+def test_pdf_cache_evicts_least_recently_used(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(pdf_cache.settings, "pdf_cache_dir", str(tmp_path))
+    monkeypatch.setattr(pdf_cache.settings, "pdf_cache_max_mb", 1)
+    pdf_cache.clear_pdf_cache()
+    chunk = b"x" * (400 * 1024)
+    pdf_cache.store_cached_pdf("a", chunk)
+    pdf_cache.store_cached_pdf("b", chunk)
+    assert pdf_cache.get_cached_pdf("a") == chunk
+    pdf_cache.store_cached_pdf("c", chunk)
+
+    assert pdf_cache.get_cached_pdf("b") is None
+    assert pdf_cache.get_cached_pdf("a") == chunk
+    assert pdf_cache.get_cached_pdf("c") == chunk
+    pdf_cache.clear_pdf_cache()
+
+
+def test_reportlab_stays_lazy_until_prewarm() -> None:
+    # Importar la app no carga ReportLab; el pre-calentamiento sí.
+    script = (
+        "import sys\n"
+        "import app.main\n"
+        "assert 'reportlab' not in sys.modules\n"
+        "from app.deps import settings\n"
+        "settings.pdf_render_workers = 0\n"
+        "from app.pdf_export import warm_up_pdf_renderer\n"
+        "warm_up_pdf_renderer()\n"
+        "assert 'reportlab.pdfgen.canvas' in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=Path(__file__).resolve().parents[1])
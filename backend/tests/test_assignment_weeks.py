@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from sqlalchemy import create_mock_engine
+from sqlalchemy.exc import IntegrityError
+
+from app.assignment_weeks import WEEKLY_CONFLICT_DETAIL, is_weekly_conflict
+from app.models import StudentRoutineAssignment
+
+
+def test_one_active_assignment_per_week_is_enforced_by_the_database(assignments_client) -> None:
+    client, headers, session_factory = assignments_client
+    same_week = {"student_id": 1, "routine_id": 1, "start_date": "2026-03-04", "end_date": "2026-03-08"}
+
+    conflict = client.post("/assignments", json={**same_week, "status": "active"}, headers=headers)
+    assert conflict.status_code == 400
+    assert conflict.json()["detail"] == WEEKLY_CONFLICT_DETAIL
+
+    paused = client.post("/assignments", json={**same_week, "status": "paused"}, headers=headers)
+    assert paused.status_code == 201
+    reactivated = client.patch(f"/assignments/{paused.json()['id']}/status", json={"status": "active"}, headers=headers)
+    assert reactivated.status_code == 400
+    assert reactivated.json()["detail"] == WEEKLY_CONFLICT_DETAIL
+
+    next_week = client.post(
+        "/assignments",
+        json={"student_id": 1, "routine_id": 1, "start_date": "2026-03-10", "status": "active"},
+        headers=headers,
+    )
+    assert next_week.status_code == 201
+    with session_factory() as db:
+        assert db.get(StudentRoutineAssignment, next_week.json()["id"]).week_start == date(2026, 3, 9)
+
+        # Sin pasar por el endpoint (p. ej. dos requests concurrentes) también falla.
+        db.add(StudentRoutineAssignment(student_id=1, routine_id=1, start_date=date(2026, 3, 6), status="active"))
+        with pytest.raises(IntegrityError) as excinfo:
+            db.commit()
+        assert is_weekly_conflict(excinfo.value)
+
+
+def test_mysql_create_all_uses_the_generated_week_key() -> None:
+    # create_all debe dejar en MySQL la misma unicidad que la migración 13.
+    statements: list[str] = []
+    engine = create_mock_engine(
+        "mysql+pymysql://",
+        lambda sql, *args, **kwargs: statements.append(str(sql.compile(dialect=engine.dialect))),
+    )
+    StudentRoutineAssignment.__table__.create(engine)
+
+    ddl = "\n".join(statements)
+    assert "(student_id, week_start)" not in ddl
+    assert "AS (IF(status = 'active', YEARWEEK(week_start, 3), NULL)) STORED" in ddl
+    assert "ADD UNIQUE INDEX uq_assignments_active_week (student_id, active_week_key)" in ddl
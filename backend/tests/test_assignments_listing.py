@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import Routine, Student, StudentRoutineAssignment
+from app.pagination import NEXT_CURSOR_HEADER
+from app.routers import assignments
+
+
+def seed_assignments(session_factory: sessionmaker, count: int) -> None:
+    base_time = datetime(2026, 1, 5, 8, 0, 0)
+    with session_factory() as db:
+        db.add_all(
+            [
+                Student(id=1, created_by_user_id=1, full_name="Ana", document_number="1"),
+                Student(id=2, created_by_user_id=1, full_name="Beto", document_number="2"),
+                Routine(id=1, created_by_user_id=1, name="Base"),
+            ]
+        )
+        for index in range(count):
+            week_start = date(2026, 1, 5) + timedelta(weeks=index)
+            db.add(
+                StudentRoutineAssignment(
+                    created_by_user_id=1,
+                    student_id=1 if index % 2 == 0 else 2,
+                    routine_id=1,
+                    start_date=week_start,
+                    end_date=week_start + timedelta(days=6),
+                    status="finished" if index < count - 2 else "active",
+                    # Dos asignaciones por instante para ejercitar el desempate por id.
+                    created_at=base_time + timedelta(minutes=index // 2),
+                )
+            )
+        db.commit()
+
+
+def test_list_assignments_keyset_pages_and_filters(engine, session_factory, make_client) -> None:
+    Base.metadata.create_all(
+        engine,
+        tables=[Student.__table__, Routine.__table__, StudentRoutineAssignment.__table__],
+    )
+    seed_assignments(session_factory, 7)
+    client, headers = make_client(assignments.router)
+
+    seen_ids: list[int] = []
+    cursor = None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/assignments", params=params, headers=headers)
+        assert response.status_code == 200
+        seen_ids.extend(item["id"] for item in response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+
+    full_listing = client.get("/assignments", headers=headers).json()
+    assert seen_ids == [item["id"] for item in full_listing]
+    assert len(set(seen_ids)) == 7
+
+    active = client.get("/assignments", params={"status": "active", "student_id": 1}, headers=headers).json()
+    assert [item["status"] for item in active] == ["active"]
+
+    window = client.get(
+        "/assignments",
+        params={"date_from": "2026-01-12", "date_to": "2026-01-20"},
+        headers=headers,
+    ).json()
+    assert sorted(item["start_date"] for item in window) == ["2026-01-12", "2026-01-19"]
+
+    assert client.get("/assignments", params={"cursor": "no-es-un-cursor"}, headers=headers).status_code == 400
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import security
+from app.models import Student, User
+from app.routers import students
+
+
+def count_user_selects(engine: Engine) -> list[str]:
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def test_authenticated_user_is_cached_between_requests(engine, make_client) -> None:
+    client, headers = make_client()
+
+    user_selects = count_user_selects(engine)
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    assert len(user_selects) == 1
+
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    assert len(user_selects) == 1
+
+
+def test_revoked_session_invalidates_cached_user(session_factory, make_client) -> None:
+    client, headers = make_client()
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    with session_factory() as db:
+        user = db.query(User).filter(User.username == "profesor").one()
+        user.is_active = False
+        db.commit()
+    assert client.post("/auth/logout", json={}, headers=headers).status_code == 200
+
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_role_protected_request_resolves_user_once(engine, make_client, monkeypatch) -> None:
+    Student.__table__.create(engine)
+    client, headers = make_client(students.router)
+
+    decoded_tokens: list[str] = []
+    original_decode_token = security.decode_token
+
+    def counting_decode_token(token: str, **kwargs) -> dict:
+        decoded_tokens.append(token)
+        return original_decode_token(token, **kwargs)
+
+    monkeypatch.setattr(security, "decode_token", counting_decode_token)
+    user_selects = count_user_selects(engine)
+
+    response = client.get("/students", headers=headers)
+
+    assert response.status_code == 200
+    assert len(decoded_tokens) == 1
+    assert len(user_selects) == 1
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from app.db import Base
+from app.models import Routine, RoutineDay, RoutineDayExercise, Exercise, Student
+from app.routers import routines, students
+
+
+def test_conditional_get_returns_304_until_data_changes(engine, session_factory, make_client) -> None:
+    Base.metadata.create_all(
+        engine,
+        tables=[
+            Exercise.__table__,
+            Student.__table__,
+            Routine.__table__,
+            RoutineDay.__table__,
+            RoutineDayExercise.__table__,
+        ],
+    )
+    with session_factory() as db:
+        db.add_all(
+            [
+                Student(id=1, created_by_user_id=1, full_name="Ana", document_number="1"),
+                Routine(id=1, created_by_user_id=1, name="Base"),
+            ]
+        )
+        db.commit()
+    client, headers = make_client(students.router, routines.router)
+
+    for path in ("/students", "/routines", "/routines/1"):
+        first = client.get(path, headers=headers)
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+        again = client.get(path, headers={**headers, "If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.content == b""
+
+    students_etag = client.get("/students", headers=headers).headers["ETag"]
+    # Otro filtro es otro recurso.
+    filtered = client.get("/students", params={"q": "An"}, headers={**headers, "If-None-Match": students_etag})
+    assert filtered.status_code == 200
+
+    created = client.post(
+        "/students",
+        json={"full_name": "Beto", "document_number": "2"},
+        headers=headers,
+    )
+    assert created.status_code == 201
+    refreshed = client.get("/students", headers={**headers, "If-None-Match": students_etag})
+    assert refreshed.status_code == 200
+    assert [item["full_name"] for item in refreshed.json()] == ["Ana", "Beto"]
+
+    assert client.get("/routines/99", headers=headers).status_code == 404
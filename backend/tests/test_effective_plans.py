@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import json
+from datetime import date
+
+from sqlalchemy import select
+
+from app.models import (
+    AssignmentEffectivePlan,
+    AssignmentPlanDependency,
+    Exercise,
+    Routine,
+    RoutineDay,
+    RoutineDayExercise,
+    StudentRoutineAssignment,
+)
+from app.effective_plans import materialize_effective_plans
+from app.routers import exercises
+
+
+def test_exercise_edit_refreshes_only_dependent_plans(assignments_client, make_client) -> None:
+    client, headers, session_factory = assignments_client
+    with session_factory() as db:
+        db.add_all(
+            [
+                Exercise(id=2, created_by_user_id=1, name="Tiro a 30 m", arrows_count=30, rounds=5, arrows_per_round=6, distance_m=30),
+                Routine(id=2, created_by_user_id=1, name="Distancia"),
+                RoutineDay(id=2, routine_id=2, day_number=1, name="Martes"),
+                RoutineDayExercise(id=2, routine_day_id=2, exercise_id=2, sort_order=1),
+                StudentRoutineAssignment(
+                    id=2,
+                    created_by_user_id=1,
+                    student_id=1,
+                    routine_id=2,
+                    start_date=date(2026, 3, 9),
+                    end_date=date(2026, 3, 15),
+                    status="active",
+                ),
+            ]
+        )
+        db.commit()
+
+    # Leer no escribe: sin plan guardado se calcula al vuelo.
+    assert client.get("/assignments/1/pdf", headers=headers).status_code == 200
+    with session_factory() as db:
+        assert db.scalars(select(AssignmentEffectivePlan)).all() == []
+        materialize_effective_plans(db, db.scalars(select(StudentRoutineAssignment)).all())
+        db.commit()
+        computed_at = {row.assignment_id: row.computed_at for row in db.scalars(select(AssignmentEffectivePlan)).all()}
+        assert set(computed_at) == {1, 2}
+        dependencies = db.execute(select(AssignmentPlanDependency.assignment_id, AssignmentPlanDependency.exercise_id)).all()
+        assert sorted(dependencies) == [(1, 1), (2, 2)]
+
+    exercise_client, _ = make_client(exercises.router)
+    updated = exercise_client.put(
+        "/exercises/1",
+        json={"name": "Tiro a 18 m (indoor)", "arrows_count": 36, "rounds": 6, "arrows_per_round": 6, "distance_m": 18},
+        headers=headers,
+    )
+    assert updated.status_code == 200
+    # La edición recalcula en su transacción solo el plan que usa el ejercicio.
+    with session_factory() as db:
+        plans = {row.assignment_id: row for row in db.scalars(select(AssignmentEffectivePlan)).all()}
+        assert json.loads(plans[1].days_json)[0]["items"][0]["name"] == "Tiro a 18 m (indoor)"
+        assert plans[1].computed_at > computed_at[1]
+        assert plans[2].computed_at == computed_at[2]
+
+
+def test_legacy_notes_are_stored_as_structured_overrides(assignments_client) -> None:
+    client, headers, session_factory = assignments_client
+    legacy_notes = {
+        "source": "existing_template_assignment",
+        "objective": "Puntería",
+        "professor_notes": "Cuidar el anclaje",
+        "temporary_exercises_by_day": {"day_1": [1]},
+        "temporary_exercise_overrides_by_day": {"day_1": {"1": {"arrows_override": 24, "distance_override_m": 25}}},
+    }
+    created = client.post(
+        "/assignments",
+        json={"student_id": 1, "routine_id": 1, "status": "paused", "notes": json.dumps(legacy_notes)},
+        headers=headers,
+    )
+    assert created.status_code == 201
+    body = created.json()
+    assert body["objective"] == "Puntería"
+    assert body["professor_notes"] == "Cuidar el anclaje"
+    assert json.loads(body["notes"]) == {"source": "existing_template_assignment"}
+
+    overrides = client.get(f"/assignments/{body['id']}/overrides", headers=headers).json()["overrides"]
+    assert [(item["day_index"], item["exercise_id"], item["arrows_override"], item["distance_override_m"]) for item in overrides] == [
+        (1, 1, 24, 25.0)
+    ]
+    with session_factory() as db:
+        assert db.get(AssignmentEffectivePlan, body["id"]).weekly_total_arrows == 24
+
+    updated = client.put(
+        f"/assignments/{body['id']}/overrides",
+        json={"objective": "Técnica", "overrides": [{"day_index": 1, "exercise_id": 1, "arrows_override": 12}]},
+        headers=headers,
+    )
+    assert updated.status_code == 200
+    assert updated.json()["objective"] == "Técnica"
+    with session_factory() as db:
+        plan = db.get(AssignmentEffectivePlan, body["id"])
+        assert (plan.objective, plan.weekly_total_arrows) == ("Técnica", 12)
+
+    unknown = client.put(
+        f"/assignments/{body['id']}/overrides",
+        json={"overrides": [{"day_index": 1, "exercise_id": 99}]},
+        headers=headers,
+    )
+    assert unknown.status_code == 400
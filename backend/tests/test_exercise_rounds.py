@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.exercise_rounds import _backfill_exercise_rounds
+
+
+def test_backfill_fills_rows_with_missing_arrows_count() -> None:
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    with Session(engine) as db:
+        # Tabla sin NOT NULL, como en bases creadas antes de la migración.
+        db.execute(
+            text(
+                "CREATE TABLE exercises (id INTEGER PRIMARY KEY, name TEXT, description TEXT, "
+                "arrows_count INTEGER, rounds INTEGER, arrows_per_round INTEGER)"
+            )
+        )
+        db.execute(
+            text(
+                "INSERT INTO exercises VALUES "
+                "(1, 'Sin total', NULL, NULL, 1, 0), "
+                "(2, 'Con rondas', '3 rondas de 6 disparos', NULL, NULL, NULL), "
+                "(3, 'Completo', NULL, 36, 6, 6)"
+            )
+        )
+        _backfill_exercise_rounds(db)
+        rows = db.execute(text("SELECT id, arrows_count, rounds, arrows_per_round FROM exercises ORDER BY id")).all()
+    assert rows == [(1, 0, 1, 0), (2, 18, 3, 6), (3, 36, 6, 6)]
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app import pdf_cache
+from app.export_jobs import STALE_JOB_AFTER, export_result_path, sweep_stale_export_jobs
+from app.models import ExportJob
+from app.routers import exports
+
+
+def test_export_job_is_queued_and_served_when_done(engine, plan_db, make_client, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(pdf_cache.settings, "pdf_cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(pdf_cache.settings, "export_dir", str(tmp_path / "exports"))
+    # Sin hilos ni procesos: el job corre dentro del request y el test es determinista.
+    monkeypatch.setattr(pdf_cache.settings, "export_job_threads", 0)
+    monkeypatch.setattr(pdf_cache.settings, "pdf_render_workers", 0)
+    pdf_cache.clear_pdf_cache()
+    ExportJob.__table__.create(engine)
+    client, headers = make_client(exports.router)
+
+    created = client.post("/exports", json={"assignment_ids": [1], "format": "merged"}, headers=headers)
+    assert created.status_code == 202
+    job = created.json()
+    assert job["status"] == "done"
+    assert job["file_name"] == "PLAN SEMANAL Ana Perez 02-03 a 08-03.pdf"
+
+    downloaded = client.get(f"/exports/{job['id']}", headers=headers)
+    assert downloaded.status_code == 200
+    assert downloaded.headers["content-type"] == "application/pdf"
+    assert downloaded.content.startswith(b"%PDF")
+
+    with plan_db() as db:
+        db.add(ExportJob(created_by_user_id=1, status="queued", format="zip", file_name="x.zip", params_json="{}"))
+        db.commit()
+    pending = client.get("/exports/2", headers=headers)
+    assert pending.status_code == 202
+    assert pending.json()["status"] == "queued"
+
+    export_result_path(job["id"]).unlink()
+    assert client.get(f"/exports/{job['id']}", headers=headers).status_code == 410
+    assert client.post("/exports", json={"assignment_ids": [99]}, headers=headers).status_code == 404
+    pdf_cache.clear_pdf_cache()
+
+
+def test_orphaned_running_export_is_failed_without_a_restart(engine, make_client) -> None:
+    ExportJob.__table__.create(engine)
+    client, headers = make_client(exports.router)
+    stale_start = datetime.utcnow() - STALE_JOB_AFTER * 2
+    with Session(engine) as db:
+        db.add_all(
+            [
+                ExportJob(id=1, created_by_user_id=1, status="running", format="zip", file_name="a.zip",
+                          params_json="{}", created_at=stale_start, started_at=stale_start),
+                ExportJob(id=2, created_by_user_id=1, status="running", format="zip", file_name="b.zip",
+                          params_json="{}", created_at=stale_start, started_at=stale_start),
+                ExportJob(id=3, created_by_user_id=1, status="running", format="zip", file_name="c.zip",
+                          params_json="{}", created_at=datetime.utcnow(), started_at=datetime.utcnow()),
+            ]
+        )
+        db.commit()
+
+    # El cliente que consulta un job huérfano recibe el fallo sin esperar al scheduler.
+    polled = client.get("/exports/1", headers=headers)
+    assert polled.status_code == 200
+    assert polled.json()["status"] == "failed"
+
+    # El scheduler barre el resto; el que sigue corriendo no se toca.
+    assert sweep_stale_export_jobs(engine) == 1
+    with Session(engine) as db:
+        assert db.get(ExportJob, 2).status == "failed"
+        assert db.get(ExportJob, 3).status == "running"
+    assert client.get("/exports/3", headers=headers).status_code == 202
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.db import Base
+from app.models import DeletedRecord, ScheduledJobRun, Student, StudentRoutineAssignment
+from app.purge_scheduler import PURGE_JOB_NAME, run_student_purge
+
+
+def test_scheduled_purge_runs_once_per_interval_across_workers(engine) -> None:
+    Base.metadata.create_all(
+        engine,
+        tables=[
+            Student.__table__,
+            StudentRoutineAssignment.__table__,
+            DeletedRecord.__table__,
+            ScheduledJobRun.__table__,
+        ],
+    )
+
+    # Dos workers que despiertan casi a la vez: el segundo ve la corrida del primero.
+    assert run_student_purge(engine, min_interval_seconds=3600)["status"] == "completed"
+    assert run_student_purge(engine, min_interval_seconds=3600)["status"] == "skipped"
+    # La ejecución manual no espera al intervalo.
+    assert run_student_purge(engine)["status"] == "completed"
+
+    with Session(engine) as db:
+        db.get(ScheduledJobRun, PURGE_JOB_NAME).last_run_at = datetime.utcnow() - timedelta(hours=2)
+        db.commit()
+    assert run_student_purge(engine, min_interval_seconds=3600)["status"] == "completed"
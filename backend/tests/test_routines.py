@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import AssignmentEffectivePlan, AssignmentPlanDependency, Exercise, Routine, RoutineDay, RoutineDayExercise, StudentRoutineAssignment, Student
+from app.routers import exercises, routines
+
+
+@contextmanager
+def recorded_statements(session_factory: sessionmaker) -> Iterator[list[str]]:
+    # Sentencias contra las tablas de rutinas (sin la autenticación del request).
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany) -> None:
+        if "routine" in statement.split("WHERE")[0] and "assignment" not in statement:
+            statements.append(" ".join(statement.split()[:3]).upper())
+
+    engine = session_factory.kw["bind"]
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture()
+def routines_client(engine, session_factory, make_client) -> Iterator[tuple[TestClient, dict[str, str], sessionmaker]]:
+    Base.metadata.create_all(
+        engine,
+        tables=[
+            Exercise.__table__,
+            Student.__table__,
+            Routine.__table__,
+            RoutineDay.__table__,
+            RoutineDayExercise.__table__,
+            StudentRoutineAssignment.__table__,
+            AssignmentEffectivePlan.__table__,
+            AssignmentPlanDependency.__table__,
+        ],
+    )
+    with session_factory() as db:
+        db.add_all(
+            [
+                Exercise(id=1, created_by_user_id=1, name="Tiro a 18 m", arrows_count=36, rounds=6, arrows_per_round=6, distance_m=18),
+                Exercise(id=2, created_by_user_id=1, name="Tiro a 30 m", arrows_count=30, rounds=5, arrows_per_round=6, distance_m=30),
+                Routine(id=1, created_by_user_id=1, name="Base", is_template=True),
+                RoutineDay(id=1, routine_id=1, day_number=1, name="Lunes"),
+                RoutineDay(id=2, routine_id=1, day_number=3, name="Miércoles"),
+                RoutineDayExercise(id=1, routine_day_id=1, exercise_id=1, sort_order=1),
+                RoutineDayExercise(id=2, routine_day_id=1, exercise_id=2, sort_order=2, arrows_override=12),
+                RoutineDayExercise(id=3, routine_day_id=2, exercise_id=1, sort_order=1),
+                Routine(id=2, created_by_user_id=1, name="Vacía", is_template=False),
+            ]
+        )
+        db.commit()
+    client, headers = make_client(routines.router)
+    yield client, headers, session_factory
+
+
+def test_routine_summary_view_aggregates_without_tree(routines_client) -> None:
+    client, headers, _ = routines_client
+    summary = client.get("/routines", params={"view": "summary"}, headers=headers)
+    assert summary.status_code == 200
+    assert summary.json() == [
+        {"id": 1, "name": "Base", "is_active": True, "is_template": True, "day_count": 2, "exercise_count": 3, "weekly_arrows": 84},
+        {"id": 2, "name": "Vacía", "is_active": True, "is_template": False, "day_count": 0, "exercise_count": 0, "weekly_arrows": 0},
+    ]
+
+    full = client.get("/routines", headers={**headers, "If-None-Match": summary.headers["ETag"]})
+    assert full.status_code == 200
+    assert [len(item["days"]) for item in full.json()] == [2, 0]
+    assert client.get("/routines", params={"view": "tree"}, headers=headers).status_code == 422
+
+
+def test_routine_summary_etag_follows_exercise_edits(routines_client, make_client) -> None:
+    client, headers, _ = routines_client
+    first = client.get("/routines", params={"view": "summary"}, headers=headers)
+    etag = first.headers["ETag"]
+    assert client.get("/routines", params={"view": "summary"}, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    exercise_client, _ = make_client(exercises.router)
+    updated = exercise_client.put(
+        "/exercises/1",
+        json={"name": "Tiro a 18 m", "arrows_count": 60, "rounds": 10, "arrows_per_round": 6, "distance_m": 18},
+        headers=headers,
+    )
+    assert updated.status_code == 200
+    # La rutina no cambió, pero su volumen semanal sí.
+    refreshed = client.get("/routines", params={"view": "summary"}, headers={**headers, "If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.json()[0]["weekly_arrows"] == 132
+    assert refreshed.headers["ETag"] != etag
+
+
+def _day_rows(client: TestClient, headers: dict[str, str]) -> dict[int, list[tuple[int, int, int]]]:
+    routine = client.get("/routines/1", headers=headers).json()
+    return {
+        day["day_number"]: [(item["id"], item["exercise_id"], item["sort_order"]) for item in day["exercises"]]
+        for day in routine["days"]
+    }
+
+
+def test_routine_updates_only_touch_changed_rows(routines_client) -> None:
+    client, headers, session_factory = routines_client
+    payload = {
+        "name": "Base",
+        "is_template": True,
+        "days": [
+            {"day_number": 1, "name": "Lunes", "exercises": [{"exercise_id": 1}, {"exercise_id": 2, "arrows_override": 12}]},
+            {"day_number": 3, "name": "Miércoles", "exercises": [{"exercise_id": 1, "distance_override_m": 20}]},
+        ],
+    }
+    with recorded_statements(session_factory) as statements:
+        assert client.put("/routines/1", json=payload, headers=headers).status_code == 200
+    writes = [statement for statement in statements if not statement.startswith("SELECT")]
+    # Solo el ejercicio editado y routines.updated_at; nada se borra ni se reinserta.
+    assert sorted(writes) == ["UPDATE ROUTINES SET", "UPDATE ROUTINE_DAY_EXERCISES SET"]
+    assert _day_rows(client, headers) == {1: [(1, 1, 1), (2, 2, 2)], 3: [(3, 1, 1)]}
+
+    # Reordenar intercambia sort_order sobre las mismas filas, pasando por
+    # valores provisorios positivos (INT UNSIGNED en MySQL).
+    written_orders: list[int] = []
+
+    def record_orders(conn, cursor, statement, parameters, context, executemany) -> None:
+        if statement.startswith("UPDATE routine_day_exercises SET sort_order"):
+            rows = parameters if executemany else [parameters]
+            written_orders.extend(row[0] for row in rows)
+
+    engine = session_factory.kw["bind"]
+    event.listen(engine, "before_cursor_execute", record_orders)
+    try:
+        reordered = client.patch(
+            "/routines/1",
+            json={"days": [{"day_number": 1, "exercises": [{"exercise_id": 2, "arrows_override": 12}, {"exercise_id": 1}]}]},
+            headers=headers,
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record_orders)
+    assert reordered.status_code == 200
+    assert len(written_orders) == 4 and min(written_orders) > 0
+    assert _day_rows(client, headers) == {1: [(2, 2, 1), (1, 1, 2)], 3: [(3, 1, 1)]}
+
+    patched = client.patch(
+        "/routines/1",
+        json={"description": "Semana 2", "days": [{"day_number": 3, "remove": True}, {"day_number": 5, "exercises": [{"exercise_id": 2}]}]},
+        headers=headers,
+    )
+    assert patched.status_code == 200
+    assert patched.json()["description"] == "Semana 2"
+    rows = _day_rows(client, headers)
+    assert sorted(rows) == [1, 5]
+    assert rows[1] == [(2, 2, 1), (1, 1, 2)]
+    assert client.patch("/routines/1", json={"is_active": None}, headers=headers).status_code == 400
+
+
+def test_routine_saves_do_not_reload_after_commit(routines_client) -> None:
+    client, headers, session_factory = routines_client
+    payload = {
+        "name": "Semana completa",
+        "days": [
+            {"day_number": day_number, "exercises": [{"exercise_id": 1, "sort_order": 2}, {"exercise_id": 2, "sort_order": 1}]}
+            for day_number in range(1, 8)
+        ],
+    }
+    with recorded_statements(session_factory) as statements:
+        created = client.post("/routines", json=payload, headers=headers)
+    assert created.status_code == 201
+    body = created.json()
+    assert [day["day_number"] for day in body["days"]] == list(range(1, 8))
+    assert [item["exercise_id"] for item in body["days"][0]["exercises"]] == [2, 1]
+    assert all(item["id"] for day in body["days"] for item in day["exercises"])
+    # Sin SELECT posteriores: una fila por INSERT (SQLite no agrupa con
+    # RETURNING; PostgreSQL sí) y la respuesta sale de la sesión.
+    assert statements == (
+        ["INSERT INTO ROUTINES"] + ["INSERT INTO ROUTINE_DAYS"] * 7 + ["INSERT INTO ROUTINE_DAY_EXERCISES"] * 14
+    )
+
+    payload["days"][0]["exercises"][0]["arrows_override"] = 10
+    with recorded_statements(session_factory) as statements:
+        updated = client.put(f"/routines/{body['id']}", json=payload, headers=headers)
+    assert updated.status_code == 200
+    assert updated.json()["days"][0]["exercises"][1]["arrows_override"] == 10
+    # Rutina, días y ejercicios (selectinload) y las dos escrituras.
+    assert statements == [
+        "SELECT ROUTINES.ID, ROUTINES.CREATED_BY_USER_ID,",
+        "SELECT ROUTINE_DAYS.ROUTINE_ID, ROUTINE_DAYS.ID,",
+        "SELECT ROUTINE_DAY_EXERCISES.ROUTINE_DAY_ID, ROUTINE_DAY_EXERCISES.ID,",
+        "UPDATE ROUTINES SET",
+        "UPDATE ROUTINE_DAY_EXERCISES SET",
+    ]
+
+
+def test_routine_integrity_errors_name_the_failed_constraint(routines_client) -> None:
+    client, headers, session_factory = routines_client
+
+    duplicated = client.post("/routines", json={"name": "Base", "days": []}, headers=headers)
+    assert duplicated.status_code == 400
+    assert duplicated.json()["detail"] == "Ya existe una rutina con ese nombre"
+
+    # Los choques de días/orden solo llegan desde la base (dos guardados a la vez).
+    with session_factory() as db:
+        for row, expected in (
+            (RoutineDay(routine_id=1, day_number=1), "day_number duplicado en la rutina"),
+            (RoutineDayExercise(routine_day_id=1, exercise_id=2, sort_order=1), "sort_order duplicado en un día de la rutina"),
+        ):
+            db.add(row)
+            with pytest.raises(IntegrityError) as excinfo:
+                db.flush()
+            db.rollback()
+            assert routines._integrity_error_detail(excinfo.value) == expected
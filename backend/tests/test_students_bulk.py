@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from sqlalchemy import event
+
+from app.models import Student, User
+from app.routers import students
+
+
+def test_bulk_import_reports_each_row_and_creates_accounts(engine, session_factory, make_client) -> None:
+    Student.__table__.create(engine)
+    client, headers = make_client(students.router)
+
+    csv_body = (
+        "full_name,document_number,account_username,account_password,is_active\n"
+        "Ana Pérez,100,ana100,clave1234,true\n"
+        "Beto Díaz,200,,,false\n"
+        "Ana Repetida,100,,,\n"
+        "Sin Documento,,,,\n"
+    )
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(" ".join(statement.split()[:3]).upper())
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post(
+            "/students/bulk",
+            content=csv_body.encode("utf-8"),
+            headers={**headers, "Content-Type": "text/csv"},
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 2
+    assert body["failed"] == 2
+    assert [row["status"] for row in body["rows"]] == ["created", "created", "error", "error"]
+    # Un INSERT por tabla y los ids leídos de una vez, sin refresh por fila.
+    assert statements.count("INSERT INTO USERS") == 1
+    assert statements.count("INSERT INTO STUDENTS") == 1
+    assert not any(statement.startswith("SELECT STUDENTS.ID, STUDENTS.CREATED_BY_USER_ID") for statement in statements)
+    assert body["rows"][0]["student_id"] and body["rows"][1]["student_id"]
+
+    with session_factory() as db:
+        ana = db.query(Student).filter(Student.document_number == "100").one()
+        account = db.get(User, ana.user_id)
+        assert account is not None and account.role == "student"
+        beto = db.query(Student).filter(Student.document_number == "200").one()
+        assert beto.user_id is None and beto.inactive_since is not None
+
+    second = client.post(
+        "/students/bulk",
+        json={"students": [{"full_name": "Ana Pérez", "document_number": "100"}]},
+        headers=headers,
+    )
+    assert second.status_code == 200
+    assert second.json()["rows"][0]["detail"] == "Ya existe un deportista con ese número de documento"
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from app.db import Base
+from app.models import (
+    DeletedRecord,
+    Exercise,
+    Routine,
+    RoutineDay,
+    RoutineDayExercise,
+    Student,
+    StudentRoutineAssignment,
+)
+from app.routers import assignments, sync
+
+
+def test_sync_returns_changes_and_tombstones_since_token(engine, session_factory, make_client) -> None:
+    Base.metadata.create_all(
+        engine,
+        tables=[
+            Exercise.__table__,
+            Student.__table__,
+            Routine.__table__,
+            RoutineDay.__table__,
+            RoutineDayExercise.__table__,
+            StudentRoutineAssignment.__table__,
+            DeletedRecord.__table__,
+        ],
+    )
+    old = datetime.utcnow() - timedelta(days=1)
+    with session_factory() as db:
+        db.add_all(
+            [
+                Student(id=1, created_by_user_id=1, full_name="Ana", document_number="1", updated_at=old),
+                Student(id=2, created_by_user_id=2, full_name="Ajeno", document_number="2", updated_at=old),
+                Routine(id=1, created_by_user_id=1, name="Base", updated_at=old),
+                StudentRoutineAssignment(
+                    id=1,
+                    created_by_user_id=1,
+                    student_id=1,
+                    routine_id=1,
+                    start_date=date(2026, 1, 5),
+                    end_date=date(2026, 1, 11),
+                    updated_at=old,
+                ),
+            ]
+        )
+        db.commit()
+    client, headers = make_client(assignments.router, sync.router)
+
+    full = client.get("/sync", headers=headers).json()
+    assert full["full"] is True
+    assert [item["id"] for item in full["students"]] == [1]
+    assert [item["id"] for item in full["assignments"]] == [1]
+
+    assert client.delete("/assignments/1", headers=headers).status_code == 204
+    with session_factory() as db:
+        db.add(Student(id=3, created_by_user_id=1, full_name="Beto", document_number="3"))
+        db.commit()
+
+    delta = client.get("/sync", params={"since": full["token"]}, headers=headers).json()
+    assert delta["full"] is False
+    assert [item["id"] for item in delta["students"]] == [3]
+    assert delta["routines"] == [] and delta["assignments"] == []
+    assert delta["deleted"]["assignments"] == [1]
+
+    assert client.get("/sync", params={"since": "roto"}, headers=headers).status_code == 400
@@ -1,6 +1,8 @@
 -- =========================================
 -- DB: archery_training
 -- MariaDB - InnoDB + utf8mb4 (compatibilidad es/en)
+-- Refleja el esquema al nivel de la ultima migracion de backend/app/migrations.py;
+-- las bases existentes se actualizan con esas migraciones, no con este script.
 -- =========================================
 
 CREATE DATABASE IF NOT EXISTS archery_training
@@ -19,6 +21,8 @@ CREATE TABLE IF NOT EXISTS users (
   role ENUM('admin','professor','student') NOT NULL DEFAULT 'admin',
   is_active TINYINT(1) NOT NULL DEFAULT 1,
   preferred_lang CHAR(2) NOT NULL DEFAULT 'es', -- futuro i18n (es/en)
+  refresh_token_hash VARCHAR(255) NULL,
+  refresh_token_expires_at DATETIME NULL,
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (id),
@@ -40,11 +44,13 @@ CREATE TABLE IF NOT EXISTS exercises (
   distance_m DECIMAL(6,2) UNSIGNED NOT NULL,    -- distancia en metros (18.00, 70.00, etc.)
   description TEXT NULL,
   is_active TINYINT(1) NOT NULL DEFAULT 1,
+  created_by_user_id BIGINT NULL,
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (id),
   KEY idx_exercises_active (is_active),
   KEY idx_exercises_name (name),
+  KEY idx_exercises_created_by (created_by_user_id),
   CONSTRAINT chk_exercises_arrows_positive CHECK (arrows_count >= 0),
   CONSTRAINT chk_exercises_rounds_positive CHECK (rounds > 0),
   CONSTRAINT chk_exercises_arrows_per_round_positive CHECK (arrows_per_round >= 0),
@@ -56,6 +62,7 @@ CREATE TABLE IF NOT EXISTS exercises (
 -- -----------------------------------------
 CREATE TABLE IF NOT EXISTS students (
   id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  user_id BIGINT UNSIGNED NULL,                -- cuenta de alumno vinculada
   full_name VARCHAR(150) NOT NULL,
   document_number VARCHAR(50) NOT NULL,
   contact VARCHAR(255) NULL,                   -- tel/email/nota libre
@@ -63,14 +70,19 @@ CREATE TABLE IF NOT EXISTS students (
   arrows_available INT UNSIGNED NULL,          -- flechas disponibles
   is_active TINYINT(1) NOT NULL DEFAULT 1,
   inactive_since DATETIME NULL,                -- fecha desde la que quedó inactivo (auto purge a 30 días)
+  created_by_user_id BIGINT NULL,
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (id),
-  UNIQUE KEY uq_students_document (document_number),
+  UNIQUE KEY uq_students_owner_document (created_by_user_id, document_number),
+  UNIQUE KEY uq_students_user_id (user_id),
   KEY idx_students_active (is_active),
   KEY idx_students_name (full_name),
   KEY idx_students_active_name (is_active, full_name),
   KEY idx_students_inactive_since (is_active, inactive_since),
+  KEY idx_students_created_by (created_by_user_id),
+  KEY idx_students_owner_name (created_by_user_id, full_name, id),
+  CONSTRAINT fk_students_user_id FOREIGN KEY (user_id) REFERENCES users(id),
   CONSTRAINT chk_students_document_not_empty CHECK (CHAR_LENGTH(TRIM(document_number)) > 0),
   CONSTRAINT chk_students_bow_positive CHECK (bow_pounds IS NULL OR bow_pounds > 0)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -84,13 +96,15 @@ CREATE TABLE IF NOT EXISTS routines (
   description TEXT NULL,
   is_active TINYINT(1) NOT NULL DEFAULT 1,
   is_template TINYINT(1) NOT NULL DEFAULT 1, -- 1=plantilla permanente, 0=rutina temporal para asignación
+  created_by_user_id BIGINT NULL,
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (id),
-  UNIQUE KEY uq_routines_name (name),
+  UNIQUE KEY uq_routines_owner_name (created_by_user_id, name),
   KEY idx_routines_active (is_active),
   KEY idx_routines_name (name),
-  KEY idx_routines_template_active (is_template, is_active)
+  KEY idx_routines_template_active (is_template, is_active),
+  KEY idx_routines_created_by (created_by_user_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- -----------------------------------------
@@ -163,10 +177,16 @@ CREATE TABLE IF NOT EXISTS student_routine_assignments (
   assigned_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   start_date DATE NULL,
   end_date DATE NULL,
+  week_start DATE NULL,                        -- lunes de la semana de start_date
   status ENUM('active','paused','finished') NOT NULL DEFAULT 'active',
+  objective VARCHAR(255) NULL,
+  professor_notes TEXT NULL,
   notes TEXT NULL,
+  created_by_user_id BIGINT NULL,
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  -- Sin índices parciales: semana ISO solo para las activas; los NULL no chocan.
+  active_week_key INT AS (IF(status = 'active', YEARWEEK(week_start, 3), NULL)) STORED,
   PRIMARY KEY (id),
 
   CONSTRAINT fk_assignment_student
@@ -183,6 +203,10 @@ CREATE TABLE IF NOT EXISTS student_routine_assignments (
   KEY idx_assignments_status (status),
   KEY idx_assignments_routine (routine_id),
   KEY idx_assignments_student_status (student_id, status),
+  KEY idx_student_routine_assignments_created_by (created_by_user_id),
+  KEY idx_assignments_created_id (created_at, id),
+  KEY idx_assignments_week_status (week_start, status),
+  UNIQUE KEY uq_assignments_active_week (student_id, active_week_key),
   CONSTRAINT chk_assignments_date_range CHECK (
     end_date IS NULL OR start_date IS NULL OR end_date >= start_date
   )
@@ -207,12 +231,99 @@ CREATE TABLE IF NOT EXISTS student_routine_history (
   student_observations TEXT NULL, -- "Obvservaciones" en UI/PDF si se desea respetar ese título
   weekly_total_arrows INT UNSIGNED NOT NULL DEFAULT 0,
   snapshot_json TEXT NOT NULL,
+  created_by_user_id BIGINT NULL,
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (id),
   UNIQUE KEY uq_history_assignment (assignment_id),
   KEY idx_history_student_completed (student_id, completed_at),
-  KEY idx_history_completed (completed_at)
+  KEY idx_history_completed (completed_at),
+  KEY idx_student_routine_history_created_by (created_by_user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- -----------------------------------------
+-- Assignment exercise overrides (ejercicios temporales de una asignación)
+-- day_index = posición del día dentro de la rutina.
+-- -----------------------------------------
+CREATE TABLE IF NOT EXISTS assignment_exercise_overrides (
+  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  assignment_id BIGINT UNSIGNED NOT NULL,
+  day_index INT NOT NULL,
+  exercise_id BIGINT UNSIGNED NOT NULL,
+  sort_order INT NOT NULL DEFAULT 1,
+  arrows_override INT NULL,
+  rounds_override INT NULL,
+  arrows_per_round_override INT NULL,
+  distance_override_m DECIMAL(6,2) NULL,
+  description_override TEXT NULL,
+  CONSTRAINT uq_assignment_override_day_exercise UNIQUE (assignment_id, day_index, exercise_id),
+  KEY idx_assignment_overrides_exercise (exercise_id),
+  CONSTRAINT fk_assignment_overrides_assignment FOREIGN KEY (assignment_id)
+    REFERENCES student_routine_assignments(id) ON DELETE CASCADE,
+  CONSTRAINT fk_assignment_overrides_exercise FOREIGN KEY (exercise_id)
+    REFERENCES exercises(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- -----------------------------------------
+-- Assignment effective plans (plan efectivo materializado y sus dependencias)
+-- -----------------------------------------
+CREATE TABLE IF NOT EXISTS assignment_effective_plans (
+  assignment_id BIGINT UNSIGNED NOT NULL PRIMARY KEY,
+  format_version INT NOT NULL,
+  objective VARCHAR(255) NOT NULL,
+  professor_notes TEXT NULL,
+  weekly_total_arrows INT NOT NULL DEFAULT 0,
+  days_json MEDIUMTEXT NOT NULL,
+  computed_at DATETIME NOT NULL,
+  CONSTRAINT fk_effective_plans_assignment FOREIGN KEY (assignment_id)
+    REFERENCES student_routine_assignments(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS assignment_plan_dependencies (
+  assignment_id BIGINT UNSIGNED NOT NULL,
+  exercise_id BIGINT UNSIGNED NOT NULL,
+  PRIMARY KEY (assignment_id, exercise_id),
+  KEY idx_plan_dependencies_exercise (exercise_id),
+  CONSTRAINT fk_plan_dependencies_assignment FOREIGN KEY (assignment_id)
+    REFERENCES student_routine_assignments(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- -----------------------------------------
+-- Deleted records (bajas para la sincronización incremental /sync)
+-- -----------------------------------------
+CREATE TABLE IF NOT EXISTS deleted_records (
+  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  entity VARCHAR(30) NOT NULL,
+  record_id BIGINT NOT NULL,
+  created_by_user_id BIGINT NULL,
+  deleted_at DATETIME NOT NULL,
+  KEY idx_deleted_records_deleted_at (deleted_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- -----------------------------------------
+-- Export jobs (exportaciones en segundo plano)
+-- -----------------------------------------
+CREATE TABLE IF NOT EXISTS export_jobs (
+  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  created_by_user_id BIGINT UNSIGNED NULL,
+  status VARCHAR(20) NOT NULL,
+  format VARCHAR(20) NOT NULL,
+  file_name VARCHAR(255) NOT NULL,
+  params_json LONGTEXT NOT NULL,
+  error TEXT NULL,
+  created_at DATETIME NOT NULL,
+  started_at DATETIME NULL,
+  finished_at DATETIME NULL,
+  KEY idx_export_jobs_status_created (status, created_at),
+  CONSTRAINT fk_export_jobs_user FOREIGN KEY (created_by_user_id) REFERENCES users(id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- -----------------------------------------
+-- Scheduled job runs (última ejecución de cada job periódico)
+-- -----------------------------------------
+CREATE TABLE IF NOT EXISTS scheduled_job_runs (
+  job_name VARCHAR(60) NOT NULL PRIMARY KEY,
+  last_run_at DATETIME NOT NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- -----------------------------------------
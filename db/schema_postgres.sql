@@ -4,6 +4,13 @@
 -- =========================================
 
 -- Crear DB manualmente en Render (ya viene creada). Solo ejecutar este script en esa DB.
+-- Refleja el esquema al nivel de la ultima migracion de backend/app/migrations.py;
+-- las bases existentes se actualizan con esas migraciones, no con este script.
+
+-- pg_trgm: busqueda de alumnos por nombre/documento. btree_gist: exclusion semanal
+-- de asignaciones activas. Si no hay permisos, ver los fallbacks de las migraciones 8 y 13.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gist;
 
 CREATE TABLE IF NOT EXISTS users (
   id BIGSERIAL PRIMARY KEY,
@@ -57,6 +64,9 @@ CREATE INDEX IF NOT EXISTS idx_students_name ON students (full_name);
 CREATE INDEX IF NOT EXISTS idx_students_active_name ON students (is_active, full_name);
 CREATE INDEX IF NOT EXISTS idx_students_inactive_since ON students (is_active, inactive_since);
 CREATE INDEX IF NOT EXISTS idx_students_created_by ON students (created_by_user_id);
+CREATE INDEX IF NOT EXISTS idx_students_owner_name ON students (created_by_user_id, full_name, id);
+CREATE INDEX IF NOT EXISTS idx_students_full_name_trgm ON students USING gin (full_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_students_document_trgm ON students USING gin (document_number gin_trgm_ops);
 
 CREATE TABLE IF NOT EXISTS routines (
   id BIGSERIAL PRIMARY KEY,
@@ -108,20 +118,64 @@ CREATE TABLE IF NOT EXISTS student_routine_assignments (
   assigned_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   start_date DATE NULL,
   end_date DATE NULL,
+  week_start DATE NULL, -- lunes de la semana de start_date
   status VARCHAR(20) NOT NULL DEFAULT 'active' CHECK (status IN ('active','paused','finished')),
+  objective VARCHAR(255) NULL,
+  professor_notes TEXT NULL,
   notes TEXT NULL,
   created_by_user_id BIGINT NULL REFERENCES users(id),
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   CONSTRAINT chk_assignments_date_range CHECK (
     end_date IS NULL OR start_date IS NULL OR end_date >= start_date
-  )
+  ),
+  -- Una sola asignacion activa por alumno y semana.
+  CONSTRAINT excl_assignments_active_week EXCLUDE USING gist (
+    student_id WITH =,
+    daterange(week_start, week_start + 7) WITH &&
+  ) WHERE (status = 'active' AND week_start IS NOT NULL)
 );
 CREATE INDEX IF NOT EXISTS idx_assignments_student ON student_routine_assignments (student_id);
 CREATE INDEX IF NOT EXISTS idx_assignments_status ON student_routine_assignments (status);
 CREATE INDEX IF NOT EXISTS idx_assignments_routine ON student_routine_assignments (routine_id);
 CREATE INDEX IF NOT EXISTS idx_assignments_student_status ON student_routine_assignments (student_id, status);
 CREATE INDEX IF NOT EXISTS idx_student_routine_assignments_created_by ON student_routine_assignments (created_by_user_id);
+CREATE INDEX IF NOT EXISTS idx_assignments_created_id ON student_routine_assignments (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_assignments_week_status ON student_routine_assignments (week_start, status);
+
+-- Ejercicios temporales de una asignacion (day_index = posicion del dia en la rutina).
+CREATE TABLE IF NOT EXISTS assignment_exercise_overrides (
+  id BIGSERIAL PRIMARY KEY,
+  assignment_id BIGINT NOT NULL REFERENCES student_routine_assignments(id) ON DELETE CASCADE,
+  day_index INTEGER NOT NULL,
+  exercise_id BIGINT NOT NULL REFERENCES exercises(id) ON DELETE CASCADE,
+  sort_order INTEGER NOT NULL DEFAULT 1,
+  arrows_override INTEGER NULL,
+  rounds_override INTEGER NULL,
+  arrows_per_round_override INTEGER NULL,
+  distance_override_m NUMERIC(6,2) NULL,
+  description_override TEXT NULL,
+  CONSTRAINT uq_assignment_override_day_exercise UNIQUE (assignment_id, day_index, exercise_id)
+);
+CREATE INDEX IF NOT EXISTS idx_assignment_overrides_exercise ON assignment_exercise_overrides (exercise_id);
+
+-- Plan efectivo materializado por asignacion y de que ejercicios depende.
+CREATE TABLE IF NOT EXISTS assignment_effective_plans (
+  assignment_id BIGINT PRIMARY KEY REFERENCES student_routine_assignments(id) ON DELETE CASCADE,
+  format_version INTEGER NOT NULL,
+  objective VARCHAR(255) NOT NULL,
+  professor_notes TEXT NULL,
+  weekly_total_arrows INTEGER NOT NULL DEFAULT 0,
+  days_json TEXT NOT NULL,
+  computed_at TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS assignment_plan_dependencies (
+  assignment_id BIGINT NOT NULL REFERENCES student_routine_assignments(id) ON DELETE CASCADE,
+  exercise_id BIGINT NOT NULL,
+  PRIMARY KEY (assignment_id, exercise_id)
+);
+CREATE INDEX IF NOT EXISTS idx_plan_dependencies_exercise ON assignment_plan_dependencies (exercise_id);
 
 CREATE TABLE IF NOT EXISTS student_routine_history (
   id BIGSERIAL PRIMARY KEY,
@@ -145,3 +199,34 @@ CREATE TABLE IF NOT EXISTS student_routine_history (
 CREATE INDEX IF NOT EXISTS idx_history_student_completed ON student_routine_history (student_id, completed_at);
 CREATE INDEX IF NOT EXISTS idx_history_completed ON student_routine_history (completed_at);
 CREATE INDEX IF NOT EXISTS idx_student_routine_history_created_by ON student_routine_history (created_by_user_id);
+
+-- Bajas para la sincronizacion incremental (/sync).
+CREATE TABLE IF NOT EXISTS deleted_records (
+  id BIGSERIAL PRIMARY KEY,
+  entity VARCHAR(30) NOT NULL,
+  record_id BIGINT NOT NULL,
+  created_by_user_id BIGINT NULL,
+  deleted_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deleted_records_deleted_at ON deleted_records (deleted_at);
+
+-- Exportaciones en segundo plano.
+CREATE TABLE IF NOT EXISTS export_jobs (
+  id BIGSERIAL PRIMARY KEY,
+  created_by_user_id BIGINT NULL REFERENCES users(id),
+  status VARCHAR(20) NOT NULL,
+  format VARCHAR(20) NOT NULL,
+  file_name VARCHAR(255) NOT NULL,
+  params_json TEXT NOT NULL,
+  error TEXT NULL,
+  created_at TIMESTAMP NOT NULL,
+  started_at TIMESTAMP NULL,
+  finished_at TIMESTAMP NULL
+);
+CREATE INDEX IF NOT EXISTS idx_export_jobs_status_created ON export_jobs (status, created_at);
+
+-- Ultima ejecucion de cada job periodico, compartida entre workers.
+CREATE TABLE IF NOT EXISTS scheduled_job_runs (
+  job_name VARCHAR(60) NOT NULL PRIMARY KEY,
+  last_run_at TIMESTAMP NOT NULL
+);
@@ -635,6 +635,8 @@ type Assignment = {
   start_date?: string | null;
   end_date?: string | null;
   status: "active" | "paused" | "finished";
+  objective?: string | null;
+  professor_notes?: string | null;
   notes?: string | null;
 };
 
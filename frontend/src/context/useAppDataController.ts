@@ -61,6 +61,8 @@ export type Assignment = {
   start_date?: string | null;
   end_date?: string | null;
   status: "active" | "paused" | "finished";
+  objective?: string | null;
+  professor_notes?: string | null;
   notes?: string | null;
 };
 
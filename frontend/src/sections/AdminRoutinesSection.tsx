@@ -59,7 +59,10 @@ function AdminRoutinesSection({
   const mobileAdminSheetDragStartYRef = useRef<number | null>(null);
   const mobileAdminSheetDragOffsetRef = useRef(0);
   const mobileAdminSheetRef = useRef<HTMLDivElement | null>(null);
-  const getProfessorNotes = (notes: unknown): string => {
+  const getProfessorNotes = (assignment: any): string => {
+    if (typeof assignment?.professor_notes === "string") return assignment.professor_notes.trim();
+    // Asignaciones anteriores a la columna professor_notes: todo venia en notes.
+    const notes = assignment?.notes;
     if (typeof notes !== "string" || !notes.trim()) return "";
     try {
       const parsed = JSON.parse(notes) as { professor_notes?: unknown };
@@ -79,7 +82,7 @@ function AdminRoutinesSection({
           assignment,
           routine,
           orderedDays,
-          professorNotes: getProfessorNotes(assignment.notes),
+          professorNotes: getProfessorNotes(assignment),
         };
       }),
     [activeAssignments, routines],
@@ -428,7 +431,7 @@ function AdminRoutinesSection({
             const routine = routines.find((r: any) => r.id === assignment.routine_id);
             const orderedDays = routine ? [...routine.days].sort((a: any, b: any) => a.day_number - b.day_number) : [];
             const isExpanded = expandedAssignmentId === assignment.id;
-            const professorNotes = getProfessorNotes(assignment.notes);
+            const professorNotes = getProfessorNotes(assignment);
             return (
               <Box key={assignment.id} borderWidth="1px" borderColor="gray.200" borderRadius="xl" bg="white" overflow="hidden">
                 <Box